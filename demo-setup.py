@@ -4,20 +4,335 @@ Upsun Demo Ecosystem Setup Script
 
 This script reads the demo-config.json file and generates CLI commands
 for setting up and tearing down a demo ecosystem.
+
+With --execute the setup runs directly from Python instead: organizations,
+projects, invitations and integrations become a dependency graph, and
+independent steps run concurrently (up to --max-workers at a time). Cleanup
+works the same way: projects are deleted concurrently, each deletion is
+polled on its own, and organizations go once their projects are gone.
+
+--action plan compares the configuration with a state file of what earlier
+runs created, and makes only the changes since then: it writes a script of
+just those changes, or with --execute applies them directly.
 """
 
+import csv
+import hashlib
 import json
 import os
+import random
+import re
+import shlex
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
+import time
 import argparse
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+# How the CLI reports an API response that asks us to slow down: a 429 or a
+# 5xx status, and sometimes a Retry-After header. POSIX ERE syntax, so the
+# generated scripts can grep for the same thing.
+THROTTLE_PATTERN = r'(HTTP/[0-9.]+ |resulted in a .|status code:? )(429|5[0-9][0-9])|Too Many Requests'
+RETRY_AFTER_PATTERN = r'Retry-After: *([0-9]+)'
+NOT_FOUND_PATTERN = r'(HTTP/[0-9.]+ |resulted in a .|status code:? )404|not found'
+
+# Commands that create something: a throttled call may still have gone
+# through, so running one again could create a duplicate
+CREATE_COMMANDS = ('organization:create', 'project:create', 'integration:add')
+
+# Cleanup never deletes this organization
+PROTECTED_ORGANIZATION_ID = '01k4606e9hqxyxdn2ph0k06ee1'
+
+
+class CliError(RuntimeError):
+    """A CLI command exited with a non-zero status."""
+    
+    def __init__(self, message: str, output: str = ''):
+        super().__init__(message)
+        self.output = output
+    
+    @property
+    def throttled(self) -> bool:
+        """Whether the API rejected the call with a 429 or 5xx response."""
+        return re.search(THROTTLE_PATTERN, self.output, re.IGNORECASE) is not None
+    
+    @property
+    def not_found(self) -> bool:
+        """Whether the API answered that the thing asked about does not exist."""
+        return re.search(NOT_FOUND_PATTERN, self.output, re.IGNORECASE) is not None
+    
+    @property
+    def retry_after(self) -> Optional[float]:
+        """Seconds the API asked us to wait, if it said."""
+        match = re.search(RETRY_AFTER_PATTERN, self.output, re.IGNORECASE)
+        return float(match.group(1)) if match else None
+
+
+def creates_resource(args: List[str]) -> bool:
+    """Whether a CLI command creates something, so it is unsafe to simply run again."""
+    return args[0] in CREATE_COMMANDS or (args[0] == 'a:curl' and 'POST' in args)
+
+
+def run_command(command: List[str], cwd: Optional[str] = None,
+                env: Optional[Dict[str, str]] = None) -> str:
+    """Run a command and return its standard output; raises CliError on failure."""
+    result = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.strip().splitlines() if not line.startswith('hint:')]
+        reason = errors[-1] if errors else f"exit status {result.returncode}"
+        raise CliError(f"{command[0]} {command[1]}: {reason}", result.stderr)
+    return result.stdout
+
+
+def config_hash(entry: Any) -> str:
+    """A short, stable hash of a configuration entry."""
+    return hashlib.sha256(json.dumps(entry, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class RateLimiter:
+    """Token bucket for API calls, with AIMD back-off.
+    
+    Each call takes a token; tokens refill at ``rate`` per second, up to
+    ``burst``. Calls run at full speed until the API pushes back: every
+    throttled call halves the rate (down to ``min_rate``) and empties the
+    bucket, a Retry-After pauses every caller until it has passed, and
+    each successful call adds ``increase`` back (up to ``max_rate``).
+    Shared by all executor threads.
+    """
+    
+    def __init__(self, rate: float = 5.0, burst: int = 5, min_rate: float = 0.1,
+                 increase: float = 0.1, backoff: float = 0.5):
+        self.max_rate = self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase = increase
+        self.backoff = backoff
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def acquire(self):
+        """Wait for a token."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Take the token now; a negative balance is the queue of callers waiting for one
+            self.tokens -= 1
+            delay = max(self.paused_until - now, -self.tokens / self.rate)
+        if delay > 0:
+            time.sleep(delay)
+    
+    def succeeded(self):
+        """Additive increase after a call the API accepted."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.increase)
+    
+    def throttled(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease after a 429 or 5xx response."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+
+class Inventory:
+    """Organizations and projects on the control plane, listed once and indexed.
+
+    Each kind is listed the first time it is needed, then looked up by ID
+    or by lowercased label (projects: title). Creations are recorded as
+    they happen, so a listing is only repeated for a kind that has been
+    marked stale. With a cache file the listings are kept on disk and
+    reused by later runs until they are ``ttl`` seconds old. All reads and
+    writes happen under ``lock``; callers get copies, never the live dicts.
+    """
+
+    # Listing command and label column for each kind
+    KINDS = {'organizations': ('organization:list', 'label'),
+             'projects': ('project:list', 'title')}
+
+    def __init__(self, list_rows: Callable[[List[str], List[str]], List[Dict[str, str]]],
+                 cache_file: Optional[str] = None, ttl: float = 300):
+        self.list_rows = list_rows
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.items: Dict[str, Dict[str, str]] = {}
+        self.ids_by_label: Dict[str, Dict[str, str]] = {}
+        self.fetched_at: Dict[str, float] = {}
+        self.lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        for kind in self.KINDS:
+            entry = cached.get(kind, {})
+            if time.time() - entry.get('fetched_at', 0) < self.ttl:
+                self._set(kind, entry.get('items', {}))
+                self.fetched_at[kind] = entry['fetched_at']
+
+    def _set(self, kind, items):
+        self.items[kind] = items
+        self.ids_by_label[kind] = {label.lower(): item_id for item_id, label in items.items()}
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        cached = {kind: {'fetched_at': self.fetched_at[kind], 'items': items}
+                  for kind, items in self.items.items()}
+        with open(self.cache_file, 'w') as f:
+            json.dump(cached, f, indent=2)
+
+    def refresh(self, kind: str) -> Dict[str, str]:
+        """List one kind again; returns its IDs mapped to labels."""
+        command, column = self.KINDS[kind]
+        rows = self.list_rows([command], ['id', column])
+        with self.lock:
+            self._set(kind, {row['id']: row[column] for row in rows})
+            self.fetched_at[kind] = time.time()
+            self._save()
+            return dict(self.items[kind])
+
+    def stale(self, kind: str):
+        """Forget one kind, so the next lookup lists it again."""
+        with self.lock:
+            self.items.pop(kind, None)
+            self.ids_by_label.pop(kind, None)
+            self.fetched_at.pop(kind, None)
+            self._save()
+
+    def get(self, kind: str) -> Dict[str, str]:
+        """IDs mapped to labels for one kind, listing it if needed."""
+        with self.lock:
+            if kind in self.items:
+                return dict(self.items[kind])
+        return self.refresh(kind)
+
+    def find(self, kind: str, label: str) -> Optional[str]:
+        """The ID of the organization or project with this label, if any."""
+        with self.lock:
+            if kind in self.ids_by_label:
+                return self.ids_by_label[kind].get(label.lower())
+        self.refresh(kind)
+        with self.lock:
+            return self.ids_by_label.get(kind, {}).get(label.lower())
+
+    def add(self, kind: str, item_id: str, label: str):
+        """Record something this run created."""
+        while True:
+            with self.lock:
+                if kind in self.items:
+                    self.items[kind][item_id] = label
+                    self.ids_by_label[kind][label.lower()] = item_id
+                    self._save()
+                    return
+            # List it without holding the lock, then merge under it; another
+            # thread may have marked it stale meanwhile, hence the loop
+            self.refresh(kind)
+
+
+class TaskGraph:
+    """Provisioning steps and the steps each one waits for.
+
+    A task runs once all of its dependencies have succeeded, and is called
+    with their results in order. Dependencies must already be in the graph,
+    so the graph cannot contain a cycle. When a task fails, everything
+    that depends on it is skipped.
+    """
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Any] = {}
+        self.status: Dict[str, str] = {}
+
+    def add(self, key: str, description: str, action: Callable[..., Any],
+            depends_on: List[str] = ()) -> str:
+        """Add a task and return its key."""
+        if key in self.tasks:
+            raise ValueError(f"Duplicate task: {key}")
+        for dependency in depends_on:
+            if dependency not in self.tasks:
+                raise KeyError(f"Task {key} depends on unknown task {dependency}")
+        self.tasks[key] = {'description': description, 'action': action,
+                           'depends_on': list(depends_on)}
+        return key
+
+    def _run_task(self, key: str) -> str:
+        task = self.tasks[key]
+        try:
+            self.results[key] = task['action'](*[self.results[d] for d in task['depends_on']])
+            return 'done'
+        except Exception as e:
+            print(f"  ❌ {task['description']} failed: {e}")
+            return 'failed'
+
+    def _skip_dependents(self, key: str, dependents: Dict[str, List[str]]):
+        for dependent in dependents[key]:
+            if dependent not in self.status:
+                print(f"  ⚠ Skipping {self.tasks[dependent]['description']}: "
+                      f"{self.tasks[key]['description']} did not complete")
+                self.status[dependent] = 'skipped'
+                self._skip_dependents(dependent, dependents)
+
+    def run(self, max_workers: int = 4) -> Dict[str, str]:
+        """Run every task, at most max_workers at a time; returns each task's status."""
+        waiting = {key: set(task['depends_on']) for key, task in self.tasks.items()}
+        dependents: Dict[str, List[str]] = {key: [] for key in self.tasks}
+        for key, task in self.tasks.items():
+            for dependency in task['depends_on']:
+                dependents[dependency].append(key)
+
+        ready = [key for key, deps in waiting.items() if not deps]
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while ready or running:
+                for key in ready:
+                    running[pool.submit(self._run_task, key)] = key
+                ready = []
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    self.status[key] = future.result()
+                    if self.status[key] != 'done':
+                        self._skip_dependents(key, dependents)
+                        continue
+                    for dependent in dependents[key]:
+                        waiting[dependent].discard(key)
+                        if not waiting[dependent] and dependent not in self.status:
+                            ready.append(dependent)
+        return self.status
+
+
 
 class DemoEcosystemManager:
-    def __init__(self, config_file: str = "demo-config.json"):
+    def __init__(self, config_file: str = "demo-config.json", inventory_cache: Optional[str] = None,
+                 inventory_ttl: float = 300, state_file: Optional[str] = None):
         """Initialize the demo ecosystem manager with configuration."""
         self.config_file = config_file
+        self.state_file = state_file or f"{os.path.splitext(config_file)[0]}.state.json"
         self.config = self.load_config()
         self.cli_command = self.get_cli_command()
+        self.rate_limit = self.get_rate_limit()
+        self.rate_limiter = RateLimiter(**self.rate_limit)
+        self.inventory = Inventory(self._list_rows, inventory_cache, inventory_ttl)
         
     def load_config(self) -> Dict[str, Any]:
         """Load configuration from JSON file."""
@@ -36,10 +351,39 @@ class DemoEcosystemManager:
         use_production = self.config.get('settings', {}).get('use_production', False)
         return 'upsun' if use_production else 'upsunstg'
     
+    def get_rate_limit(self) -> Dict[str, Any]:
+        """Get the API rate limit settings, for RateLimiter and the generated scripts."""
+        rate_limit = self.config.get('settings', {}).get('rate_limit', {})
+        return {
+            'rate': float(rate_limit.get('requests_per_second', 5)),
+            'burst': int(rate_limit.get('burst', 5)),
+            'min_rate': float(rate_limit.get('min_requests_per_second', 0.1)),
+        }
+    
     def cli(self, command: str) -> str:
         """Generate a CLI command with the appropriate prefix."""
         return f"{self.cli_command} {command}"
     
+    def api(self, command: str) -> str:
+        """Generate a CLI command that goes through the rate limiter."""
+        return f"api {self.cli(command)}"
+    
+    def _project_org_label(self, project: Dict[str, Any]) -> str:
+        """Get the label of the organization a project belongs to."""
+        org_prefix = self.config.get('settings', {}).get('organization_prefix', 'bmc-')
+        org_replacement = self.config.get('settings', {}).get('organization_prefix_replacement', 'BMC ')
+        return project['organization'].replace(org_prefix, org_replacement).title()
+    
+    def _project_repo_url(self, project: Dict[str, Any]) -> str:
+        """Get a project's source: a local path or a GitHub repository URL."""
+        # Handle both local and GitHub sources
+        source = project.get('source', {})
+        if source.get('type') == 'local':
+            return source.get('path', '')
+        elif source.get('type') == 'github':
+            return source.get('repository', '')
+        return ''
+    
     def _get_default_org(self) -> str:
         """Get the first available organization name."""
         if self.config['organizations']['flex']:
@@ -48,9 +392,140 @@ class DemoEcosystemManager:
             return self.config['organizations']['fixed'][0]['name'].lower().replace(' ', '-')
         return "default-org"
     
+    def generate_rate_limit_commands(self) -> List[str]:
+        """Generate the shell rate limiter that API calls in the scripts go through.
+        
+        The same token bucket and AIMD back-off as RateLimiter, in integer
+        arithmetic: rates are in thousandths of a request per second. The
+        bucket lives in a file, replaced atomically, so calls made in
+        subshells and background jobs share it.
+        """
+        rate = int(self.rate_limit['rate'] * 1000)
+        min_rate = max(1, int(self.rate_limit['min_rate'] * 1000))
+        return [
+            "# API rate limiting: calls run as fast as the token bucket allows, and",
+            "# back off only when the API answers 429/5xx or sends Retry-After",
+            f"api_rate={rate}",
+            f"api_max_rate={rate}",
+            f"api_min_rate={min_rate}",
+            f"api_burst={self.rate_limit['burst'] * 1000}",
+            "script_tmp=$(mktemp -d)",
+            "trap 'rm -rf \"$script_tmp\"' EXIT",
+            "api_state=\"$script_tmp/api-state\"",
+            "",
+            "api_save() {",
+            "  # $1 $2 $3: rate, tokens and when they were counted",
+            "  local tmp",
+            "  tmp=$(mktemp \"$script_tmp/api-state.XXXXXX\")",
+            "  echo \"$1 $2 $3\" > \"$tmp\" && mv \"$tmp\" \"$api_state\"",
+            "}",
+            "api_save \"$api_rate\" \"$api_burst\" \"$(date +%s)\"",
+            "",
+            "api() {",
+            "  local attempt status wait_ms retry_after api_rate api_tokens api_updated now api_err max_attempts=5",
+            "  # A throttled create may have gone through anyway: never run one twice",
+            f"  case \"$2\" in {'|'.join(CREATE_COMMANDS)}) max_attempts=1 ;; esac",
+            "  [ \"$2\" = a:curl ] && [[ \" $* \" == *\" POST \"* ]] && max_attempts=1",
+            "  api_err=$(mktemp \"$script_tmp/api-err.XXXXXX\")",
+            "  for attempt in 1 2 3 4 5; do",
+            "    # Refill the bucket and take a token, waiting if there is none",
+            "    read -r api_rate api_tokens api_updated < \"$api_state\"",
+            "    now=$(date +%s)",
+            "    api_tokens=$(( api_tokens + (now - api_updated) * api_rate ))",
+            "    [ \"$api_tokens\" -gt \"$api_burst\" ] && api_tokens=$api_burst",
+            "    api_tokens=$(( api_tokens - 1000 ))",
+            "    api_save \"$api_rate\" \"$api_tokens\" \"$now\"",
+            "    if [ \"$api_tokens\" -lt 0 ]; then",
+            "      wait_ms=$(( -api_tokens * 1000 / api_rate ))",
+            "      sleep \"$(( wait_ms / 1000 )).$(printf '%03d' $(( wait_ms % 1000 )))\"",
+            "    fi",
+            "    if \"$@\" 2>\"$api_err\"; then status=0; else status=$?; fi",
+            "    cat \"$api_err\" >&2",
+            f"    if [ \"$status\" -ne 0 ] && [ \"$attempt\" -lt 5 ] && grep -Eqi '{THROTTLE_PATTERN}' \"$api_err\"; then",
+            "      # Multiplicative decrease, and honour Retry-After if the API sent one",
+            "      api_rate=$(( api_rate / 2 ))",
+            "      [ \"$api_rate\" -lt \"$api_min_rate\" ] && api_rate=$api_min_rate",
+            "      read -r _ api_tokens api_updated < \"$api_state\"",
+            "      [ \"$api_tokens\" -gt 0 ] && api_tokens=0",
+            "      api_save \"$api_rate\" \"$api_tokens\" \"$api_updated\"",
+            "      if [ \"$attempt\" -ge \"$max_attempts\" ]; then",
+            "        echo \"  ⚠ $2 was throttled and may have gone through anyway, not retrying it\" >&2",
+            "        rm -f \"$api_err\"",
+            "        return \"$status\"",
+            "      fi",
+            f"      retry_after=$(grep -Eio '{RETRY_AFTER_PATTERN}' \"$api_err\" | grep -Eo '[0-9]+' | head -1)",
+            "      if [ -n \"$retry_after\" ]; then",
+            "        echo \"  ⚠ $2 was throttled, retrying in ${retry_after}s (attempt $attempt/5)\" >&2",
+            "        sleep \"$retry_after\"",
+            "      else",
+            "        echo \"  ⚠ $2 was throttled, backing off (attempt $attempt/5)\" >&2",
+            "      fi",
+            "      continue",
+            "    fi",
+            "    # Additive increase after a call the API accepted",
+            "    if [ \"$status\" -eq 0 ] && [ \"$api_rate\" -lt \"$api_max_rate\" ]; then",
+            "      read -r api_rate api_tokens api_updated < \"$api_state\"",
+            "      api_rate=$(( api_rate + 100 ))",
+            "      [ \"$api_rate\" -gt \"$api_max_rate\" ] && api_rate=$api_max_rate",
+            "      api_save \"$api_rate\" \"$api_tokens\" \"$api_updated\"",
+            "    fi",
+            "    rm -f \"$api_err\"",
+            "    return \"$status\"",
+            "  done",
+            "}",
+            "",
+        ]
+    
+    def generate_inventory_commands(self) -> List[str]:
+        """Generate the shell inventory of organizations and projects.
+
+        Each kind is listed once into a tab-separated file of IDs and
+        lowercased labels, and looked up from there. Creations are appended
+        to the file when their ID is known; marking a kind stale lists it
+        again on next use.
+        """
+        # organization:list or project:list
+        list_command = self.api('"${1%s}:list"')
+        return [
+            "# Inventory: organizations and projects, listed once and looked up by label",
+            "inventory_refresh() {",
+            "  # $1: organizations or projects",
+            "  local columns=id,label",
+            "  [ \"$1\" = projects ] && columns=id,title",
+            f"  {list_command} --format tsv --no-header --columns \"$columns\" \\",
+            "    | awk -F'\\t' -v OFS='\\t' '{print $1, tolower($2)}' > \"$script_tmp/$1.tsv\"",
+            "}",
+            "",
+            "inventory_stale() {",
+            "  rm -f \"$script_tmp/$1.tsv\"",
+            "}",
+            "",
+            "inventory_add() {",
+            "  # Record the $1 (organizations or projects) just created with ID $2 and label $3",
+            "  if ! [[ \"$2\" =~ ^[[:alnum:]]+$ ]]; then",
+            "    inventory_stale \"$1\"  # No usable ID: list again on next use",
+            "  elif [ -f \"$script_tmp/$1.tsv\" ]; then",
+            "    printf '%s\\t%s\\n' \"$2\" \"$(echo \"$3\" | tr '[:upper:]' '[:lower:]')\" >> \"$script_tmp/$1.tsv\"",
+            "  fi",
+            "}",
+            "",
+            "inventory_ids() {",
+            "  [ -f \"$script_tmp/$1.tsv\" ] || inventory_refresh \"$1\"",
+            "  cut -f1 \"$script_tmp/$1.tsv\"",
+            "}",
+            "",
+            "inventory_find() {",
+            "  # Print the ID of the $1 (organizations or projects) labelled $2; fails if there is none",
+            "  [ -f \"$script_tmp/$1.tsv\" ] || inventory_refresh \"$1\"",
+            "  awk -F'\\t' -v label=\"$(echo \"$2\" | tr '[:upper:]' '[:lower:]')\" \\",
+            "    '$2 == label {print $1; found=1; exit} END {exit !found}' \"$script_tmp/$1.tsv\"",
+            "}",
+            "",
+        ]
+    
     def generate_setup_commands(self) -> List[str]:
         """Generate all setup commands based on configuration."""
-        commands = []
+        commands = self.generate_rate_limit_commands() + self.generate_inventory_commands()
         
         # Phase 1: Authentication & Initial Setup
         commands.extend(self.generate_auth_commands())
@@ -89,57 +564,105 @@ class DemoEcosystemManager:
         
         return commands
     
-    def generate_cleanup_commands(self) -> List[str]:
-        """Generate all cleanup commands based on configuration."""
-        commands = []
+    def generate_cleanup_commands(self, max_workers: int = 4) -> List[str]:
+        """Generate all cleanup commands based on configuration.
         
-        # Delete all projects
-        commands.append("# Phase 1: Delete all projects")
-        commands.append("echo 'Deleting all projects...'")
-        commands.append(f"{self.cli('project:list')} --pipe | while read project_id; do")
-        commands.append("  if [ ! -z \"$project_id\" ]; then")
-        commands.append("    echo \"Deleting project: $project_id\"")
-        commands.append(f"    {self.cli('project:delete')} --project \"$project_id\" --yes")
-        commands.append("  fi")
-        commands.append("done")
+        Projects are deleted up to max_workers at a time, and each deletion
+        polls its own project, with exponential back-off and jitter, until
+        it is gone. Organizations are deleted once every project deletion
+        has finished.
+        """
+        commands = self.generate_rate_limit_commands() + self.generate_inventory_commands()
+        users = self.config.get('users', [])
         
-        # Wait for projects to be fully deleted from system cache
-        commands.append("# Phase 2: Wait for projects to be fully deleted from system cache")
-        commands.append("echo 'Waiting for projects to be fully deleted from system cache...'")
-        commands.append("for i in {1..5}; do")
-        commands.append(f"  remaining_projects=$({self.cli('project:list')} --pipe | wc -l)")
-        commands.append("  if [ \"$remaining_projects\" -eq 0 ]; then")
-        commands.append("    echo 'All projects successfully deleted'")
-        commands.append("    break")
-        commands.append("  else")
-        commands.append("    echo \"$remaining_projects projects still exist, waiting 10 seconds... (attempt $i/5)\"")
-        commands.append("    sleep 10")
+        commands.append("# Cleanup helpers")
+        commands.append(f"max_jobs={max_workers}")
+        commands.append("mkdir -p \"$script_tmp/deleted\"")
+        commands.append("")
+        commands.append("wait_for_job_slot() {")
+        commands.append("  while [ \"$(jobs -rp | wc -l)\" -ge \"$max_jobs\" ]; do")
+        commands.append("    sleep 0.2")
+        commands.append("  done")
+        commands.append("}")
+        commands.append("")
+        commands.append("backoff_sleep() {")
+        commands.append("  # Sleep between half and all of $1 seconds, so parallel pollers spread out")
+        commands.append("  local ms=$(( $1 * 500 + RANDOM % ($1 * 500 + 1) ))")
+        commands.append("  sleep \"$(( ms / 1000 )).$(printf '%03d' $(( ms % 1000 )))\"")
+        commands.append("}")
+        commands.append("")
+        commands.append("delete_project() {")
+        commands.append("  # Delete project $1, then poll that project alone until it is gone")
+        commands.append("  local project_id=\"$1\" delay=1 attempt info_err")
+        commands.append("  info_err=$(mktemp \"$script_tmp/info-err.XXXXXX\")")
+        commands.append(f"  if ! {self.api('project:delete')} --project \"$project_id\" --yes; then")
+        commands.append("    echo \"  ❌ Failed to delete project $project_id\"")
+        commands.append("    return 1")
         commands.append("  fi")
+        commands.append("  for attempt in 1 2 3 4 5 6 7 8; do")
+        commands.append(f"    if {self.api('project:info')} --project \"$project_id\" id >/dev/null 2>\"$info_err\"; then")
+        commands.append("      :  # Still there")
+        commands.append(f"    elif grep -Eqi '{NOT_FOUND_PATTERN}' \"$info_err\"; then")
+        commands.append("      echo \"  ✓ Project $project_id deleted\"")
+        commands.append("      touch \"$script_tmp/deleted/$project_id\"")
+        commands.append("      return 0")
+        commands.append("    else")
+        commands.append("      # Any other failure says nothing about the project: keep polling")
+        commands.append("      echo \"  ⚠ Could not check project $project_id: $(tail -n 1 \"$info_err\")\"")
+        commands.append("    fi")
+        commands.append("    backoff_sleep \"$delay\"")
+        commands.append("    [ \"$delay\" -lt 32 ] && delay=$(( delay * 2 ))")
+        commands.append("  done")
+        commands.append("  echo \"  ⚠ Project $project_id could not be confirmed as deleted\"")
+        commands.append("  return 1")
+        commands.append("}")
+        commands.append("")
+        
+        # Delete all projects
+        commands.append("# Phase 1: Delete all projects")
+        commands.append("echo \"Deleting all projects, up to $max_jobs at a time...\"")
+        commands.append("for project_id in $(inventory_ids projects); do")
+        commands.append("  wait_for_job_slot")
+        commands.append("  echo \"Deleting project: $project_id\"")
+        commands.append("  delete_project \"$project_id\" &")
         commands.append("done")
+        commands.append("wait")
+        commands.append("inventory_stale projects")
         
-        # Delete all users (if any)
-        commands.append("# Phase 3: Delete users (if any)")
-        if 'users' in self.config and self.config['users']:
-            for user in self.config['users']:
-                commands.append(f"echo \"Deleting user {user['email']} from all projects...\"")
-                commands.append("upsunstg project:list --pipe | while read project_id; do")
-                commands.append(f"  if [ ! -z \"$project_id\" ]; then")
-                commands.append(f"    echo \"  Removing user from project: $project_id\"")
-                commands.append(f"    upsunstg user:delete \"{user['email']}\" --project \"$project_id\" --yes 2>/dev/null || echo \"    ⚠ Failed to remove user from project $project_id\"")
-                commands.append("  fi")
-                commands.append("done")
+        # Remove users from the projects that are still there
+        commands.append("# Phase 2: Remove users from projects that were not deleted")
+        if users:
+            emails = ' '.join(f"\"{user['email']}\"" for user in users)
+            commands.append("for project_id in $(inventory_ids projects); do")
+            commands.append("  [ -f \"$script_tmp/deleted/$project_id\" ] && continue")
+            commands.append("  wait_for_job_slot")
+            commands.append("  echo \"Removing users from project: $project_id\"")
+            commands.append("  (")
+            commands.append(f"    for email in {emails}; do")
+            commands.append(f"      {self.api('user:delete')} \"$email\" --project \"$project_id\" --yes 2>/dev/null || echo \"    ⚠ Failed to remove $email from project $project_id\"")
+            commands.append("    done")
+            commands.append("  ) &")
+            commands.append("done")
+            commands.append("wait")
         else:
             commands.append("# No users to delete")
         
         # Delete all organizations
-        commands.append("# Phase 4: Delete all organizations")
+        commands.append("# Phase 3: Delete all organizations")
         commands.append("echo 'Deleting all organizations...'")
-        commands.append("upsunstg organization:list --format plain --no-header | awk '{print $1}' | while read org_id; do")
-        commands.append("  if [ ! -z \"$org_id\" ] && [ \"$org_id\" != \"01k4606e9hqxyxdn2ph0k06ee1\" ]; then")
+        commands.append("for org_id in $(inventory_ids organizations); do")
+        commands.append(f"  if [ \"$org_id\" != \"{PROTECTED_ORGANIZATION_ID}\" ]; then")
+        commands.append("    wait_for_job_slot")
         commands.append("    echo \"Deleting organization: $org_id\"")
-        commands.append("    upsunstg organization:delete --org \"$org_id\" --yes")
+        commands.append(f"    ({self.api('organization:delete')} --org \"$org_id\" --yes || echo \"  ❌ Failed to delete organization $org_id\") &")
         commands.append("  fi")
         commands.append("done")
+        commands.append("wait")
+        
+        # Everything the state file recorded is gone
+        commands.append("# Phase 4: Forget the recorded state")
+        state_file = shlex.quote(os.path.abspath(self.state_file))
+        commands.append(f"rm -f {state_file} {state_file}.journal")
         
         return commands
     
@@ -148,32 +671,33 @@ class DemoEcosystemManager:
         return [
             "# Note: User should already be logged in to Upsun",
             "# If not logged in, run: upsunstg auth:browser-login",
-            self.cli("auth:info")
+            self.api("auth:info")
         ]
     
-    def generate_organization_commands(self) -> List[str]:
-        """Generate organization creation commands."""
+    def generate_organization_commands(self, organizations: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[str]:
+        """Generate organization creation commands (by default for every configured organization)."""
+        if organizations is None:
+            organizations = self.config['organizations']
         commands = []
         commands.append("# Phase 2: Create Organizations")
         commands.append("echo 'Creating organizations...'")
         
         # Check if organizations already exist by label only
         commands.append("# Check for existing organizations by label")
-        commands.append(f"existing_orgs=$({self.cli('organization:list')} --format plain --no-header | awk '{{for(i=2;i<=NF;i++) printf \"%s \", $i; print \"\"}}' | tr '[:upper:]' '[:lower:]' | sed 's/ $//')")
+        commands.append("inventory_refresh organizations")
         
         # Fixed organizations (use unique names to avoid conflicts)
-        for org in self.config['organizations']['fixed']:
-            org_label = org['label'].lower()
+        for org in organizations.get('fixed', []):
             commands.append(f"echo 'Checking Fixed organization: {org['label']}'")
-            commands.append(f"if echo \"$existing_orgs\" | grep -q \"{org_label}\"; then")
+            commands.append(f"if inventory_find organizations \"{org['label']}\" >/dev/null; then")
             commands.append(f"  echo '  {org['label']} already exists, skipping'")
             commands.append("else")
             commands.append(f"  echo '  Creating {org['label']}...'")
             commands.append(f"  # Generate unique name with timestamp")
             commands.append(f"  unique_name=\"{org['name'].lower().replace(' ', '-')}-$(date +%s)\"")
-            commands.append(f"  if {self.cli('a:curl')} -X POST organizations -H \"Content-Type: application/json\" -d \"{{\\\"label\\\": \\\"{org['label']}\\\", \\\"name\\\": \\\"$unique_name\\\", \\\"type\\\": \\\"fixed\\\"}}\" 2>/dev/null; then")
+            commands.append(f"  if {self.api('a:curl')} -X POST organizations -H \"Content-Type: application/json\" -d \"{{\\\"label\\\": \\\"{org['label']}\\\", \\\"name\\\": \\\"$unique_name\\\", \\\"type\\\": \\\"fixed\\\"}}\" 2>/dev/null; then")
             commands.append(f"    echo \"  ✓ {org['label']} created successfully with name: $unique_name\"")
-            commands.append(f"    sleep 10  # Rate limiting delay after creation")
+            commands.append("    inventory_stale organizations")
             commands.append("  else")
             commands.append(f"    echo '  ❌ Failed to create {org['label']} - stopping setup'")
             commands.append(f"    exit 1")
@@ -181,18 +705,17 @@ class DemoEcosystemManager:
             commands.append("fi")
         
         # Flex organizations (use unique names to avoid conflicts)
-        for org in self.config['organizations']['flex']:
-            org_label = org['label'].lower()
+        for org in organizations.get('flex', []):
             commands.append(f"echo 'Checking Flex organization: {org['label']}'")
-            commands.append(f"if echo \"$existing_orgs\" | grep -q \"{org_label}\"; then")
+            commands.append(f"if inventory_find organizations \"{org['label']}\" >/dev/null; then")
             commands.append(f"  echo '  {org['label']} already exists, skipping'")
             commands.append("else")
             commands.append(f"  echo '  Creating {org['label']}...'")
             commands.append(f"  # Generate unique name with timestamp")
             commands.append(f"  unique_name=\"{org['name'].lower().replace(' ', '-')}-$(date +%s)\"")
-            commands.append(f"  if {self.cli('organization:create')} --label \"{org['label']}\" --name \"$unique_name\" --yes 2>/dev/null; then")
+            commands.append(f"  if {self.api('organization:create')} --label \"{org['label']}\" --name \"$unique_name\" --yes 2>/dev/null; then")
             commands.append(f"    echo \"  ✓ {org['label']} created successfully with name: $unique_name\"")
-            commands.append(f"    sleep 15  # Rate limiting delay after creation")
+            commands.append("    inventory_stale organizations")
             commands.append("  else")
             commands.append(f"    echo '  ⚠ Failed to create {org['label']} - continuing with existing organizations'")
             commands.append("  fi")
@@ -216,12 +739,14 @@ class DemoEcosystemManager:
         
         # Add verification with retry logic
         commands.append("echo 'Checking organization status...'")
-        commands.append("for i in {1..3}; do")
+        commands.append("poll_delay=1")
+        commands.append("for i in {1..5}; do")
         commands.append("  echo \"Attempt $i: Checking organizations...\"")
         commands.append("  all_active=true")
+        commands.append("  inventory_refresh organizations")
         
         for org_label in org_labels:
-            commands.append(f"  if ! upsunstg organization:list --format plain --no-header | awk '{{for(i=2;i<=NF;i++) printf \"%s \", $i; print \"\"}}' | tr '[:upper:]' '[:lower:]' | grep -q \"{org_label}\"; then")
+            commands.append(f"  if ! inventory_find organizations \"{org_label}\" >/dev/null; then")
             commands.append(f"    echo \"  {org_label} not found yet\"")
             commands.append("    all_active=false")
             commands.append("  else")
@@ -232,8 +757,9 @@ class DemoEcosystemManager:
         commands.append("    echo 'All organizations are active!'")
         commands.append("    break")
         commands.append("  else")
-        commands.append("    echo 'Some organizations not ready, waiting 10 seconds...'")
-        commands.append("    sleep 10")
+        commands.append("    echo \"Some organizations not ready, waiting $poll_delay seconds...\"")
+        commands.append("    sleep \"$poll_delay\"")
+        commands.append("    poll_delay=$((poll_delay * 2))")
         commands.append("  fi")
         commands.append("done")
         
@@ -271,35 +797,28 @@ class DemoEcosystemManager:
         commands.append("echo 'Inviting users to organizations and projects...'")
         
         if 'users' in self.config and self.config['users']:
+            # Get all organization and project IDs
+            commands.append("# Get all organization and project IDs")
+            commands.append("org_ids=$(inventory_ids organizations)")
+            commands.append("project_ids=$(inventory_ids projects)")
+            
             for user in self.config['users']:
                 commands.append(f"echo 'Inviting {user['name']} ({user['email']})...'")
                 
-                # Get all organization IDs
-                commands.append("# Get all organization IDs")
-                cli_cmd = self.cli('organization:list')
-                org_list_cmd = "org_ids=$(" + cli_cmd + " --format plain --no-header | awk '{print $1}')"
-                commands.append(org_list_cmd)
-                
                 # Invite to all organizations
                 commands.append("# Invite to all organizations")
                 commands.append("for org_id in $org_ids; do")
                 commands.append("  echo '  Inviting to organization: $org_id'")
-                cli_cmd = self.cli('organization:user:add')
+                cli_cmd = self.api('organization:user:add')
                 org_invite_cmd = "  " + cli_cmd + " --org \"$org_id\" \"" + user['email'] + "\" --permission projects:create --permission projects:list --yes 2>/dev/null || echo '    ⚠ Failed to invite to org $org_id'"
                 commands.append(org_invite_cmd)
                 commands.append("done")
                 
-                # Get all project IDs
-                commands.append("# Get all project IDs")
-                cli_cmd = self.cli('project:list')
-                project_list_cmd = "project_ids=$(" + cli_cmd + " --pipe)"
-                commands.append(project_list_cmd)
-                
                 # Invite to all projects
                 commands.append("# Invite to all projects")
                 commands.append("for project_id in $project_ids; do")
                 commands.append("  echo '  Inviting to project: $project_id'")
-                cli_cmd = self.cli('user:add')
+                cli_cmd = self.api('user:add')
                 project_invite_cmd = "  " + cli_cmd + " --project \"$project_id\" \"" + user['email'] + "\" --role admin --yes 2>/dev/null || echo '    ⚠ Failed to invite to project $project_id'"
                 commands.append(project_invite_cmd)
                 commands.append("done")
@@ -310,15 +829,28 @@ class DemoEcosystemManager:
         
         return commands
     
-    def generate_project_commands(self) -> List[str]:
-        """Generate project creation commands with parallel execution."""
+    def generate_project_commands(self, projects: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        """Generate project creation commands (by default for every configured project)."""
+        if projects is None:
+            projects = self.config.get('projects', [])
         commands = []
-        if 'projects' in self.config and self.config['projects']:
+        if projects:
             commands.append("# Phase 6: Create Projects (Parallel)")
             commands.append("echo 'Creating projects in parallel...'")
             commands.append("echo 'This will start multiple project creation processes simultaneously'")
             commands.append("")
             
+            # Keep what project:create prints, so the new ID can be recorded
+            region = self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')
+            commands.append("# Create project $1 in organization ID $2; the new ID ends up in $create_out")
+            commands.append("project_create() {")
+            commands.append("  local title=\"$1\" org=\"$2\"")
+            commands.append("  shift 2")
+            commands.append(f"  {self.api('project:create')} --title \"$title\" --org \"$org\" --region \"{region}\" --yes \"$@\" > \"$create_out\" || {{ cat \"$create_out\"; return 1; }}")
+            commands.append("  cat \"$create_out\"")
+            commands.append("}")
+            commands.append("")
+            
             # Create a function to handle individual project creation
             commands.append("# Function to create a single project")
             commands.append("create_project() {")
@@ -329,27 +861,27 @@ class DemoEcosystemManager:
             commands.append("  ")
             commands.append("  echo \"[$$] Checking project: $project_title in $org_label\"")
             commands.append("  # Check if project already exists by title (case-insensitive)")
-            commands.append(f"  existing_projects=$({self.cli('project:list')} --format plain --no-header 2>/dev/null | awk '{{for(i=2;i<=NF;i++) printf \"%s \", $i; print \"\"}}' | tr '[:upper:]' '[:lower:]')")
-            commands.append("  project_title_lower=$(echo \"$project_title\" | tr '[:upper:]' '[:lower:]')")
-            commands.append("  if echo \"$existing_projects\" | grep -q \"$project_title_lower\"; then")
+            commands.append("  if inventory_find projects \"$project_title\" >/dev/null; then")
             commands.append("    echo \"[$$]   $project_title already exists, skipping\"")
             commands.append("    return 0")
             commands.append("  fi")
             commands.append("  ")
             commands.append("  echo \"[$$]   Creating $project_title...\"")
-            commands.append(f"  org_id=$({self.cli('organization:list')} --format plain --no-header | grep -i \"$org_label\" | head -1 | awk '{{print $1}}')")
+            commands.append("  org_id=$(inventory_find organizations \"$org_label\" || true)")
             commands.append("  if [ -z \"$org_id\" ]; then")
             commands.append("    echo \"[$$]   ❌ Organization $org_label not found, skipping project\"")
             commands.append("    return 1")
             commands.append("  fi")
             commands.append("  ")
             commands.append("  echo \"[$$]   Using organization ID: $org_id\"")
+            commands.append("  local create_out")
+            commands.append("  create_out=$(mktemp \"$script_tmp/create.XXXXXX\")")
             commands.append("  ")
             commands.append("  if [ -n \"$repo_url\" ]; then")
             commands.append("    # Check if this is a local path")
             commands.append("    if echo \"$repo_url\" | grep -q \"^examples/\"; then")
             commands.append("      echo \"[$$]   Using local example: $repo_url\"")
-            commands.append(f"      {self.cli('project:create')} --title \"$project_title\" --org \"$org_id\" --region \"{self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')}\" --yes")
+            commands.append("      project_create \"$project_title\" \"$org_id\"")
             commands.append("      ")
             commands.append("      # Copy local example files to project")
             commands.append("      echo \"[$$]   Copying local example files...\"")
@@ -364,7 +896,7 @@ class DemoEcosystemManager:
             commands.append("    # Check if this is a subdirectory path (contains /tree/)")
             commands.append("    elif echo \"$repo_url\" | grep -q \"/tree/\"; then")
             commands.append("      echo \"[$$]   Detected subdirectory path, creating project first...\"")
-            commands.append(f"      {self.cli('project:create')} --title \"$project_title\" --org \"$org_id\" --region \"{self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')}\" --yes")
+            commands.append("      project_create \"$project_title\" \"$org_id\"")
             commands.append("      ")
             commands.append("      # Extract base repo URL and subdirectory path")
             commands.append("      base_repo=$(echo \"$repo_url\" | sed 's|/tree/.*||')")
@@ -405,38 +937,38 @@ class DemoEcosystemManager:
             commands.append("      git push origin main || true")
             commands.append("    else")
             commands.append("      echo \"[$$]   Using direct repository initialization...\"")
-            commands.append(f"      {self.cli('project:create')} --title \"$project_title\" --org \"$org_id\" --region \"{self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')}\" --init-repo \"$repo_url\" --yes")
+            commands.append("      project_create \"$project_title\" \"$org_id\" --init-repo \"$repo_url\"")
             commands.append("    fi")
             commands.append("  else")
-            commands.append(f"    {self.cli('project:create')} --title \"$project_title\" --org \"$org_id\" --region \"{self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')}\" --yes")
+            commands.append("    project_create \"$project_title\" \"$org_id\"")
             commands.append("    echo \"[$$]   Note: Local project $project_name will need to be connected manually\"")
             commands.append("  fi")
             commands.append("  ")
             commands.append("  # Check if authentication expired and re-authenticate if needed")
             commands.append("  if [ $? -ne 0 ]; then")
             commands.append("    echo \"[$$]   Authentication may have expired, checking...\"")
-            commands.append(f"    if ! {self.cli('auth:info')} >/dev/null 2>&1; then")
+            commands.append(f"    if ! {self.api('auth:info')} >/dev/null 2>&1; then")
             commands.append("      echo \"[$$]   Re-authenticating...\"")
             commands.append(f"      {self.cli('auth:browser-login')} --no-browser")
             commands.append("      # Retry project creation")
             commands.append("      if [ -n \"$repo_url\" ]; then")
             commands.append("        if echo \"$repo_url\" | grep -q \"^examples/\"; then")
-            commands.append(f"          {self.cli('project:create')} --title \"$project_title\" --org \"$org_id\" --region \"{self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')}\" --yes")
+            commands.append("          project_create \"$project_title\" \"$org_id\"")
             commands.append("        elif echo \"$repo_url\" | grep -q \"/tree/\"; then")
-            commands.append(f"          {self.cli('project:create')} --title \"$project_title\" --org \"$org_id\" --region \"{self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')}\" --yes")
+            commands.append("          project_create \"$project_title\" \"$org_id\"")
             commands.append("        else")
-            commands.append(f"          {self.cli('project:create')} --title \"$project_title\" --org \"$org_id\" --region \"{self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')}\" --init-repo \"$repo_url\" --yes")
+            commands.append("          project_create \"$project_title\" \"$org_id\" --init-repo \"$repo_url\"")
             commands.append("        fi")
             commands.append("      else")
-            commands.append(f"        {self.cli('project:create')} --title \"$project_title\" --org \"$org_id\" --region \"{self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')}\" --yes")
+            commands.append("        project_create \"$project_title\" \"$org_id\"")
             commands.append("      fi")
             commands.append("    fi")
             commands.append("  fi")
             commands.append("  ")
             commands.append("  if [ $? -eq 0 ]; then")
             commands.append("    echo \"[$$]   ✓ $project_title created successfully\"")
-            commands.append("    # Small delay to allow project to be visible in listings")
-            commands.append("    sleep 2")
+            commands.append("    # The new project's ID is the last thing printed")
+            commands.append("    inventory_add projects \"$(awk 'END {print $NF}' \"$create_out\")\" \"$project_title\"")
             commands.append("  else")
             commands.append("    echo \"[$$]   ❌ Failed to create $project_title\"")
             commands.append("  fi")
@@ -444,37 +976,23 @@ class DemoEcosystemManager:
             commands.append("")
             
             # Export the function so it can be used in background processes
-            commands.append("export -f create_project")
+            commands.append("export -f project_create create_project")
             commands.append("")
             
-            # Create projects sequentially to avoid rate limiting
-            commands.append("# Create projects sequentially to avoid rate limiting")
+            # Create projects sequentially; the rate limiter paces the API calls
+            commands.append("# Create projects sequentially; the rate limiter paces the API calls")
             commands.append("")
             
             # Create each project one by one
-            for i, project in enumerate(self.config['projects']):
-                org_prefix = self.config.get('settings', {}).get('organization_prefix', 'bmc-')
-                org_replacement = self.config.get('settings', {}).get('organization_prefix_replacement', 'BMC ')
-                org_label = project['organization'].replace(org_prefix, org_replacement).title()
+            for i, project in enumerate(projects):
+                org_label = self._project_org_label(project)
                 project_title = project['title']
-                # Handle both local and GitHub sources
-                if 'source' in project:
-                    if project['source'].get('type') == 'local':
-                        repo_url = project['source'].get('path', '')
-                    elif project['source'].get('type') == 'github':
-                        repo_url = project['source'].get('repository', '')
-                    else:
-                        repo_url = ''
-                else:
-                    repo_url = ''
+                repo_url = self._project_repo_url(project)
                 project_name = project['name']
                 
-                commands.append(f"# Creating project {i+1}/{len(self.config['projects'])}: {project_title}")
+                commands.append(f"# Creating project {i+1}/{len(projects)}: {project_title}")
                 commands.append(f"create_project \"{project_title}\" \"{org_label}\" \"{repo_url}\" \"{project_name}\"")
                 commands.append("")
-                commands.append("# Wait 5 seconds between projects to avoid rate limiting")
-                commands.append("sleep 5")
-                commands.append("")
             
             commands.append("echo 'All projects created successfully!'")
             commands.append("")
@@ -560,9 +1078,9 @@ class DemoEcosystemManager:
                 if 'integrations' in self.config:
                     for integration in self.config['integrations']:
                         if integration['type'] == 'github':
-                            commands.append(f"upsunstg integration:add --project {project['name']} --type github --repository bmc-global/{project['name']}")
+                            commands.append(f"{self.api('integration:add')} --project {project['name']} --type github --repository bmc-global/{project['name']}")
                         elif integration['type'] in ['newrelic', 'datadog']:
-                            commands.append(f"upsunstg integration:add --project {project['name']} --type {integration['type']} --api-key \"your-{integration['type']}-key\"")
+                            commands.append(f"{self.api('integration:add')} --project {project['name']} --type {integration['type']} --api-key \"your-{integration['type']}-key\"")
         else:
             commands.append("# No projects configured")
         return commands
@@ -579,6 +1097,688 @@ class DemoEcosystemManager:
         #     commands.append("# No projects configured")
         return commands
     
+    def run_cli(self, args: List[str], attempts: int = 5,
+                creates: Optional[Tuple[str, str]] = None) -> str:
+        """Run a CLI command non-interactively and return its output.
+        
+        Calls are paced by the shared rate limiter, and retried when the
+        API throttles them. A throttled create may have gone through anyway,
+        so it is only retried if ``creates`` names the inventory kind and
+        label it makes and a fresh listing has nothing by that label; if
+        the listing does, the output is empty.
+        """
+        env = dict(os.environ)
+        env[f"{self.cli_command.upper()}_CLI_NO_INTERACTION"] = '1'
+        for attempt in range(1, attempts + 1):
+            self.rate_limiter.acquire()
+            try:
+                output = run_command([self.cli_command] + args, env=env)
+            except CliError as e:
+                if not e.throttled or attempt == attempts:
+                    raise
+                self.rate_limiter.throttled(e.retry_after)
+                if creates_resource(args) and creates is None:
+                    raise
+                print(f"  ⚠ {self.cli_command} {args[0]} was throttled, backing off (attempt {attempt}/{attempts})")
+                if creates_resource(args):
+                    kind, label = creates
+                    self.inventory.refresh(kind)
+                    if self.inventory.find(kind, label):
+                        return ''
+                continue
+            self.rate_limiter.succeeded()
+            return output
+    
+    def _list_rows(self, args: List[str], columns: List[str]) -> List[Dict[str, str]]:
+        """Run a CLI listing and parse the given columns of each row."""
+        output = self.run_cli(args + ['--format', 'csv', '--no-header', '--columns', ','.join(columns)])
+        return [dict(zip(columns, row)) for row in csv.reader(output.splitlines()) if row]
+    
+    def execute_organization(self, org: Dict[str, Any], org_type: str) -> str:
+        """Create an organization unless one with its label exists; returns its ID."""
+        label = org['label']
+        existing_id = self.inventory.find('organizations', label)
+        if existing_id:
+            print(f"  {label} already exists, skipping")
+            return existing_id
+        
+        print(f"  Creating {org_type.title()} organization {label}...")
+        # Generate unique name with timestamp
+        unique_name = f"{org['name'].lower().replace(' ', '-')}-{int(time.time())}"
+        org_id = None
+        if org_type == 'fixed':
+            body = json.dumps({'label': label, 'name': unique_name, 'type': 'fixed'})
+            output = self.run_cli(['a:curl', '-X', 'POST', 'organizations',
+                                   '-H', 'Content-Type: application/json', '-d', body],
+                                  creates=('organizations', label))
+            try:
+                org_id = json.loads(output).get('id')
+            except (ValueError, AttributeError):
+                pass
+        else:
+            self.run_cli(['organization:create', '--label', label, '--name', unique_name, '--yes'],
+                         creates=('organizations', label))
+        
+        if not org_id:
+            self.inventory.refresh('organizations')
+            org_id = self.inventory.find('organizations', label)
+        if not org_id:
+            raise CliError(f"{label} was created but is not listed yet")
+        self.inventory.add('organizations', org_id, label)
+        print(f"  ✓ {label} created successfully with name: {unique_name}")
+        return org_id
+    
+    def execute_project(self, project: Dict[str, Any], org_id: Optional[str] = None) -> str:
+        """Create a project unless one with its title exists; returns its ID."""
+        title = project['title']
+        existing_id = self.inventory.find('projects', title)
+        if existing_id:
+            print(f"  {title} already exists, skipping")
+            return existing_id
+        
+        org_label = self._project_org_label(project)
+        if org_id is None:
+            # The organization is not in the configuration; it must already exist
+            org_id = self.inventory.find('organizations', org_label)
+            if not org_id:
+                raise CliError(f"Organization {org_label} not found")
+        
+        print(f"  Creating {title} in {org_label}...")
+        region = self.config.get('settings', {}).get('region', 'plc.recreation.plat.farm')
+        repo_url = self._project_repo_url(project)
+        # Plain repositories are imported by the API; local examples and
+        # repository subdirectories are pushed once the project exists
+        init_repo = bool(repo_url) and project['source'].get('type') == 'github' and '/tree/' not in repo_url
+        args = ['project:create', '--title', title, '--org', org_id, '--region', region, '--yes']
+        if init_repo:
+            args += ['--init-repo', repo_url]
+        output = self.run_cli(args, creates=('projects', title)).split()
+        
+        # The new project's ID is the last thing printed
+        project_id = output[-1] if output and output[-1].isalnum() else None
+        if not project_id:
+            self.inventory.refresh('projects')
+            project_id = self.inventory.find('projects', title)
+        if not project_id:
+            raise CliError(f"{title} was created but is not listed yet")
+        self.inventory.add('projects', project_id, title)
+        if repo_url and not init_repo:
+            self.push_project_source(project_id, repo_url)
+        print(f"  ✓ {title} created successfully ({project_id})")
+        return project_id
+    
+    def push_project_source(self, project_id: str, repo_url: str):
+        """Push a local example, or a subdirectory of a GitHub repository, to a project."""
+        git_url = self.run_cli(['project:info', '--project', project_id, 'git']).strip()
+        # Each project is assembled in its own directory so pushes can run in parallel
+        with tempfile.TemporaryDirectory(prefix=f"project_{project_id}_") as temp_dir:
+            source = repo_url
+            if '/tree/' in repo_url:
+                base_repo, _, path = repo_url.partition('/tree/')
+                branch, _, subdir_path = path.partition('/')
+                clone_dir = os.path.join(temp_dir, 'clone')
+                run_command(['git', 'clone', '--depth', '1', '--branch', branch, base_repo, clone_dir])
+                source = os.path.join(clone_dir, subdir_path)
+                if not os.path.isdir(source):
+                    print(f"  ⚠ Subdirectory {subdir_path} not found, using root directory")
+                    source = clone_dir
+            
+            work_dir = os.path.join(temp_dir, 'work')
+            shutil.copytree(source, work_dir, ignore=shutil.ignore_patterns('.git', '__pycache__', '*.pyc'))
+            run_command(['git', 'init', '-q'], cwd=work_dir)
+            run_command(['git', 'add', '.'], cwd=work_dir)
+            run_command(['git', 'commit', '-q', '-m', f"Initial commit from {repo_url}"], cwd=work_dir)
+            run_command(['git', 'push', '-q', git_url, 'HEAD:refs/heads/main'], cwd=work_dir)
+    
+    def execute_org_invitation(self, user: Dict[str, Any], org_id: str):
+        """Invite a user to an organization."""
+        try:
+            self.run_cli(['organization:user:add', '--org', org_id, user['email'],
+                          '--permission', 'projects:create', '--permission', 'projects:list', '--yes'])
+        except CliError as e:
+            print(f"  ⚠ Failed to invite {user['email']} to org {org_id}: {e}")
+    
+    def execute_project_invitation(self, user: Dict[str, Any], project_id: str):
+        """Invite a user to a project as an admin."""
+        try:
+            self.run_cli(['user:add', '--project', project_id, user['email'], '--role', 'admin', '--yes'])
+        except CliError as e:
+            print(f"  ⚠ Failed to invite {user['email']} to project {project_id}: {e}")
+    
+    def _integration_args(self, project: Dict[str, Any], integration: Dict[str, Any]) -> Optional[List[str]]:
+        """The integration:add options for an integration, or None if its type is not supported."""
+        args = ['--type', integration['type']]
+        if integration['type'] == 'github':
+            return args + ['--repository', f"bmc-global/{project['name']}"]
+        elif integration['type'] in ['newrelic', 'datadog']:
+            return args + ['--api-key', f"your-{integration['type']}-key"]
+        return None
+    
+    def execute_integration(self, project: Dict[str, Any], integration: Dict[str, Any], project_id: str):
+        """Add an integration to a project."""
+        args = self._integration_args(project, integration)
+        if args is None:
+            return
+        self.run_cli(['integration:add', '--project', project_id] + args)
+    
+    def delete_integration(self, integration_type: str, project_id: str):
+        """Remove a project's integration of one type."""
+        for row in self._list_rows(['integration:list', '--project', project_id], ['id', 'type']):
+            if row['type'] == integration_type:
+                self.run_cli(['integration:delete', row['id'], '--project', project_id, '--yes'])
+    
+    def delete_organization(self, org_id: str, *deleted_projects: Any):
+        """Delete an organization; runs after the deletions of its projects."""
+        self.run_cli(['organization:delete', '--org', org_id, '--yes'])
+    
+    def update_project(self, project: Dict[str, Any], project_id: str) -> str:
+        """Apply a project's title; the rest of its configuration only matters when it is created."""
+        self.run_cli(['project:info', '--project', project_id, 'title', project['title']])
+        self.inventory.stale('projects')
+        print(f"  ✓ {project['title']} updated ({project_id})")
+        return project_id
+    
+    def build_setup_graph(self) -> TaskGraph:
+        """Build the setup as a task graph: orgs → projects → invites → integrations."""
+        graph = TaskGraph()
+        print("Listing existing organizations and projects...")
+        self.inventory.get('organizations')
+        self.inventory.get('projects')
+        
+        org_tasks = {}
+        for org_type in ['fixed', 'flex']:
+            for org in self.config.get('organizations', {}).get(org_type, []):
+                org_tasks[org['label'].lower()] = graph.add(
+                    f"org:{org['label']}", f"{org_type.title()} organization {org['label']}",
+                    partial(self.execute_organization, org, org_type))
+        
+        # Each project waits only for its own organization
+        project_tasks = {}
+        for project in self.config.get('projects', []):
+            org_task = org_tasks.get(self._project_org_label(project).lower())
+            project_tasks[project['name']] = graph.add(
+                f"project:{project['name']}", f"Project {project['title']}",
+                partial(self.execute_project, project),
+                [org_task] if org_task else [])
+        
+        for user in self.config.get('users', []):
+            for org_label, org_task in org_tasks.items():
+                graph.add(f"invite:{user['email']}:{org_task}", f"Invitation of {user['email']} to {org_label}",
+                          partial(self.execute_org_invitation, user), [org_task])
+            for project_name, project_task in project_tasks.items():
+                graph.add(f"invite:{user['email']}:{project_task}", f"Invitation of {user['email']} to {project_name}",
+                          partial(self.execute_project_invitation, user), [project_task])
+        
+        for project in self.config.get('projects', []):
+            for integration in self.config.get('integrations', []):
+                graph.add(f"integration:{project['name']}:{integration['type']}",
+                          f"{integration['type']} integration for {project['name']}",
+                          partial(self.execute_integration, project, integration),
+                          [project_tasks[project['name']]])
+        return graph
+    
+    def execute_setup(self, max_workers: int = 4) -> bool:
+        """Run the setup directly, independent steps in parallel; returns True if every step succeeded."""
+        try:
+            self.run_cli(['auth:info'])
+        except CliError:
+            print(f"❌ You are not logged in to Upsun. Please run: {self.cli('auth:browser-login')}")
+            return False
+        
+        state = self.load_state()
+        graph = self.build_setup_graph()
+        print(f"🚀 Running {len(graph.tasks)} setup steps, up to {max_workers} at a time...")
+        started = time.monotonic()
+        status = list(graph.run(max_workers).values())
+        self.record_state(state, graph)
+        failed, skipped = status.count('failed'), status.count('skipped')
+        print(f"Setup finished in {time.monotonic() - started:.0f}s: "
+              f"{status.count('done')} completed, {failed} failed, {skipped} skipped")
+        return not failed and not skipped
+    
+    def wait_until_deleted(self, project_id: str, attempts: int = 8) -> bool:
+        """Poll one project, with exponential back-off and jitter, until the API says it is gone."""
+        delay = 1.0
+        for _ in range(attempts):
+            try:
+                self.run_cli(['project:info', '--project', project_id, 'id'])
+            except CliError as e:
+                if e.not_found:
+                    return True
+                # Any other failure says nothing about the project: keep polling
+                if not e.throttled:
+                    print(f"  ⚠ Could not check project {project_id}: {e}")
+            # Between half and all of the delay, so parallel pollers spread out
+            time.sleep(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, 32)
+        return False
+    
+    def remove_users(self, project_id: str):
+        """Remove every configured user from a project in one pass."""
+        for user in self.config.get('users', []):
+            try:
+                self.run_cli(['user:delete', user['email'], '--project', project_id, '--yes'])
+            except CliError as e:
+                print(f"  ⚠ Failed to remove {user['email']} from project {project_id}: {e}")
+    
+    def delete_project(self, project_id: str, title: str):
+        """Delete a project and wait until it is gone; its users are removed if it cannot be deleted."""
+        try:
+            self.run_cli(['project:delete', '--project', project_id, '--yes'])
+        except CliError:
+            self.remove_users(project_id)
+            raise
+        if not self.wait_until_deleted(project_id):
+            self.remove_users(project_id)
+            raise CliError(f"{title} could not be confirmed as deleted")
+        print(f"  ✓ {title} deleted ({project_id})")
+    
+    def execute_cleanup(self, max_workers: int = 4) -> bool:
+        """Delete every project, max_workers at a time, then every organization; returns True if all went."""
+        try:
+            self.run_cli(['auth:info'])
+        except CliError:
+            print(f"❌ You are not logged in to Upsun. Please run: {self.cli('auth:browser-login')}")
+            return False
+        
+        print("Listing existing organizations and projects...")
+        graph = TaskGraph()
+        project_tasks = [graph.add(f"delete:project:{project_id}", f"Deletion of project {title}",
+                                   partial(self.delete_project, project_id, title))
+                         for project_id, title in self.inventory.refresh('projects').items()]
+        # Organizations go once every project deletion has finished
+        for org_id, label in self.inventory.refresh('organizations').items():
+            if org_id != PROTECTED_ORGANIZATION_ID:
+                graph.add(f"delete:org:{org_id}", f"Deletion of organization {label}",
+                          partial(self.delete_organization, org_id), project_tasks)
+        
+        print(f"🧹 Running {len(graph.tasks)} cleanup steps, up to {max_workers} at a time...")
+        started = time.monotonic()
+        status = list(graph.run(max_workers).values())
+        for kind in Inventory.KINDS:
+            self.inventory.stale(kind)
+        failed, skipped = status.count('failed'), status.count('skipped')
+        print(f"Cleanup finished in {time.monotonic() - started:.0f}s: "
+              f"{status.count('done')} completed, {failed} failed, {skipped} skipped")
+        if not failed and not skipped:
+            # Everything the state file recorded is gone
+            for path in [self.state_file, f"{self.state_file}.journal"]:
+                if os.path.exists(path):
+                    os.remove(path)
+        return not failed and not skipped
+    
+    def load_state(self) -> Dict[str, Any]:
+        """Load what earlier runs recorded, including what generated plan scripts journaled."""
+        state: Dict[str, Any] = {'resources': {}}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        resources = state['resources']
+        
+        journal = f"{self.state_file}.journal"
+        if os.path.exists(journal):
+            with open(journal, 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    key = entry.pop('key')
+                    if entry.get('deleted'):
+                        resources.pop(key, None)
+                    else:
+                        entry['id'] = entry.get('id') or None
+                        resources[key] = entry
+        
+        # Invitations and integrations go with their project or organization
+        for key in [key for key, entry in resources.items() if self._belongs_to_parent(key)
+                    and entry.get('parent') not in resources]:
+            del resources[key]
+        
+        if os.path.exists(journal):
+            self.save_state(state)
+        return state
+    
+    @staticmethod
+    def _belongs_to_parent(key: str) -> bool:
+        """Whether a resource (an invitation or integration) disappears with its parent."""
+        return key.startswith(('invite:', 'integration:'))
+    
+    def save_state(self, state: Dict[str, Any]):
+        """Write the state file; the journal is folded into it."""
+        with open(self.state_file, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        journal = f"{self.state_file}.journal"
+        if os.path.exists(journal):
+            os.remove(journal)
+    
+    def desired_resources(self) -> Dict[str, Dict[str, Any]]:
+        """Everything the configuration asks for, keyed like the setup graph's tasks."""
+        resources: Dict[str, Dict[str, Any]] = {}
+        org_keys = {}
+        for org_type in ['fixed', 'flex']:
+            for org in self.config.get('organizations', {}).get(org_type, []):
+                key = f"org:{org['label']}"
+                org_keys[org['label'].lower()] = key
+                resources[key] = {'kind': 'organization', 'label': org['label'], 'parent': None,
+                                  'hash': config_hash(org), 'org': org, 'org_type': org_type}
+        
+        projects = self.config.get('projects', [])
+        for project in projects:
+            resources[f"project:{project['name']}"] = {
+                'kind': 'project', 'label': project['title'], 'hash': config_hash(project), 'project': project,
+                'parent': org_keys.get(self._project_org_label(project).lower())}
+        
+        for user in self.config.get('users', []):
+            for org_key in org_keys.values():
+                resources[f"invite:{user['email']}:{org_key}"] = {
+                    'kind': 'org_invitation', 'label': user['email'], 'parent': org_key,
+                    'hash': config_hash(user), 'user': user}
+            for project in projects:
+                project_key = f"project:{project['name']}"
+                resources[f"invite:{user['email']}:{project_key}"] = {
+                    'kind': 'project_invitation', 'label': user['email'], 'parent': project_key,
+                    'hash': config_hash(user), 'user': user}
+        
+        for project in projects:
+            for integration in self.config.get('integrations', []):
+                if self._integration_args(project, integration) is None:
+                    continue
+                resources[f"integration:{project['name']}:{integration['type']}"] = {
+                    'kind': 'integration', 'label': integration['type'], 'parent': f"project:{project['name']}",
+                    'hash': config_hash(integration), 'project': project, 'integration': integration}
+        return resources
+    
+    def record_state(self, state: Dict[str, Any], graph: TaskGraph):
+        """Record what a setup or plan run created, changed or deleted, and save it."""
+        desired = self.desired_resources()
+        for key, status in graph.status.items():
+            if status != 'done':
+                continue
+            if key not in desired:
+                state['resources'].pop(key, None)
+                continue
+            resource = desired[key]
+            result = graph.results.get(key)
+            state['resources'][key] = {'id': result if isinstance(result, str) else None, 'hash': resource['hash'],
+                                       'label': resource['label'], 'parent': resource['parent']}
+        self.save_state(state)
+    
+    def plan_changes(self, state: Dict[str, Any], live: bool = False) -> List[Dict[str, Any]]:
+        """Diff the configuration against the recorded state.
+        
+        Returns the changes to make, parents before children: 'create',
+        'update' (the configuration entry changed), 'adopt' (exists but was
+        not recorded; only with ``live``) and 'delete' (recorded but no
+        longer configured). With ``live`` the inventory is checked too, so
+        recorded organizations and projects that no longer exist are
+        created again.
+        """
+        resources = state['resources']
+        desired = self.desired_resources()
+        changes = []
+        actions: Dict[str, str] = {}
+        for key, resource in desired.items():
+            current = resources.get(key)
+            kind = {'organization': 'organizations', 'project': 'projects'}.get(resource['kind'])
+            if live and kind:
+                if current and current['id'] not in self.inventory.get(kind):
+                    current = None
+                live_id = None if current else self.inventory.find(kind, resource['label'])
+                if live_id:
+                    actions[key] = 'adopt'
+                    changes.append({'action': 'adopt', 'key': key, 'resource': resource,
+                                    'current': {'id': live_id}})
+                    continue
+            # A parent that is created again comes back without its invitations and integrations
+            if actions.get(resource['parent']) == 'create':
+                current = None
+            if current is None:
+                action = 'create'
+            elif current['hash'] != resource['hash']:
+                action = 'update'
+            else:
+                continue
+            actions[key] = action
+            changes.append({'action': action, 'key': key, 'resource': resource, 'current': current})
+        
+        for key, current in resources.items():
+            # Invitations and integrations of a deleted parent go with it
+            if key in desired or (self._belongs_to_parent(key) and current['parent'] not in desired):
+                continue
+            changes.append({'action': 'delete', 'key': key, 'resource': None, 'current': current})
+        # Children are deleted before their parents
+        deletes = [change for change in changes if change['action'] == 'delete']
+        deletes.sort(key=lambda change: change['current'].get('parent') is None)
+        return [change for change in changes if change['action'] != 'delete'] + deletes
+    
+    def print_plan(self, changes: List[Dict[str, Any]], unchanged: int):
+        """Print a plan, one line per change."""
+        symbols = {'create': '+', 'update': '~', 'adopt': '=', 'delete': '-'}
+        counts = {action: sum(1 for change in changes if change['action'] == action) for action in symbols}
+        print(f"Plan: {counts['create']} to create, {counts['update']} to update, "
+              f"{counts['adopt']} to adopt, {counts['delete']} to delete, {unchanged} unchanged")
+        for change in changes:
+            entry = change['resource'] or change['current']
+            print(f"  {symbols[change['action']]} {change['key']} ({entry['label']})")
+    
+    def _delete_action(self, key: str, current: Dict[str, Any], resources: Dict[str, Any]) -> Callable[[], Any]:
+        """The CLI call that removes one recorded resource."""
+        parent_id = resources.get(current.get('parent'), {}).get('id')
+        kind = key.split(':', 1)[0]
+        if kind == 'org':
+            return partial(self.delete_organization, current['id'])
+        if kind == 'project':
+            return partial(self.run_cli, ['project:delete', '--project', current['id'], '--yes'])
+        if kind == 'integration':
+            return partial(self.delete_integration, current['label'], parent_id)
+        if current['parent'].startswith('org:'):
+            return partial(self.run_cli, ['organization:user:delete', '--org', parent_id, current['label'], '--yes'])
+        return partial(self.run_cli, ['user:delete', current['label'], '--project', parent_id, '--yes'])
+    
+    def build_plan_graph(self, state: Dict[str, Any], changes: List[Dict[str, Any]]) -> TaskGraph:
+        """Build a task graph that makes only the planned changes."""
+        graph = TaskGraph()
+        resources = state['resources']
+        ids = {key: entry['id'] for key, entry in resources.items()}
+        for change in changes:
+            key, resource, current = change['key'], change['resource'], change['current']
+            if change['action'] == 'adopt':
+                ids[key] = current['id']
+                continue
+            if change['action'] == 'delete':
+                # An organization waits until its projects are gone
+                children = [other['key'] for other in changes
+                            if other['action'] == 'delete' and other['current'].get('parent') == key]
+                graph.add(key, f"Deletion of {key}", self._delete_action(key, current, resources),
+                          [child for child in children if child in graph.tasks])
+                continue
+            
+            # Wait for the parent if it is being created; otherwise its ID is already known
+            parent = resource['parent']
+            depends_on = [parent] if parent in graph.tasks else []
+            known = [] if depends_on or not parent else [ids.get(parent)]
+            kind = resource['kind']
+            if kind == 'organization':
+                action = partial(self.execute_organization, resource['org'], resource['org_type'])
+            elif kind == 'project' and change['action'] == 'update':
+                action = partial(self.update_project, resource['project'], current['id'])
+            elif kind == 'project':
+                action = partial(self.execute_project, resource['project'], *known)
+            elif kind == 'org_invitation':
+                action = partial(self.execute_org_invitation, resource['user'], *known)
+            elif kind == 'project_invitation':
+                action = partial(self.execute_project_invitation, resource['user'], *known)
+            elif change['action'] == 'update':
+                # Integrations are replaced rather than edited
+                action = partial(self._replace_integration, resource['project'], resource['integration'], *known)
+            else:
+                action = partial(self.execute_integration, resource['project'], resource['integration'], *known)
+            graph.add(key, f"{change['action'].title()} {key}", action, depends_on)
+        return graph
+    
+    def _replace_integration(self, project: Dict[str, Any], integration: Dict[str, Any], project_id: str):
+        """Remove a project's integration of this type and add it again as configured."""
+        self.delete_integration(integration['type'], project_id)
+        self.execute_integration(project, integration, project_id)
+    
+    def plan(self, state: Dict[str, Any], live: bool = False) -> List[Dict[str, Any]]:
+        """Diff the configuration against the state and print the plan."""
+        if live:
+            print("Listing existing organizations and projects...")
+        changes = self.plan_changes(state, live)
+        unchanged = len(self.desired_resources()) - sum(1 for change in changes if change['action'] != 'delete')
+        self.print_plan(changes, unchanged)
+        return changes
+    
+    def execute_plan(self, max_workers: int = 4) -> bool:
+        """Make only the changes the plan calls for; returns True if every one succeeded."""
+        try:
+            self.run_cli(['auth:info'])
+        except CliError:
+            print(f"❌ You are not logged in to Upsun. Please run: {self.cli('auth:browser-login')}")
+            return False
+        
+        state = self.load_state()
+        changes = self.plan(state, live=True)
+        for change in changes:
+            if change['action'] == 'adopt':
+                resource = change['resource']
+                state['resources'][change['key']] = {'id': change['current']['id'], 'hash': resource['hash'],
+                                                     'label': resource['label'], 'parent': resource['parent']}
+        graph = self.build_plan_graph(state, changes)
+        if not graph.tasks:
+            self.save_state(state)
+            print("Nothing to do: the ecosystem matches the configuration.")
+            return True
+        
+        print(f"🚀 Applying {len(graph.tasks)} changes, up to {max_workers} at a time...")
+        started = time.monotonic()
+        status = list(graph.run(max_workers).values())
+        self.record_state(state, graph)
+        failed, skipped = status.count('failed'), status.count('skipped')
+        print(f"Apply finished in {time.monotonic() - started:.0f}s: "
+              f"{status.count('done')} completed, {failed} failed, {skipped} skipped")
+        return not failed and not skipped
+    
+    def generate_state_commands(self) -> List[str]:
+        """Generate the shell helpers that journal changes for the next plan to fold into the state file."""
+        journal = shlex.quote(f"{os.path.abspath(self.state_file)}.journal")
+        return [
+            "# State journal: what this script changed, read back by the next --action plan",
+            f"state_journal={journal}",
+            "",
+            "state_record() {",
+            "  # $1: the state entry as JSON members; then its ID, or the kind and label to look it up by",
+            "  local id=\"$2\"",
+            "  if [ $# -eq 3 ]; then",
+            "    id=$(inventory_find \"$2\" \"$3\") || return 0",
+            "  fi",
+            "  printf '{\"id\": \"%s\", %s}\\n' \"$id\" \"$1\" >> \"$state_journal\"",
+            "}",
+            "",
+            "state_forget() {",
+            "  printf '{\"key\": %s, \"deleted\": true}\\n' \"$1\" >> \"$state_journal\"",
+            "}",
+            "",
+        ]
+    
+    def generate_plan_commands(self, state: Dict[str, Any], changes: List[Dict[str, Any]]) -> List[str]:
+        """Generate a script that makes only the planned changes."""
+        resources = state['resources']
+        desired = self.desired_resources()
+        commands = (self.generate_rate_limit_commands() + self.generate_inventory_commands()
+                    + self.generate_state_commands() + self.generate_auth_commands())
+        
+        def record(change: Dict[str, Any], known_id: Optional[str] = None) -> str:
+            resource = change['resource']
+            entry = json.dumps({'key': change['key'], 'hash': resource['hash'],
+                                'label': resource['label'], 'parent': resource['parent']})[1:-1]
+            kind = {'organization': 'organizations', 'project': 'projects'}.get(resource['kind'])
+            if known_id:
+                return f"state_record {shlex.quote(entry)} {shlex.quote(known_id)}"
+            lookup = f" {kind} {shlex.quote(resource['label'])}" if kind else ""
+            return f"state_record {shlex.quote(entry)}{lookup}"
+        
+        creates = [change for change in changes if change['action'] == 'create']
+        organizations: Dict[str, List[Dict[str, Any]]] = {'fixed': [], 'flex': []}
+        for change in creates:
+            if change['resource']['kind'] == 'organization':
+                organizations[change['resource']['org_type']].append(change['resource']['org'])
+        if organizations['fixed'] or organizations['flex']:
+            commands.extend(self.generate_organization_commands(organizations))
+        projects = [change['resource']['project'] for change in creates if change['resource']['kind'] == 'project']
+        if projects:
+            commands.extend(self.generate_project_commands(projects))
+        
+        commands.append("# Apply the remaining changes and record them")
+        for change in changes:
+            key, resource, current = change['key'], change['resource'], change['current']
+            kind = resource['kind'] if resource else None
+            commands.append(f"# {change['action'].title()} {key}")
+            if change['action'] == 'delete':
+                parent_id = shlex.quote(str(resources.get(current.get('parent'), {}).get('id')))
+                label = shlex.quote(current['label'])
+                resource_type = key.split(':', 1)[0]
+                if resource_type == 'org':
+                    command = f"{self.api('organization:delete')} --org {shlex.quote(current['id'])} --yes"
+                elif resource_type == 'project':
+                    command = f"{self.api('project:delete')} --project {shlex.quote(current['id'])} --yes"
+                elif resource_type == 'integration':
+                    commands.append(f"integration_id=$({self.api('integration:list')} --project {parent_id} --format tsv --no-header --columns id,type"
+                                    f" | awk -F'\\t' -v type={label} '$2 == type {{print $1; exit}}')")
+                    command = f"[ -n \"$integration_id\" ] && {self.api('integration:delete')} \"$integration_id\" --project {parent_id} --yes"
+                elif current['parent'].startswith('org:'):
+                    command = f"{self.api('organization:user:delete')} --org {parent_id} {label} --yes"
+                else:
+                    command = f"{self.api('user:delete')} {label} --project {parent_id} --yes"
+                commands.append(f"if {command}; then")
+                commands.append(f"  state_forget {shlex.quote(json.dumps(key))}")
+                commands.append("else")
+                failure = shlex.quote(f"  ⚠ Failed to delete {key}")
+                commands.append(f"  echo {failure}")
+                commands.append("fi")
+                continue
+            if kind in ('organization', 'project') and change['action'] == 'create':
+                # Created above; record them under the IDs they were given
+                commands.append(record(change))
+                continue
+            if kind == 'organization':
+                # Only local fields changed; there is nothing to apply
+                commands.append(record(change, current['id']))
+                continue
+            if kind == 'project':
+                title = shlex.quote(resource['label'])
+                commands.append(f"if {self.api('project:info')} --project {shlex.quote(current['id'])} title {title}; then")
+                commands.append("  inventory_stale projects")
+                commands.append(f"  {record(change, current['id'])}")
+                commands.append("fi")
+                continue
+            
+            # Invitations and integrations: find the organization or project they belong to
+            parent = desired[resource['parent']]
+            parent_kind = 'organizations' if parent['kind'] == 'organization' else 'projects'
+            commands.append(f"target_id=$(inventory_find {parent_kind} {shlex.quote(parent['label'])} || true)")
+            email = shlex.quote(resource['label'])
+            if kind == 'org_invitation':
+                command = f"{self.api('organization:user:add')} --org \"$target_id\" {email} --permission projects:create --permission projects:list --yes"
+            elif kind == 'project_invitation':
+                command = f"{self.api('user:add')} --project \"$target_id\" {email} --role admin --yes"
+            else:
+                if change['action'] == 'update':
+                    # Integrations are replaced rather than edited
+                    commands.append(f"integration_id=$({self.api('integration:list')} --project \"$target_id\" --format tsv --no-header --columns id,type"
+                                    f" | awk -F'\\t' -v type={email} '$2 == type {{print $1; exit}}' || true)")
+                    commands.append(f"[ -z \"$integration_id\" ] || {self.api('integration:delete')} \"$integration_id\" --project \"$target_id\" --yes || true")
+                args = ' '.join(shlex.quote(arg) for arg in self._integration_args(resource['project'], resource['integration']))
+                command = f"{self.api('integration:add')} --project \"$target_id\" {args}"
+            commands.append(f"if [ -n \"$target_id\" ] && {command}; then")
+            commands.append(f"  {record(change)}")
+            commands.append("else")
+            failure = shlex.quote(f"  ⚠ Failed to {change['action']} {key}")
+            commands.append(f"  echo {failure}")
+            commands.append("fi")
+        return commands
+    
     def create_local_directories(self) -> List[str]:
         """Create local project directories."""
         commands = []
@@ -605,15 +1805,42 @@ class DemoEcosystemManager:
 def main():
     parser = argparse.ArgumentParser(description='Upsun Demo Ecosystem Manager')
     parser.add_argument('--config', default='demo-config.json', help='Configuration file path')
-    parser.add_argument('--action', choices=['setup', 'cleanup', 'both'], default='both', help='Action to perform')
+    parser.add_argument('--action', choices=['setup', 'cleanup', 'both', 'plan'], default='both',
+                        help='Action to perform; plan makes only the changes since the last run')
     parser.add_argument('--output', help='Output file for generated commands')
     parser.add_argument('--create-dirs', action='store_true', help='Create local project directories')
+    parser.add_argument('--execute', action='store_true', help='Run the setup or cleanup directly instead of generating a script')
+    parser.add_argument('--max-workers', type=int, default=4, help='Steps to run at once with --execute, and deletions in cleanup scripts')
+    parser.add_argument('--inventory-cache', help='JSON file to keep organization and project listings in with --execute')
+    parser.add_argument('--inventory-ttl', type=float, default=300, help='Seconds a cached listing stays valid')
+    parser.add_argument('--state', help='State file recording what has been created (default: <config>.state.json)')
     
     args = parser.parse_args()
     
-    manager = DemoEcosystemManager(args.config)
+    manager = DemoEcosystemManager(args.config, args.inventory_cache, args.inventory_ttl, args.state)
+    run_failed = False
     
-    if args.action in ['setup', 'both']:
+    if args.action == 'plan':
+        if args.execute:
+            run_failed = not manager.execute_plan(max(1, args.max_workers))
+        else:
+            state = manager.load_state()
+            changes = manager.plan(state)
+            if changes:
+                manager.save_commands_to_file(manager.generate_plan_commands(state, changes),
+                                              args.output or 'plan-demo-ecosystem.sh')
+            print("Done!")
+        if run_failed:
+            sys.exit(1)
+        return
+    
+    if args.execute and args.action in ['setup', 'both']:
+        if args.create_dirs:
+            for project in manager.config['projects']:
+                if 'local_directory' in project:
+                    os.makedirs(project['local_directory'], exist_ok=True)
+        run_failed = not manager.execute_setup(max(1, args.max_workers))
+    elif args.action in ['setup', 'both']:
         print("Generating setup commands...")
         setup_commands = manager.generate_setup_commands()
         
@@ -625,9 +1852,11 @@ def main():
         else:
             manager.save_commands_to_file(setup_commands, 'setup-demo-ecosystem.sh')
     
-    if args.action in ['cleanup', 'both']:
+    if args.execute and args.action == 'cleanup':
+        run_failed = not manager.execute_cleanup(max(1, args.max_workers))
+    elif args.action in ['cleanup', 'both']:
         print("Generating cleanup commands...")
-        cleanup_commands = manager.generate_cleanup_commands()
+        cleanup_commands = manager.generate_cleanup_commands(max(1, args.max_workers))
         
         if args.output:
             cleanup_filename = args.output.replace('.sh', '-cleanup.sh')
@@ -636,7 +1865,13 @@ def main():
         
         manager.save_commands_to_file(cleanup_commands, cleanup_filename)
     
-    print("Done! Generated command files are ready to execute.")
+    if args.execute and args.action in ['setup', 'cleanup']:
+        print("Done!")
+    else:
+        print("Done! Generated command files are ready to execute.")
+    
+    if run_failed:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Alert rules benchmark for EMEA Yacht IoT Services
+
+Measures how many readings per second the alert engine evaluates as the
+rule count grows, against a naive evaluator that tests every applicable
+rule on every reading. Rules are a mix of per-yacht and (one in ten) fleet-wide
+threshold, rate-of-change and geofence rules; readings are random walks
+for a fleet of yachts, so some rules fire and resolve as they go. Runs
+in memory, no database needed.
+
+Usage:
+    python benchmarks/alert_rules.py
+    python benchmarks/alert_rules.py --rules 100 1000 10000 --readings 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from yacht_iot.alerts import OPERATORS, AlertEngine, Fence, RuleRow  # noqa: E402
+
+METRICS = {
+    'speed_knots': (0, 30),
+    'engine_rpm': (600, 2400),
+    'engine_temp_c': (70, 100),
+    'fuel_rate_lph': (5, 60),
+    'battery_voltage': (11.8, 13.2),
+}
+
+UPDATED_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def generate_rules(count, yachts):
+    rules = []
+    for rule_id in range(1, count + 1):
+        yacht_id = random.randint(1, yachts) if random.random() < 0.9 else None
+        kind = random.choices(['threshold', 'rate_of_change', 'geofence'], [6, 2, 2])[0]
+        metric = operator = threshold = geofence = trigger = None
+        if kind == 'geofence':
+            lat, lon = random.uniform(36, 46), random.uniform(-5, 20)
+            geofence = {'lat': lat, 'lon': lon, 'radius_nm': random.uniform(2, 30)}
+            trigger = random.choice(['enter', 'exit'])
+        else:
+            metric = random.choice(list(METRICS))
+            operator = random.choice(list(OPERATORS))
+            low, high = METRICS[metric]
+            threshold = (random.uniform(low, high) if kind == 'threshold'
+                         else random.uniform(1, 10) * (high - low) / 100)
+        rules.append(RuleRow(rule_id, f'rule {rule_id}', kind, yacht_id, metric, operator,
+                             threshold, geofence, trigger, UPDATED_AT))
+    return rules
+
+
+def generate_readings(count, yachts):
+    start = datetime.now(timezone.utc) - timedelta(seconds=count)
+    state = {yacht_id: {'latitude': random.uniform(36, 46), 'longitude': random.uniform(-5, 20),
+                        **{m: random.uniform(*bounds) for m, bounds in METRICS.items()}}
+             for yacht_id in range(1, yachts + 1)}
+    readings = []
+    for i in range(count):
+        yacht_id = i % yachts + 1
+        values = state[yacht_id]
+        values['latitude'] += random.uniform(-0.01, 0.01)
+        values['longitude'] += random.uniform(-0.01, 0.01)
+        for metric, (low, high) in METRICS.items():
+            values[metric] = min(high, max(low, values[metric] + random.gauss(0, (high - low) / 200)))
+        readings.append((yacht_id, start + timedelta(seconds=i), values['latitude'], values['longitude'],
+                         values['speed_knots'], random.uniform(0, 360), values['engine_rpm'],
+                         values['engine_temp_c'], values['fuel_rate_lph'], values['battery_voltage'],
+                         1000.0))
+    return readings
+
+
+class NaiveEvaluator:
+    """Every applicable rule tested against every reading, with per-rule state"""
+
+    COLUMNS = {'latitude': 2, 'longitude': 3, 'speed_knots': 4, 'engine_rpm': 6,
+               'engine_temp_c': 7, 'fuel_rate_lph': 8, 'battery_voltage': 9}
+
+    def __init__(self, rules):
+        self.rules = [(rule, Fence(rule) if rule.kind == 'geofence' else None) for rule in rules]
+        self.breached = set()
+        self.last = {}
+
+    def evaluate(self, rows):
+        alerts = 0
+        for row in rows:
+            yacht_id, ts = row[0], row[1].timestamp()
+            for rule, fence in self.rules:
+                if rule.yacht_id is not None and rule.yacht_id != yacht_id:
+                    continue
+                if fence is not None:
+                    breached = fence.contains(row[2], row[3]) == (rule.trigger == 'enter')
+                else:
+                    value = row[self.COLUMNS[rule.metric]]
+                    if rule.kind == 'rate_of_change':
+                        then, previous = self.last.get((yacht_id, rule.metric), (None, None))
+                        if then is None or ts <= then:
+                            continue
+                        value = (value - previous) / (ts - then) * 60
+                    find, prefix = OPERATORS[rule.operator]
+                    breached = find([rule.threshold], value) == (1 if prefix else 0)
+                key = (rule.id, yacht_id)
+                if breached != (key in self.breached):
+                    alerts += 1
+                    (self.breached.add if breached else self.breached.discard)(key)
+            for metric, column in self.COLUMNS.items():
+                self.last[(yacht_id, metric)] = (ts, row[column])
+        return alerts
+
+
+def measure(evaluate, readings, chunk):
+    started = time.perf_counter()
+    alerts = 0
+    for i in range(0, len(readings), chunk):
+        alerts += evaluate(readings[i:i + chunk])
+    return time.perf_counter() - started, alerts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Alert rules benchmark')
+    parser.add_argument('--rules', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Rule counts to benchmark')
+    parser.add_argument('--readings', type=int, default=100000, help='Readings to evaluate')
+    parser.add_argument('--yachts', type=int, default=500, help='Yachts in the fleet')
+    parser.add_argument('--naive-readings', type=int, default=5000,
+                        help='Readings for the naive evaluator (it is slow)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    readings = generate_readings(args.readings, args.yachts)
+    print(f"{args.readings} readings from {args.yachts} yachts")
+    print(f"{'rules':>6} {'compile ms':>11} {'readings/s':>11} {'rule evals/s':>13} "
+          f"{'alerts':>7} {'naive readings/s':>17} {'speedup':>8}")
+    for count in args.rules:
+        rules = generate_rules(count, args.yachts)
+        engine = AlertEngine()
+        started = time.perf_counter()
+        engine.load_rules(rules)
+        compile_ms = (time.perf_counter() - started) * 1000
+        seconds, alerts = measure(lambda rows: len(engine.evaluate(rows)), readings, 10000)
+        rate = args.readings / seconds
+
+        naive = NaiveEvaluator(rules)
+        sample = readings[:args.naive_readings]
+        naive_seconds, _ = measure(naive.evaluate, sample, 10000)
+        naive_rate = len(sample) / naive_seconds
+        print(f"{count:>6} {compile_ms:>11.1f} {rate:>11.0f} {rate * count:>13.3g} "
+              f"{alerts:>7} {naive_rate:>17.0f} {rate / naive_rate:>7.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Fleet analytics benchmark for EMEA Yacht IoT Services
+
+Runs the vectorized fuel-efficiency and speed-profile statistics from
+analytics.py against a pure-Python reference on the same synthetic fleet,
+checks that both agree, and reports the time each takes. With --db, also
+times reading a telemetry window through RealDictCursor rows against the
+binary COPY decode, using the same DB_* environment variables as the app.
+
+Usage:
+    python benchmarks/analytics_vectorized.py --yachts 50 --readings 20000
+    python benchmarks/analytics_vectorized.py --db --days 7
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from yacht_iot import analytics  # noqa: E402
+from yacht_iot.schema import TELEMETRY_TABLE  # noqa: E402
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': os.environ.get('DB_PORT', '5432'),
+    'database': os.environ.get('DB_DATABASE', 'yacht_iot'),
+    'user': os.environ.get('DB_USERNAME', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', '')
+}
+
+
+def generate_fleet(yachts, readings):
+    """Synthetic readings as a list of row tuples, ordered by yacht and time"""
+    rows = []
+    start = datetime(2024, 6, 1, tzinfo=timezone.utc).timestamp()
+    for yacht_id in range(1, yachts + 1):
+        lat, lon, t = random.uniform(35, 55), random.uniform(-5, 25), start
+        for i in range(readings):
+            t += random.choice((10, 10, 10, 30, 900))
+            lat += random.uniform(-0.002, 0.002)
+            lon += random.uniform(-0.002, 0.002)
+            speed = random.gauss(12, 3) if i % 97 else None
+            fuel = random.uniform(10, 60) if i % 53 else None
+            rows.append((yacht_id, t, lat, lon, speed, fuel))
+    return rows
+
+
+def to_columns(rows):
+    columns = list(zip(*rows))
+    data = {'yacht_id': np.array(columns[0], dtype=np.int64)}
+    for name, values in zip(analytics.WINDOW_COLUMNS, columns[1:]):
+        data[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return data
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * analytics.EARTH_RADIUS_NM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _percentile(values, pct):
+    """Linear interpolation, as numpy.percentile does by default"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _mean_std(values):
+    mean = sum(values) / len(values)
+    return mean, math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+
+
+def _by_yacht(rows):
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[0], []).append(row)
+    return groups
+
+
+def reference_fuel_efficiency(rows, max_gap=analytics.MAX_GAP_SECONDS):
+    results = []
+    for yacht_id, readings in _by_yacht(rows).items():
+        distance = fuel = hours = 0.0
+        for prev, cur in zip(readings, readings[1:]):
+            distance += _haversine(prev[2], prev[3], cur[2], cur[3])
+            elapsed = cur[1] - prev[1]
+            if elapsed <= max_gap:
+                hours += elapsed / 3600
+                if prev[5] is not None and cur[5] is not None:
+                    fuel += (prev[5] + cur[5]) / 2 * elapsed / 3600
+        results.append({'yacht_id': yacht_id, 'distance_nm': distance, 'fuel_litres': fuel,
+                        'hours': hours, 'nm_per_litre': distance / fuel if fuel else None})
+    return results
+
+
+def reference_speed_profile(rows, window=60, z_threshold=3.0):
+    results = []
+    for yacht_id, readings in _by_yacht(rows).items():
+        speeds = [r[4] for r in readings]
+        present = [s for s in speeds if s is not None]
+        mean, std = _mean_std(present)
+        best = None
+        for i in range(len(speeds)):
+            recent = [s for s in speeds[max(0, i + 1 - window):i + 1] if s is not None]
+            if recent:
+                rolling = sum(recent) / len(recent)
+                best = rolling if best is None else max(best, rolling)
+        anomalies = sum(1 for s in present if std and abs((s - mean) / std) > z_threshold)
+        results.append({'yacht_id': yacht_id, 'p50': _percentile(present, 50),
+                        'p90': _percentile(present, 90), 'p99': _percentile(present, 99),
+                        'mean': mean, 'std': std, 'max_rolling_mean': best,
+                        'anomalies': anomalies})
+    return results
+
+
+def compare(vectorized, reference, keys):
+    """Largest difference between the two implementations
+
+    Relative for values above 1, absolute below; the API rounds to three
+    decimals, so anything under 1e-3 is agreement.
+    """
+    worst = 0.0
+    for got, want in zip(vectorized, reference):
+        assert got['yacht_id'] == want['yacht_id']
+        for key in keys:
+            if want[key] is None or got[key] is None:
+                assert want[key] is None and got[key] is None, (key, got, want)
+                continue
+            scale = max(abs(want[key]), 1.0)
+            worst = max(worst, abs(got[key] - want[key]) / scale)
+    return worst
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def bench_compute(yachts, readings, window):
+    rows = generate_fleet(yachts, readings)
+    data = to_columns(rows)
+    print(f"{len(rows)} readings across {yachts} yachts\n")
+    print(f"{'statistic':<16} {'python s':>10} {'numpy s':>10} {'speedup':>9} {'max diff':>13}")
+
+    cases = (
+        ('fuel-efficiency', analytics.fuel_efficiency, reference_fuel_efficiency, (),
+         ('distance_nm', 'fuel_litres', 'hours', 'nm_per_litre')),
+        ('speed-profile', analytics.speed_profile, reference_speed_profile, (window,),
+         ('p50', 'p90', 'p99', 'mean', 'std', 'max_rolling_mean', 'anomalies')),
+    )
+    for name, vectorized, reference, options, keys in cases:
+        got, numpy_s = timed(vectorized, data, *options)
+        want, python_s = timed(reference, rows, *options, repeat=1)
+        diff = compare(got, want, keys)
+        print(f"{name:<16} {python_s:>10.3f} {numpy_s:>10.4f} {python_s / numpy_s:>8.0f}x {diff:>13.2e}")
+        if diff > 1e-3:
+            print(f"  {name}: results differ from the reference")
+            return 1
+    return 0
+
+
+def bench_fetch(days):
+    conn = psycopg2.connect(**DB_CONFIG)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+    try:
+        def dict_rows():
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"SELECT yacht_id, recorded_at, {', '.join(analytics.WINDOW_COLUMNS[1:])} "
+                    f"FROM {TELEMETRY_TABLE} WHERE recorded_at >= %s AND recorded_at < %s "
+                    f"ORDER BY yacht_id, recorded_at", (start, end))
+                return cur.fetchall()
+
+        def copy_columns():
+            with conn.cursor() as cur:
+                return analytics.fetch_window(cur, start, end)
+
+        rows, dict_s = timed(dict_rows)
+        data, copy_s = timed(copy_columns)
+        conn.rollback()
+    finally:
+        conn.close()
+    print(f"\nFetching {len(rows)} readings from the last {days} days")
+    print(f"  RealDictCursor: {dict_s:.3f}s")
+    print(f"  binary COPY:    {copy_s:.3f}s ({dict_s / copy_s:.1f}x)")
+    return 0 if len(rows) == len(data['yacht_id']) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized analytics benchmark')
+    parser.add_argument('--yachts', type=int, default=20, help='Yachts in the synthetic fleet')
+    parser.add_argument('--readings', type=int, default=5000, help='Readings per yacht')
+    parser.add_argument('--window', type=int, default=60, help='Rolling mean window in readings')
+    parser.add_argument('--db', action='store_true', help='Also time fetching a window from the database')
+    parser.add_argument('--days', type=int, default=7, help='Window length for --db')
+    args = parser.parse_args()
+
+    random.seed(42)
+    status = bench_compute(args.yachts, args.readings, args.window)
+    if args.db:
+        status = status or bench_fetch(args.days)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Batch upload benchmark for EMEA Yacht IoT Services
+
+Compares the server-side cost of a catch-up upload sent as gzipped JSON
+(parse_readings + to_row + text COPY) with the same readings sent as a
+columnar batch (decompress + decode_batch + binary COPY encoding): bytes
+on the wire, time to a COPY-ready buffer and peak Python memory. With
+--db each buffer is also loaded into a temporary table, using the same
+DB_* environment variables as the app.
+
+Usage:
+    python benchmarks/batch_upload.py --readings 36000
+    python benchmarks/batch_upload.py --readings 36000 --db
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from yacht_iot import batches  # noqa: E402
+from yacht_iot.telemetry import TELEMETRY_COLUMNS, _copy_value, parse_readings, to_row  # noqa: E402
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': os.environ.get('DB_PORT', '5432'),
+    'database': os.environ.get('DB_DATABASE', 'yacht_iot'),
+    'user': os.environ.get('DB_USERNAME', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', '')
+}
+
+TABLE = 'bench_batch_telemetry'
+COLUMN_LIST = ', '.join(TELEMETRY_COLUMNS)
+
+
+def generate_columns(count):
+    """One yacht's readings every 3 seconds, a slow drift like a real passage"""
+    start = datetime.now(timezone.utc) - timedelta(seconds=3 * count)
+    lat, lon = 43.5, 7.2
+    columns = {name: [] for name, _ in batches.BATCH_COLUMNS}
+    for i in range(count):
+        lat += random.uniform(-0.0001, 0.0002)
+        lon += random.uniform(-0.0001, 0.0002)
+        columns['recorded_at'].append(start + timedelta(seconds=3 * i))
+        columns['latitude'].append(round(lat, 6))
+        columns['longitude'].append(round(lon, 6))
+        columns['speed_knots'].append(round(random.uniform(6, 9), 1))
+        columns['heading'].append(round(random.uniform(80, 100), 1))
+        columns['engine_rpm'].append(float(random.randrange(1400, 1600, 10)))
+        columns['engine_temp_c'].append(round(random.uniform(80, 88), 1) if i % 10 else None)
+        columns['fuel_rate_lph'].append(round(random.uniform(25, 35), 1))
+        columns['battery_voltage'].append(round(random.uniform(12.4, 12.8), 2))
+        columns['engine_hours'].append(round(1000 + i * 3 / 3600, 3))
+    return columns
+
+
+def json_body(yacht_id, columns):
+    readings = [{'yacht_id': yacht_id, **{name: (values[i].isoformat() if name == 'recorded_at'
+                                                 else values[i]) for name, values in columns.items()}}
+                for i in range(len(columns['recorded_at']))]
+    return gzip.compress(json.dumps(readings).encode())
+
+
+def decode_json(body):
+    rows = [to_row(r) for r in parse_readings(gzip.decompress(body), 'application/json')]
+    buf = io.StringIO()
+    for row in rows:
+        buf.write('\t'.join(_copy_value(v) for v in row))
+        buf.write('\n')
+    return buf.getvalue().encode()
+
+
+def decode_batch(body, encoding):
+    data = batches.decompress(body, encoding, 1 << 30)
+    return batches.encode_copy(batches.decode_batch(data))
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch upload benchmark')
+    parser.add_argument('--readings', type=int, default=36000, help='Readings in the upload')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case (best is reported)')
+    parser.add_argument('--db', action='store_true', help='Also COPY each buffer into a temp table')
+    args = parser.parse_args()
+
+    columns = generate_columns(args.readings)
+    cases = [('JSON + gzip', json_body(1, columns), decode_json, '')]
+    for encoding in ('gzip', 'zstd'):
+        if encoding == 'zstd' and batches.zstandard is None:
+            print("zstandard is not installed, skipping zstd")
+            continue
+        body = batches.encode_batch(1, 1, columns, encoding)
+        cases.append((f'batch + {encoding}', body,
+                      lambda body, encoding=encoding: decode_batch(body, encoding), 'binary'))
+
+    conn = psycopg2.connect(**DB_CONFIG) if args.db else None
+    if conn:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE {TABLE} (LIKE telemetry INCLUDING DEFAULTS)")
+        conn.commit()
+
+    print(f"{'format':<14} {'wire bytes':>11} {'decode ms':>10} {'readings/s':>11} "
+          f"{'peak MB':>8}" + (f" {'COPY ms':>8}" if conn else ''))
+    for name, body, decode, copy_format in cases:
+        buffer, seconds, peak = measure(lambda: decode(body), args.repeat)
+        line = (f"{name:<14} {len(body):>11} {seconds * 1000:>10.1f} "
+                f"{args.readings / seconds:>11.0f} {peak / 1e6:>8.1f}")
+        if conn:
+            options = ' WITH (FORMAT binary)' if copy_format else ''
+            started = time.perf_counter()
+            with conn.cursor() as cur:
+                cur.copy_expert(f"COPY {TABLE} ({COLUMN_LIST}) FROM STDIN{options}", io.BytesIO(buffer))
+            conn.rollback()
+            line += f" {(time.perf_counter() - started) * 1000:>8.1f}"
+        print(line)
+    if conn:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+JSON serialization benchmark for EMEA Yacht IoT Services
+
+Compares the bytes/sec of the original response path (RealDictCursor rows
+through Flask's default stdlib provider) with the tuple-cursor paths in
+serialization.py, under orjson and under the stdlib fallback. Rows are
+synthetic yachts with Decimal, datetime and UUID columns; with --db the
+rows are fetched from the yachts table instead, fetch time included, using
+the same DB_* environment variables as the app.
+
+Usage:
+    python benchmarks/json_serialization.py --rows 20000
+    python benchmarks/json_serialization.py --db
+"""
+
+import argparse
+import decimal
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from yacht_iot import serialization  # noqa: E402
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': os.environ.get('DB_PORT', '5432'),
+    'database': os.environ.get('DB_DATABASE', 'yacht_iot'),
+    'user': os.environ.get('DB_USERNAME', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', '')
+}
+
+COLUMNS = ['id', 'name', 'model', 'length_m', 'home_port', 'registered_at', 'device_id']
+
+
+def generate_rows(count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [(i, f'Yacht {i}', f'Model {i % 40}', decimal.Decimal(f'{20 + i % 60}.50'),
+             f'Port {i % 25}', start + timedelta(minutes=i), uuid.uuid4())
+            for i in range(1, count + 1)]
+
+
+def measure(function, repeat):
+    best, size = None, 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(function())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return size, best
+
+
+def synthetic_cases(rows):
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    dict_rows = [dict(zip(COLUMNS, row)) for row in rows]
+    return [
+        ('default provider, dict rows', lambda: default.dumps(dict_rows, separators=(',', ':')).encode()),
+        ('dumps_rows, tuple rows', lambda: serialization.dumps_rows(COLUMNS, rows)),
+        ('dumps_columns, tuple rows', lambda: serialization.dumps_columns(COLUMNS, rows)),
+    ]
+
+
+def db_cases(conn):
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+
+    def current():
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('SELECT * FROM yachts ORDER BY id')
+            return default.dumps(cur.fetchall(), separators=(',', ':')).encode()
+
+    def tuples(encode):
+        def run():
+            with conn.cursor() as cur:
+                cur.execute('SELECT * FROM yachts ORDER BY id')
+                rows = cur.fetchall()
+                return encode([d[0] for d in cur.description], rows)
+        return run
+
+    return [
+        ('RealDictCursor + default provider', current),
+        ('tuple cursor + dumps_rows', tuples(serialization.dumps_rows)),
+        ('tuple cursor + dumps_columns', tuples(serialization.dumps_columns)),
+    ]
+
+
+def run_cases(cases, repeat):
+    """Time the original path first, then each fast path under both encoders
+
+    Speedup compares wall time for the same rows; the columns form writes
+    fewer bytes, so its MB/s understates it.
+    """
+    (name, function), fast_paths = cases[0], cases[1:]
+    size, baseline = measure(function, repeat)
+    print(f"{name:<46} {size:>11} {baseline * 1000:>9.1f} {size / baseline / 1e6:>9.1f} {1:>7.1f}x")
+
+    saved = serialization.orjson
+    for encoder in ('orjson', 'stdlib'):
+        if encoder == 'orjson' and saved is None:
+            print("orjson is not installed, skipping")
+            continue
+        serialization.orjson = saved if encoder == 'orjson' else None
+        try:
+            for name, function in fast_paths:
+                size, seconds = measure(function, repeat)
+                print(f"{name + ' (' + encoder + ')':<46} {size:>11} {seconds * 1000:>9.1f} "
+                      f"{size / seconds / 1e6:>9.1f} {baseline / seconds:>7.1f}x")
+        finally:
+            serialization.orjson = saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON serialization benchmark')
+    parser.add_argument('--rows', type=int, default=20000, help='Synthetic rows to encode')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case (best is reported)')
+    parser.add_argument('--db', action='store_true', help='Fetch rows from the yachts table instead')
+    args = parser.parse_args()
+
+    print(f"{'path':<46} {'bytes':>11} {'ms':>9} {'MB/s':>9} {'speedup':>8}")
+    if args.db:
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            run_cases(db_cases(conn), args.repeat)
+        finally:
+            conn.close()
+    else:
+        run_cases(synthetic_cases(generate_rows(args.rows)), args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
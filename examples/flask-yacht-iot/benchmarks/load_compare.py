@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Sync vs async load comparison for EMEA Yacht IoT Services
+
+Starts the app under gunicorn twice with the same number of worker
+processes, once with sync workers (yacht_iot.wsgi:app) and once with
+uvicorn workers (yacht_iot.asgi:app), then drives each with 10, 100 and 1000 concurrent keep-alive
+clients and reports requests/sec and p50/p99 latency. Point the DB_*
+environment variables at a seeded database first.
+
+Usage:
+    python benchmarks/load_compare.py --path /api/yachts --duration 10
+    python benchmarks/load_compare.py --sync-url http://127.0.0.1:8001 \\
+        --async-url http://127.0.0.1:8002   # servers already running
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# The app reports its per-request query count in Server-Timing
+_DB_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response, returning (status, keep_alive, headers)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed')
+    status = int(status_line.split()[1])
+    length, chunked, keep_alive, headers = None, False, True, {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip()
+        headers[name] = value
+        value = value.lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            keep_alive = False
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive, headers
+
+
+def build_request(host, port, method, path, body=b'', headers=None):
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}', 'Connection: keep-alive']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    if body or method != 'GET':
+        lines.append(f'Content-Length: {len(body)}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+
+async def _client(host, port, make_request, deadline, latencies, counters):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            method, path, body, headers = make_request()
+            request = build_request(host, port, method, path, body, headers)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive, response_headers = await _read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            counters['ok' if status < 400 else 'errors'] += 1
+            timing = _DB_QUERIES.search(response_headers.get('server-timing', ''))
+            if timing:
+                counters['db_queries'] += int(timing.group(1))
+                counters['timed'] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            counters['errors'] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(base_url, path, concurrency, duration):
+    """Drive a server for ``duration`` seconds with ``concurrency`` keep-alive clients
+
+    ``path`` is a GET path, or a callable returning (method, path, body,
+    headers) for each request.
+    """
+    parts = urlsplit(base_url)
+    make_request = path if callable(path) else (lambda: ('GET', path, b'', None))
+    latencies = []
+    counters = {'ok': 0, 'errors': 0, 'db_queries': 0, 'timed': 0}
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _client(parts.hostname, parts.port or 80, make_request, deadline, latencies, counters)
+        for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': counters['ok'],
+        'errors': counters['errors'],
+        'rps': counters['ok'] / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'db_queries': counters['db_queries'] / counters['timed'] if counters['timed'] else None,
+    }
+
+
+def start_server(mode, port, workers, env):
+    cmd = ['gunicorn', '-c', 'python:yacht_iot.gunicorn_conf', '--workers', str(workers),
+           '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    if mode == 'sync':
+        cmd.append('yacht_iot.wsgi:app')
+    else:
+        cmd += ['--worker-class', 'uvicorn.workers.UvicornWorker', 'yacht_iot.asgi:app']
+    process = subprocess.Popen(cmd, cwd=APP_DIR, env=env)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'{mode} server did not start on port {port}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async load comparison')
+    parser.add_argument('--path', default='/api/yachts', help='Request path to load')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Concurrent client counts')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes per server')
+    parser.add_argument('--with-cache', action='store_true',
+                        help='Keep the sync response cache enabled (off by default for a fair comparison)')
+    parser.add_argument('--sync-url', help='Use an already running sync server')
+    parser.add_argument('--async-url', help='Use an already running async server')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.with_cache:
+        env['CACHE_BACKEND'] = 'none'
+
+    servers = []
+    targets = {}
+    try:
+        for mode, url, port in (('sync', args.sync_url, 8701), ('async', args.async_url, 8702)):
+            if url is None:
+                servers.append(start_server(mode, port, args.workers, env))
+                url = f'http://127.0.0.1:{port}'
+            targets[mode] = url
+
+        print(f"{'mode':<6} {'clients':>8} {'requests':>9} {'errors':>7} "
+              f"{'req/sec':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for concurrency in args.concurrency:
+            for mode, url in targets.items():
+                result = asyncio.run(run_load(url, args.path, concurrency, args.duration))
+                print(f"{mode:<6} {concurrency:>8} {result['requests']:>9} {result['errors']:>7} "
+                      f"{result['rps']:>9.0f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+    finally:
+        for process in servers:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Load-test suite for EMEA Yacht IoT Services
+
+Creates a disposable database on the PostgreSQL server in the DB_*
+environment variables, applies the migrations and seeds a fleet with
+telemetry, starts the app under gunicorn (yacht_iot.gunicorn_conf,
+yacht_iot.wsgi:app)
+against it, and drives each scenario at a fixed concurrency:
+
+    yachts           GET /api/yachts?limit=100
+    yachts_page      GET /api/yachts?after=<random>&limit=10
+    health           GET /api/health
+    telemetry        POST /api/telemetry, JSON readings
+    telemetry_batch  POST /api/telemetry/batch, a compressed columnar batch
+
+For each it records throughput, p50/p95/p99 latency and database
+round-trips per request (from the app's Server-Timing header), then
+compares the run with the baseline file and exits 1 on a regression:
+throughput down or p95/p99 up by more than --tolerance, more queries
+per request, a scenario the baseline has no figures for, or any failed
+request. It exits 2 before seeding anything when the baseline is
+missing or was recorded with other settings; --save-baseline records
+one instead of comparing. The database is dropped afterwards unless
+--keep is given.
+
+Usage:
+    python benchmarks/load_suite.py --repeat 3 --save-baseline
+    python benchmarks/load_suite.py --repeat 3      # compare with benchmarks/load_baseline.json
+    python benchmarks/load_suite.py --yachts 5000 --readings 500000 --concurrency 32 \\
+        --scenarios yachts health --duration 20
+"""
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from load_compare import APP_DIR, run_load  # noqa: E402
+from yacht_iot import batches, schema  # noqa: E402
+from yacht_iot.telemetry import TELEMETRY_COLUMNS  # noqa: E402
+from yacht_iot.timeseries import refresh_rollups  # noqa: E402
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': os.environ.get('DB_PORT', '5432'),
+    'database': os.environ.get('DB_DATABASE', 'yacht_iot'),
+    'user': os.environ.get('DB_USERNAME', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', '')
+}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'load_baseline.json')
+
+MODELS = ('Sunseeker 76', 'Azimut 60', 'Princess Y85', 'Riva 88', 'Ferretti 720')
+PORTS = ('Monaco', 'Antibes', 'Palma', 'Portofino', 'Split', 'Athens')
+
+# Latency changes smaller than this are noise, whatever the tolerance
+LATENCY_SLACK_MS = 1.0
+
+
+def create_database(name):
+    admin = psycopg2.connect(**{**DB_CONFIG, 'database': 'postgres'})
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS {name}')
+        cur.execute(f'CREATE DATABASE {name}')
+    admin.close()
+
+
+def drop_database(name):
+    admin = psycopg2.connect(**{**DB_CONFIG, 'database': 'postgres'})
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        force = ' WITH (FORCE)' if admin.server_version >= 130000 else ''
+        cur.execute(f'DROP DATABASE IF EXISTS {name}{force}')
+    admin.close()
+
+
+def seed(conn, yachts, readings, days):
+    """Migrate, then seed ``yachts`` yachts and ``readings`` readings over ``days`` days"""
+    schema.migrate(conn)
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS yachts (
+                id serial PRIMARY KEY,
+                name text NOT NULL,
+                model text,
+                length_m numeric(5, 1),
+                home_port text,
+                registered_at timestamptz NOT NULL DEFAULT now()
+            )
+        """)
+        buf = io.StringIO()
+        for i in range(1, yachts + 1):
+            buf.write(f'Yacht {i}\t{random.choice(MODELS)}\t{random.uniform(18, 60):.1f}\t'
+                      f'{random.choice(PORTS)}\n')
+        buf.seek(0)
+        cur.copy_expert("COPY yachts (name, model, length_m, home_port) FROM STDIN", buf)
+
+        now = datetime.now(timezone.utc)
+        start = now - timedelta(days=days)
+        schema.ensure_partitions(cur, [(start + timedelta(days=d)).date() for d in range(days + 2)])
+        step = days * 86400 / max(1, readings // yachts)
+        buf = io.StringIO()
+        for i in range(readings):
+            yacht_id = i % yachts + 1
+            recorded_at = start + timedelta(seconds=(i // yachts) * step)
+            buf.write(f'{yacht_id}\t{recorded_at.isoformat()}\t{random.uniform(36, 46):.5f}\t'
+                      f'{random.uniform(-5, 20):.5f}\t{random.uniform(0, 25):.1f}\t'
+                      f'{random.uniform(0, 360):.1f}\t{random.randrange(600, 2400)}\t'
+                      f'{random.uniform(70, 95):.1f}\t{random.uniform(5, 60):.1f}\t'
+                      f'{random.uniform(12, 13):.2f}\t{1000 + i / yachts:.2f}\n')
+        buf.seek(0)
+        cur.copy_expert(f"COPY {schema.TELEMETRY_TABLE} ({', '.join(TELEMETRY_COLUMNS)}) FROM STDIN",
+                        buf)
+        cur.execute("ANALYZE")
+    conn.commit()
+    refresh_rollups(conn)
+
+
+def scenarios(yachts, readings_per_post, batch_readings):
+    """name -> request factory returning (method, path, body, headers)"""
+    seq = itertools.count(int(time.time() * 1000))
+    compression = 'zstd' if batches.zstandard is not None else 'gzip'
+
+    def reading(yacht_id, recorded_at):
+        return {'yacht_id': yacht_id, 'recorded_at': recorded_at.isoformat(),
+                'latitude': random.uniform(36, 46), 'longitude': random.uniform(-5, 20),
+                'speed_knots': random.uniform(0, 25), 'engine_temp_c': random.uniform(70, 95),
+                'battery_voltage': random.uniform(12, 13)}
+
+    def telemetry():
+        now = datetime.now(timezone.utc)
+        body = json.dumps([reading(random.randint(1, yachts), now) for _ in range(readings_per_post)])
+        return 'POST', '/api/telemetry', body.encode(), {'Content-Type': 'application/json'}
+
+    def telemetry_batch():
+        now = datetime.now(timezone.utc)
+        columns = {'recorded_at': [now - timedelta(seconds=3 * i) for i in range(batch_readings)],
+                   'latitude': [random.uniform(36, 46)] * batch_readings,
+                   'longitude': [random.uniform(-5, 20)] * batch_readings,
+                   'speed_knots': [random.uniform(0, 25) for _ in range(batch_readings)]}
+        body = batches.encode_batch(random.randint(1, yachts), next(seq), columns, compression)
+        return 'POST', '/api/telemetry/batch', body, {'Content-Encoding': compression}
+
+    return {
+        'yachts': lambda: ('GET', '/api/yachts?limit=100', b'', None),
+        'yachts_page': lambda: ('GET', f'/api/yachts?after={random.randrange(yachts)}&limit=10',
+                                b'', None),
+        'health': lambda: ('GET', '/api/health', b'', None),
+        'telemetry': telemetry,
+        'telemetry_batch': telemetry_batch,
+    }
+
+
+def start_app(port, workers, env):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'python:yacht_iot.gunicorn_conf',
+         '--log-level', 'warning', 'yacht_iot.wsgi:app'],
+        cwd=APP_DIR, env={**env, 'PORT': str(port), 'WEB_CONCURRENCY': str(workers)})
+    for _ in range(200):
+        if process.poll() is not None:
+            raise RuntimeError('The app exited during startup')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'The app did not start on port {port}')
+
+
+def compare(results, baseline, tolerance):
+    """Regression messages for results against a baseline"""
+    problems = []
+    for name, result in results.items():
+        if result['errors']:
+            problems.append(f"{name}: {result['errors']} failed requests")
+        base = baseline.get(name)
+        if base is None:
+            problems.append(f"{name}: not in the baseline")
+            continue
+        if result['rps'] < base['rps'] * (1 - tolerance):
+            problems.append(f"{name}: {result['rps']:.0f} req/s, baseline {base['rps']:.0f}")
+        for key in ('p95_ms', 'p99_ms'):
+            limit = base[key] * (1 + tolerance) + LATENCY_SLACK_MS
+            if result[key] > limit:
+                problems.append(f"{name}: {key[:3]} {result[key]:.1f} ms, baseline {base[key]:.1f} ms")
+        if (result['db_queries'] is not None and base.get('db_queries') is not None
+                and result['db_queries'] > base['db_queries'] + 0.05):
+            problems.append(f"{name}: {result['db_queries']:.2f} queries/request, "
+                            f"baseline {base['db_queries']:.2f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test suite')
+    parser.add_argument('--yachts', type=int, default=1000, help='Yachts to seed')
+    parser.add_argument('--readings', type=int, default=100000, help='Telemetry readings to seed')
+    parser.add_argument('--days', type=int, default=7, help='Days the seeded readings span')
+    parser.add_argument('--scenarios', nargs='+', help='Scenarios to run (default: all)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario run')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Runs per scenario; each figure is the median across runs')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--port', type=int, default=8711)
+    parser.add_argument('--with-cache', action='store_true', help='Keep the response cache enabled')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed throughput drop / latency rise before failing')
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded database')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    database = f"{DB_CONFIG['database']}_load_{os.getpid()}"
+    factories = scenarios(args.yachts, 50, 500)
+    names = args.scenarios or list(factories)
+    unknown = set(names) - set(factories)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    config = {key: getattr(args, key) for key in
+              ('yachts', 'readings', 'days', 'concurrency', 'duration', 'repeat', 'workers',
+               'with_cache')}
+    baseline = None
+    if not args.save_baseline:
+        # Figures from other settings say nothing about this run: stop before seeding
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; record one with --save-baseline",
+                  file=sys.stderr)
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != config:
+            print(f"Baseline {args.baseline} was recorded with {baseline.get('config')}, "
+                  f"not {config}; run with its settings or record a new one with "
+                  f"--save-baseline", file=sys.stderr)
+            return 2
+
+    started = time.perf_counter()
+    create_database(database)
+    server = None
+    try:
+        conn = psycopg2.connect(**{**DB_CONFIG, 'database': database})
+        seed(conn, args.yachts, args.readings, args.days)
+        conn.close()
+        print(f"Seeded {args.yachts} yachts and {args.readings} readings into {database} "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        env = {**os.environ, 'DB_DATABASE': database, 'DB_REPLICAS': '', 'DBA_HOST': '',
+               'CACHE_BACKEND': os.environ.get('CACHE_BACKEND', 'memory') if args.with_cache else 'none'}
+        server = start_app(args.port, args.workers, env)
+        url = f'http://127.0.0.1:{args.port}'
+
+        results = {}
+        print(f"{'scenario':<16} {'requests':>9} {'errors':>7} {'req/sec':>9} {'p50 ms':>8} "
+              f"{'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        for name in names:
+            runs = [asyncio.run(run_load(url, factories[name], args.concurrency, args.duration))
+                    for _ in range(args.repeat)]
+            result = {key: (statistics.median(run[key] for run in runs)
+                            if runs[0][key] is not None else None) for key in runs[0]}
+            result['errors'] = sum(run['errors'] for run in runs)
+            results[name] = result
+            queries = f"{result['db_queries']:.2f}" if result['db_queries'] is not None else '-'
+            print(f"{name:<16} {result['requests']:>9.0f} {result['errors']:>7} {result['rps']:>9.0f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{queries:>8}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if not args.keep:
+            drop_database(database)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    problems = compare(results, baseline['results'], args.tolerance)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if problems:
+        return 1
+    print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark for EMEA Yacht IoT Services
+
+Reports what a cold worker costs: the time to import the app in a fresh
+interpreter, and for gunicorn started with yacht_iot.gunicorn_conf, the
+time from launch to the first answered request and the latency of the
+requests that follow, which reach the other still-cold workers, with and
+without preload and post-fork warm-up. Uses the same DB_* environment
+variables as the app.
+
+Usage:
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --workers 4 --path /api/yachts --repeat 3
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+IMPORT_SCRIPT = ("import time; started = time.perf_counter(); import yacht_iot.wsgi; "
+                 "print(time.perf_counter() - started)")
+
+MODES = [
+    ('default', {'GUNICORN_PRELOAD': '0', 'GUNICORN_WARMUP_PATH': ''}),
+    ('preload', {'GUNICORN_PRELOAD': '1', 'GUNICORN_WARMUP_PATH': ''}),
+    ('preload + warm-up', {'GUNICORN_PRELOAD': '1'}),
+]
+
+
+def cold_import(repeat):
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        times.append(float(out.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def timed_get(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+    except urllib.error.HTTPError:
+        pass
+    return time.perf_counter() - started
+
+
+def gunicorn_start(env, workers, path, requests):
+    """(seconds from launch to the first response, latencies of the requests after it)
+
+    The socket is bound before workers are ready, so the first response
+    includes waiting for a worker; the requests after it are timed alone.
+    """
+    port = free_port()
+    url = f'http://127.0.0.1:{port}{path}'
+    launched = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'python:yacht_iot.gunicorn_conf',
+         'yacht_iot.wsgi:app'], cwd=ROOT,
+        env={**os.environ, **env, 'PORT': str(port), 'WEB_CONCURRENCY': str(workers)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                timed_get(url)
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        ready = time.perf_counter() - launched
+        # Sequential requests land on workers in turn, reaching cold ones too
+        return ready, [timed_get(url) for _ in range(requests)]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time benchmark')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--path', default='/api/yachts', help='Path requested after startup')
+    parser.add_argument('--requests', type=int, default=10,
+                        help='Requests timed after the first response')
+    parser.add_argument('--repeat', type=int, default=3, help='Launches per case (median is reported)')
+    args = parser.parse_args()
+
+    print(f"app import in a fresh interpreter: {cold_import(args.repeat) * 1000:.0f} ms")
+    print(f"{'mode':<18} {'first response ms':>18} {'next request ms':>16} "
+          f"{'slowest ms':>11} {'median ms':>10}")
+    for name, env in MODES:
+        results = [gunicorn_start(env, args.workers, args.path, args.requests)
+                   for _ in range(args.repeat)]
+        ready = statistics.median(r[0] for r in results)
+        following = statistics.median(r[1][0] for r in results)
+        worst = statistics.median(max(r[1]) for r in results)
+        typical = statistics.median(statistics.median(r[1]) for r in results)
+        print(f"{name:<18} {ready * 1000:>18.0f} {following * 1000:>16.1f} "
+              f"{worst * 1000:>11.1f} {typical * 1000:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
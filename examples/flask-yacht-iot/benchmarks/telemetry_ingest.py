@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Telemetry write benchmark for EMEA Yacht IoT Services
+
+Measures readings/sec for one INSERT per reading against batched
+execute_values and COPY FROM STDIN writes, using the same DB_* environment
+variables as the app. Writes go to a temporary table.
+
+Usage:
+    python benchmarks/telemetry_ingest.py --readings 20000 --batch-size 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from yacht_iot.schema import TELEMETRY_TABLE, migrate  # noqa: E402
+from yacht_iot.telemetry import TELEMETRY_COLUMNS, copy_rows  # noqa: E402
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': os.environ.get('DB_PORT', '5432'),
+    'database': os.environ.get('DB_DATABASE', 'yacht_iot'),
+    'user': os.environ.get('DB_USERNAME', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', '')
+}
+
+TABLE = 'bench_telemetry'
+COLUMN_LIST = ', '.join(TELEMETRY_COLUMNS)
+
+
+def generate_rows(count, fleet_size=100):
+    """Synthetic readings in TELEMETRY_COLUMNS order"""
+    start = datetime.now(timezone.utc) - timedelta(seconds=count)
+    rows = []
+    for i in range(count):
+        rows.append((
+            random.randint(1, fleet_size),
+            (start + timedelta(seconds=i)).isoformat(),
+            random.uniform(30.0, 60.0),
+            random.uniform(-10.0, 30.0),
+            random.uniform(0.0, 30.0),
+            random.uniform(0.0, 360.0),
+            random.uniform(600.0, 2400.0),
+            random.uniform(60.0, 95.0),
+            random.uniform(5.0, 120.0),
+            random.uniform(11.5, 14.5),
+            random.uniform(0.0, 5000.0),
+        ))
+    return rows
+
+
+def single_row(conn, rows, batch_size):
+    sql = f"INSERT INTO {TABLE} ({COLUMN_LIST}) VALUES ({', '.join(['%s'] * len(TELEMETRY_COLUMNS))})"
+    with conn.cursor() as cur:
+        for row in rows:
+            cur.execute(sql, row)
+            conn.commit()
+
+
+def batched_execute_values(conn, rows, batch_size):
+    sql = f"INSERT INTO {TABLE} ({COLUMN_LIST}) VALUES %s"
+    with conn.cursor() as cur:
+        for i in range(0, len(rows), batch_size):
+            execute_values(cur, sql, rows[i:i + batch_size], page_size=batch_size)
+            conn.commit()
+
+
+def batched_copy(conn, rows, batch_size):
+    with conn.cursor() as cur:
+        for i in range(0, len(rows), batch_size):
+            copy_rows(cur, rows[i:i + batch_size], table=TABLE)
+            conn.commit()
+
+
+STRATEGIES = {
+    'single-row': single_row,
+    'execute_values': batched_execute_values,
+    'copy': batched_copy,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Telemetry write benchmark')
+    parser.add_argument('--readings', type=int, default=20000, help='Readings per strategy')
+    parser.add_argument('--single-row-readings', type=int, default=2000,
+                        help='Readings for the (slow) single-row strategy')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per batched write')
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), action='append',
+                        help='Strategy to run (repeatable, default: all)')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    migrate(conn)
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE {TABLE} (LIKE {TELEMETRY_TABLE} INCLUDING DEFAULTS)")
+    conn.commit()
+
+    print(f"{'strategy':<16} {'readings':>10} {'seconds':>9} {'readings/sec':>14}")
+    for name in args.strategy or STRATEGIES:
+        count = args.single_row_readings if name == 'single-row' else args.readings
+        rows = generate_rows(count)
+        started = time.perf_counter()
+        STRATEGIES[name](conn, rows, args.batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<16} {count:>10} {elapsed:>9.3f} {count / elapsed:>14.0f}")
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {TABLE}")
+        conn.commit()
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+EMEA Yacht IoT Services
+
+    from yacht_iot import create_app
+    app = create_app()
+
+Entry points: ``yacht_iot.wsgi:app`` (gunicorn, with
+``-c python:yacht_iot.gunicorn_conf``), ``yacht_iot.asgi:app`` for the
+async serving mode, and ``python -m yacht_iot.<job>`` for the schema,
+rollup, archive, retention, maintenance and alert jobs. Settings come
+from the environment through yacht_iot.config.
+"""
+
+from flask import Flask
+
+__all__ = ['create_app']
+
+
+def create_app():
+    """Build the Flask app
+
+    Pools, buffers and caches are created once per process on the first
+    call (yacht_iot.data and yacht_iot.views) and shared by every app
+    returned, so a gunicorn worker holds one set whatever imports it.
+    """
+    from . import config
+    from .serialization import FastJSONProvider
+    from .views import bp
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config['SECRET_KEY'] = config.SECRET_KEY
+    app.config['DEBUG'] = config.DEBUG
+    app.register_blueprint(bp)
+    return app
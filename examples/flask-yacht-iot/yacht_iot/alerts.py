@@ -0,0 +1,506 @@
+"""
+Alert rules engine for EMEA Yacht IoT Services
+
+Rules live in ``alert_rules`` and are compiled into an in-memory index:
+
+* threshold and rate-of-change rules are grouped by yacht, metric and
+  operator into sorted threshold lists. A rule changes state exactly when
+  its threshold lies between a yacht's previous and current value, so one
+  bisect per group finds every rule that fired or resolved, however many
+  rules the group holds.
+* geofence rules (a bounding box or a circle) are placed in a grid of
+  lat/lon cells, so a reading is only tested against the fences in its
+  cell plus those the yacht was inside.
+
+The worker reads telemetry ingested since its high-water mark, evaluates
+it reading by reading against the last value of each series per yacht,
+which is kept in memory and saved to ``alert_state``, and writes each
+state change to the ``alert_outbox`` table for delivery. Readings older
+than a yacht's last evaluated reading are not evaluated.
+
+Usage (runs as an Upsun worker next to the web app):
+    python -m yacht_iot.alerts run    # evaluate new telemetry every ALERTS_INTERVAL seconds
+    python -m yacht_iot.alerts once   # evaluate new telemetry once and exit
+"""
+
+import json
+import math
+import os
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from .geo import haversine_nm, radius_bbox
+from .schema import TELEMETRY_TABLE
+from .telemetry import NUMERIC_COLUMNS, TELEMETRY_COLUMNS
+from .timeseries import WATERMARK_OVERLAP
+
+# Lock id for the alerts worker, so a second instance skips instead of double-firing
+ALERTS_LOCK_ID = 4207004
+
+# rollup_state rows: telemetry evaluated through this ingested_at, and
+# rules checked against yacht state through this updated_at
+STATE_NAME = 'alert_engine'
+RULES_STATE_NAME = 'alert_rules'
+
+ALERTS_CONFIG = {
+    'interval': float(os.environ.get('ALERTS_INTERVAL', '5')),
+    'fetch_rows': int(os.environ.get('ALERTS_FETCH_ROWS', '10000')),
+    'grid_degrees': float(os.environ.get('ALERTS_GRID_DEGREES', '1.0')),
+    'max_rate_gap': float(os.environ.get('ALERTS_MAX_RATE_GAP', '600')),
+}
+
+RULE_KINDS = ('threshold', 'rate_of_change', 'geofence')
+
+RULE_COLUMNS = ('id', 'name', 'kind', 'yacht_id', 'metric', 'operator', 'threshold',
+                'geofence', 'trigger')
+
+Rule = namedtuple('Rule', RULE_COLUMNS)
+
+# operator -> (bisect giving the count of breached thresholds, breached
+# thresholds are a prefix of the sorted list rather than a suffix)
+OPERATORS = {
+    '>': (bisect_left, True),
+    '>=': (bisect_right, True),
+    '<': (bisect_right, False),
+    '<=': (bisect_left, False),
+}
+
+OUTBOX_COLUMNS = ('rule_id', 'yacht_id', 'state', 'value', 'recorded_at', 'message')
+
+_COLUMN_INDEX = {column: i for i, column in enumerate(TELEMETRY_COLUMNS)}
+_LAT, _LON = _COLUMN_INDEX['latitude'], _COLUMN_INDEX['longitude']
+
+
+def validate_rule(rule):
+    """Check a rule dict from the API, raising ValueError with a message"""
+    kind = rule.get('kind')
+    if kind not in RULE_KINDS:
+        raise ValueError(f"kind must be one of {', '.join(RULE_KINDS)}")
+    if not rule.get('name'):
+        raise ValueError('name is required')
+    if rule.get('yacht_id') is not None and not isinstance(rule['yacht_id'], int):
+        raise ValueError('yacht_id must be an integer or null')
+    if kind == 'geofence':
+        if rule.get('trigger') not in ('enter', 'exit'):
+            raise ValueError('trigger must be enter or exit')
+        _fence_bbox(rule.get('geofence'))
+    else:
+        if rule.get('metric') not in NUMERIC_COLUMNS:
+            raise ValueError(f"metric must be one of {', '.join(NUMERIC_COLUMNS)}")
+        if rule.get('operator') not in OPERATORS:
+            raise ValueError(f"operator must be one of {', '.join(OPERATORS)}")
+        if not isinstance(rule.get('threshold'), (int, float)):
+            raise ValueError('threshold must be a number')
+
+
+def _fence_bbox(fence):
+    """(min_lon, min_lat, max_lon, max_lat) of a {"bbox": [...]} or {"lat", "lon", "radius_nm"} fence"""
+    if not isinstance(fence, dict):
+        raise ValueError('geofence must be an object')
+    try:
+        if 'bbox' in fence:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in fence['bbox'])
+            if min_lon > max_lon or min_lat > max_lat:
+                raise ValueError
+            return min_lon, min_lat, max_lon, max_lat
+        lat, lon, radius = float(fence['lat']), float(fence['lon']), float(fence['radius_nm'])
+        if radius <= 0:
+            raise ValueError
+        return radius_bbox(lat, lon, radius)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('geofence must be {"bbox": [min_lon, min_lat, max_lon, max_lat]} '
+                         'or {"lat": ..., "lon": ..., "radius_nm": ...}')
+
+
+class Fence:
+    def __init__(self, rule):
+        self.rule = rule
+        self.bbox = _fence_bbox(rule.geofence)
+        self.circle = (None if 'bbox' in rule.geofence else
+                       (float(rule.geofence['lat']), float(rule.geofence['lon']),
+                        float(rule.geofence['radius_nm'])))
+
+    def contains(self, lat, lon):
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+            return False
+        return self.circle is None or haversine_nm(self.circle[0], self.circle[1], lat, lon) <= self.circle[2]
+
+
+class YachtState:
+    """Last value of every series of one yacht, and the fences it is in"""
+
+    __slots__ = ('recorded_at', 'last', 'inside', 'exited')
+
+    def __init__(self, recorded_at=None, last=None, inside=(), exited=()):
+        self.recorded_at = recorded_at
+        self.last = last or {}  # series or 'position' -> (epoch seconds, value)
+        self.inside = set(inside)  # geofence rule ids the yacht is in
+        self.exited = set(exited)  # exit rules currently firing
+
+    def to_json(self):
+        return json.dumps({'last': self.last, 'inside': sorted(self.inside),
+                           'exited': sorted(self.exited)})
+
+    @classmethod
+    def from_json(cls, recorded_at, data):
+        return cls(recorded_at, {k: tuple(v) for k, v in data.get('last', {}).items()},
+                   data.get('inside', ()), data.get('exited', ()))
+
+
+class AlertEngine:
+    """Compiled rule index plus per-yacht series state"""
+
+    def __init__(self, grid_degrees=1.0, max_rate_gap=600.0):
+        self.grid_degrees = grid_degrees
+        self.max_rate_gap = max_rate_gap
+        self.rules = {}
+        self.states = {}
+        self.dirty = set()
+        self.watermark = None
+        self.rules_through = None
+        self.rules_version = None
+        self._groups = {}  # yacht_id or None -> {(series, operator): [(threshold, rule id)]}
+        self._plans = {}  # yacht_id -> merged groups for that yacht
+        self._cells = {}  # (row, col) -> [Fence]
+
+    # Rule index
+
+    def load_rules(self, rules):
+        """Compile rules, returning alerts for rules changed since the last load
+
+        A new or edited rule is checked against every yacht's last values,
+        so a condition that already holds fires without waiting for a change.
+        """
+        self.rules, self._groups, self._plans, self._cells = {}, {}, {}, {}
+        for rule in rules:
+            try:
+                validate_rule(rule._asdict())
+            except ValueError as e:
+                print(f"Skipping alert rule {rule.id}: {e}")
+                continue
+            self.rules[rule.id] = rule
+            if rule.kind == 'geofence':
+                fence = Fence(rule)
+                for cell in self._bbox_cells(fence.bbox):
+                    self._cells.setdefault(cell, []).append(fence)
+            else:
+                series = rule.metric if rule.kind == 'threshold' else f'rate:{rule.metric}'
+                self._groups.setdefault(rule.yacht_id, {}).setdefault(
+                    (series, rule.operator), []).append((float(rule.threshold), rule.id))
+
+        for state in self.states.values():
+            state.inside &= self.rules.keys()
+            state.exited &= self.rules.keys()
+
+        added = [rule for rule in self.rules.values()
+                 if self.rules_through is None or rule.updated_at > self.rules_through]
+        if rules:
+            self.rules_through = max([rule.updated_at for rule in rules]
+                                     + ([self.rules_through] if self.rules_through else []))
+        return self._evaluate_new_rules(added) if added else []
+
+    def _bbox_cells(self, bbox):
+        min_lon, min_lat, max_lon, max_lat = bbox
+        low_row, low_col = self._cell(min_lat, min_lon)
+        high_row, high_col = self._cell(max_lat, max_lon)
+        return [(row, col) for row in range(low_row, high_row + 1)
+                for col in range(low_col, high_col + 1)]
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.grid_degrees), math.floor(lon / self.grid_degrees))
+
+    def _plan(self, yacht_id):
+        """Threshold groups that apply to a yacht, its own rules merged with fleet
+        rules, plus the (metric, column, rate wanted) inputs they read"""
+        plan = self._plans.get(yacht_id)
+        if plan is None:
+            merged = {}
+            for source in (self._groups.get(None, {}), self._groups.get(yacht_id, {})):
+                for key, entries in source.items():
+                    merged.setdefault(key, []).extend(entries)
+            groups, inputs = [], {}
+            for (series, operator), entries in merged.items():
+                entries.sort()
+                find, prefix = OPERATORS[operator]
+                groups.append((series, find, prefix,
+                               [t for t, _ in entries], [rule_id for _, rule_id in entries]))
+                metric = series[5:] if series.startswith('rate:') else series
+                inputs[metric] = inputs.get(metric, False) or series != metric
+            plan = self._plans[yacht_id] = (
+                groups, [(metric, _COLUMN_INDEX[metric], rate) for metric, rate in inputs.items()])
+        return plan
+
+    # Evaluation
+
+    def evaluate(self, rows):
+        """Alerts (OUTBOX_COLUMNS tuples) for rows in TELEMETRY_COLUMNS order, oldest first"""
+        alerts = []
+        has_fences = bool(self._cells)
+        for row in rows:
+            yacht_id = row[0]
+            recorded_at = row[1]
+            ts = recorded_at.timestamp()
+            state = self.states.get(yacht_id)
+            if state is None:
+                state = self.states[yacht_id] = YachtState()
+            elif state.recorded_at is not None and ts <= state.recorded_at:
+                continue
+            state.recorded_at = ts
+            self.dirty.add(yacht_id)
+
+            groups, inputs = self._plan(yacht_id)
+            if groups:
+                last = state.last
+                current = {}
+                for metric, column, rate in inputs:
+                    value = row[column]
+                    if value is None:
+                        continue
+                    if rate and metric in last:
+                        then, previous = last[metric]
+                        if 0 < ts - then <= self.max_rate_gap:
+                            current['rate:' + metric] = (value - previous) / (ts - then) * 60
+                    current[metric] = value
+
+                for series, find, prefix, thresholds, rule_ids in groups:
+                    value = current.get(series)
+                    if value is None:
+                        continue
+                    before = last.get(series)
+                    k_before = (find(thresholds, before[1]) if before is not None
+                                else 0 if prefix else len(thresholds))
+                    k_now = find(thresholds, value)
+                    if k_now != k_before:
+                        state_name = 'firing' if (k_now > k_before) == prefix else 'resolved'
+                        for rule_id in rule_ids[min(k_before, k_now):max(k_before, k_now)]:
+                            alerts.append(self._alert(rule_id, yacht_id, state_name, value, recorded_at))
+                for series, value in current.items():
+                    last[series] = (ts, value)
+
+            if has_fences or state.inside:
+                lat, lon = row[_LAT], row[_LON]
+                if lat is not None and lon is not None:
+                    alerts.extend(self._evaluate_fences(state, yacht_id, lat, lon, recorded_at))
+                    state.last['position'] = (ts, (lat, lon))
+        return alerts
+
+    def _evaluate_fences(self, state, yacht_id, lat, lon, recorded_at):
+        inside = set()
+        for fence in self._cells.get(self._cell(lat, lon), ()):
+            rule = fence.rule
+            if (rule.yacht_id is None or rule.yacht_id == yacht_id) and fence.contains(lat, lon):
+                inside.add(rule.id)
+        alerts = []
+        for rule_id in inside - state.inside:
+            if self.rules[rule_id].trigger == 'enter':
+                alerts.append(self._alert(rule_id, yacht_id, 'firing', None, recorded_at))
+            elif rule_id in state.exited:
+                state.exited.discard(rule_id)
+                alerts.append(self._alert(rule_id, yacht_id, 'resolved', None, recorded_at))
+        for rule_id in state.inside - inside:
+            if self.rules[rule_id].trigger == 'enter':
+                alerts.append(self._alert(rule_id, yacht_id, 'resolved', None, recorded_at))
+            else:
+                state.exited.add(rule_id)
+                alerts.append(self._alert(rule_id, yacht_id, 'firing', None, recorded_at))
+        state.inside = inside
+        return alerts
+
+    def _evaluate_new_rules(self, rules):
+        alerts = []
+        for yacht_id, state in self.states.items():
+            if state.recorded_at is None:
+                continue
+            recorded_at = datetime.fromtimestamp(state.recorded_at, timezone.utc)
+            for rule in rules:
+                if rule.yacht_id is not None and rule.yacht_id != yacht_id:
+                    continue
+                if rule.kind == 'geofence':
+                    position = state.last.get('position')
+                    if (rule.trigger == 'enter' and position is not None
+                            and Fence(rule).contains(*position[1])):
+                        state.inside.add(rule.id)
+                        alerts.append(self._alert(rule.id, yacht_id, 'firing', None, recorded_at))
+                    continue
+                series = rule.metric if rule.kind == 'threshold' else f'rate:{rule.metric}'
+                last = state.last.get(series)
+                if last is None:
+                    continue
+                find, prefix = OPERATORS[rule.operator]
+                breached = find([rule.threshold], last[1]) == (1 if prefix else 0)
+                if breached:
+                    alerts.append(self._alert(rule.id, yacht_id, 'firing', last[1], recorded_at))
+            self.dirty.add(yacht_id)
+        return alerts
+
+    def _alert(self, rule_id, yacht_id, state, value, recorded_at):
+        rule = self.rules[rule_id]
+        if rule.kind == 'geofence':
+            action = 'entered' if (rule.trigger == 'enter') == (state == 'firing') else 'left'
+            message = f'{rule.name}: {action} geofence'
+        elif rule.kind == 'rate_of_change':
+            message = (f'{rule.name}: {rule.metric} changing {value:+.3g}/min '
+                       f'({rule.operator} {rule.threshold:g}/min {"breached" if state == "firing" else "cleared"})')
+        else:
+            message = (f'{rule.name}: {rule.metric} {value:.4g} '
+                       f'({rule.operator} {rule.threshold:g} {"breached" if state == "firing" else "cleared"})')
+        return (rule_id, yacht_id, state, value, recorded_at, message)
+
+    # State persistence
+
+    def load_state(self, rows):
+        """Replace the in-memory state with (yacht_id, recorded_at, state) rows"""
+        self.states = {yacht_id: YachtState.from_json(recorded_at.timestamp(), data)
+                       for yacht_id, recorded_at, data in rows}
+        self.dirty = set()
+
+    def dirty_state(self):
+        """(yacht_id, recorded_at, state json) for every yacht changed since the last call"""
+        rows = [(yacht_id, datetime.fromtimestamp(self.states[yacht_id].recorded_at, timezone.utc),
+                 self.states[yacht_id].to_json())
+                for yacht_id in sorted(self.dirty) if self.states[yacht_id].recorded_at is not None]
+        self.dirty = set()
+        return rows
+
+
+RuleRow = namedtuple('RuleRow', RULE_COLUMNS + ('updated_at',))
+
+
+def fetch_rules(cur):
+    cur.execute(f"SELECT {', '.join(RULE_COLUMNS)}, updated_at FROM alert_rules "
+                f"WHERE enabled ORDER BY id")
+    return [RuleRow(*row) for row in cur.fetchall()]
+
+
+def _read_mark(cur, name):
+    cur.execute("SELECT ingested_through FROM rollup_state WHERE name = %s", (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _write_mark(cur, name, value):
+    cur.execute(
+        "INSERT INTO rollup_state (name, ingested_through) VALUES (%s, %s) "
+        "ON CONFLICT (name) DO UPDATE SET ingested_through = EXCLUDED.ingested_through",
+        (name, value))
+
+
+def evaluate_new_telemetry(conn, engine, config=ALERTS_CONFIG):
+    """Evaluate telemetry newer than the high-water mark and queue the alerts
+
+    Returns (readings evaluated, alerts queued), or None when another worker
+    holds the lock. Alerts, yacht state and the mark commit together.
+    """
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_try_advisory_lock(%s)', (ALERTS_LOCK_ID,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return None
+        try:
+            watermark = _read_mark(cur, STATE_NAME)
+            if engine.watermark != watermark or engine.states is None:
+                # First run, or another instance ran since: reload what it saved
+                cur.execute("SELECT yacht_id, recorded_at, state FROM alert_state")
+                engine.load_state(cur.fetchall())
+                engine.watermark = watermark
+                engine.rules_through = _read_mark(cur, RULES_STATE_NAME)
+                engine.rules_version = None
+
+            alerts = []
+            cur.execute("SELECT count(*), max(updated_at) FROM alert_rules WHERE enabled")
+            version = cur.fetchone()
+            if version != engine.rules_version:
+                alerts += engine.load_rules(fetch_rules(cur))
+                engine.rules_version = version
+                if engine.rules_through is not None:
+                    _write_mark(cur, RULES_STATE_NAME, engine.rules_through)
+
+            since = watermark - WATERMARK_OVERLAP if watermark else datetime.min.replace(tzinfo=timezone.utc)
+            cur.execute(f"SELECT max(ingested_at) FROM {TELEMETRY_TABLE} WHERE ingested_at > %s",
+                        (since,))
+            ingested_through = cur.fetchone()[0]
+            evaluated = 0
+            if ingested_through is not None:
+                with conn.cursor(name='alerts_telemetry') as rows:
+                    rows.execute(
+                        f"SELECT {', '.join(TELEMETRY_COLUMNS)} FROM {TELEMETRY_TABLE} "
+                        f"WHERE ingested_at > %s AND ingested_at <= %s ORDER BY recorded_at",
+                        (since, ingested_through))
+                    while True:
+                        batch = rows.fetchmany(config['fetch_rows'])
+                        if not batch:
+                            break
+                        alerts += engine.evaluate(batch)
+                        evaluated += len(batch)
+
+            if alerts:
+                execute_values(cur, f"INSERT INTO alert_outbox ({', '.join(OUTBOX_COLUMNS)}) VALUES %s",
+                               alerts)
+            state = engine.dirty_state()
+            if state:
+                execute_values(
+                    cur,
+                    "INSERT INTO alert_state (yacht_id, recorded_at, state) VALUES %s "
+                    "ON CONFLICT (yacht_id) DO UPDATE SET recorded_at = EXCLUDED.recorded_at, "
+                    "state = EXCLUDED.state",
+                    state, template='(%s, %s, %s::jsonb)')
+            if ingested_through is not None:
+                _write_mark(cur, STATE_NAME, ingested_through)
+                engine.watermark = ingested_through
+            conn.commit()
+            return evaluated, len(alerts)
+        except psycopg2.Error:
+            conn.rollback()
+            # In-memory state is ahead of what was saved; reload it next run
+            engine.watermark = engine.states = None
+            raise
+        finally:
+            cur.execute('SELECT pg_advisory_unlock(%s)', (ALERTS_LOCK_ID,))
+            conn.commit()
+
+
+def main():
+    if sys.argv[1:] not in (['run'], ['once']):
+        print("Usage: python -m yacht_iot.alerts run|once")
+        return 2
+
+    from .config import DB_CONFIG
+    config = ALERTS_CONFIG
+    engine = AlertEngine(config['grid_degrees'], config['max_rate_gap'])
+    conn = None
+    try:
+        while True:
+            try:
+                if conn is None or conn.closed:
+                    conn = psycopg2.connect(**DB_CONFIG)
+                started = time.monotonic()
+                result = evaluate_new_telemetry(conn, engine, config)
+                if result is None:
+                    print("Another alerts worker is running, skipping")
+                elif result[0] or result[1]:
+                    print(f"Evaluated {result[0]} readings against {len(engine.rules)} rules, "
+                          f"queued {result[1]} alerts in {time.monotonic() - started:.2f}s")
+            except psycopg2.Error as e:
+                print(f"Error: {e}")
+                if sys.argv[1] == 'once':
+                    return 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+            if sys.argv[1] == 'once':
+                return 0
+            time.sleep(config['interval'])
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
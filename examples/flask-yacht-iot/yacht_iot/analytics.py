@@ -0,0 +1,187 @@
+"""
+Vectorized fleet analytics for EMEA Yacht IoT Services
+
+Telemetry windows are read with ``COPY ... TO STDOUT (FORMAT binary)``
+into one buffer and decoded straight into NumPy columns: every column is
+cast to a fixed-width type with NULLs mapped to NaN, so each tuple has the
+same byte layout and the whole buffer is one structured array. The
+statistics below then run per yacht on contiguous slices of those arrays
+instead of looping over rows in Python.
+"""
+
+import io
+
+import numpy as np
+
+from .schema import TELEMETRY_TABLE
+
+# Mean Earth radius in nautical miles
+EARTH_RADIUS_NM = 3440.065
+
+# Readings further apart than this are not integrated for fuel used
+MAX_GAP_SECONDS = 600
+
+# Columns read for analytics; recorded_at arrives as epoch seconds
+WINDOW_COLUMNS = ('recorded_at', 'latitude', 'longitude', 'speed_knots', 'fuel_rate_lph')
+
+# PGCOPY signature, flags and header extension length
+_COPY_HEADER = b'PGCOPY\n\xff\r\n\x00'
+
+
+def _copy_dtype(columns):
+    """Byte layout of one binary COPY tuple: int4 yacht_id then float8 columns"""
+    fields = [('count', '>i2'), ('yacht_id_len', '>i4'), ('yacht_id', '>i4')]
+    for column in columns:
+        fields += [(f'{column}_len', '>i4'), (column, '>f8')]
+    return np.dtype(fields)
+
+
+def decode_copy(buffer, columns=WINDOW_COLUMNS):
+    """Decode a binary COPY of (yacht_id, float8 columns...) into arrays"""
+    data = memoryview(buffer)
+    if bytes(data[:11]) != _COPY_HEADER:
+        raise ValueError('Not a binary COPY stream')
+    extension = int.from_bytes(data[15:19], 'big')
+    body = data[19 + extension:-2]  # trailer is a -1 field count
+    rows = np.frombuffer(body, dtype=_copy_dtype(columns))
+    result = {'yacht_id': rows['yacht_id'].astype(np.int64)}
+    for column in columns:
+        result[column] = rows[column].astype(np.float64)
+    return result
+
+
+def fetch_window(cur, start, end, yacht_ids=None, columns=WINDOW_COLUMNS):
+    """Telemetry between start and end as NumPy columns, ordered by yacht and time"""
+    selected = ['extract(epoch FROM recorded_at)::float8' if c == 'recorded_at'
+                else f"coalesce({c}::float8, 'NaN')" for c in columns]
+    query = cur.mogrify(
+        f"SELECT yacht_id, {', '.join(selected)} FROM {TELEMETRY_TABLE} "
+        f"WHERE recorded_at >= %s AND recorded_at < %s"
+        + (" AND yacht_id = ANY(%s)" if yacht_ids else "")
+        + " ORDER BY yacht_id, recorded_at",
+        (start, end, list(yacht_ids)) if yacht_ids else (start, end))
+    buffer = io.BytesIO()
+    cur.copy_expert(f"COPY ({query.decode()}) TO STDOUT WITH (FORMAT binary)", buffer)
+    return decode_copy(buffer.getbuffer(), columns)
+
+
+def group_bounds(yacht_ids):
+    """(yacht ids, start index, end index) of each yacht's run of rows"""
+    if not len(yacht_ids):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(yacht_ids)) + 1))
+    ends = np.append(starts[1:], len(yacht_ids))
+    return yacht_ids[starts], starts, ends
+
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    """Great-circle distance in nautical miles between arrays of points"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_NM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def rolling_mean(values, starts, ends, window):
+    """Trailing mean over ``window`` readings, restarting at each yacht"""
+    present = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(present)))
+    index = np.arange(len(values))
+    group_start = np.repeat(starts, ends - starts)
+    lower = np.maximum(index + 1 - window, group_start)
+    n = counts[index + 1] - counts[lower]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, (sums[index + 1] - sums[lower]) / n, np.nan)
+
+
+def _segments(data, starts):
+    """Per-segment (distance nm, hours, segment is within one yacht)"""
+    same_yacht = np.ones(max(len(data['yacht_id']) - 1, 0), dtype=bool)
+    same_yacht[starts[1:] - 1] = False
+    distance = haversine_nm(data['latitude'][:-1], data['longitude'][:-1],
+                            data['latitude'][1:], data['longitude'][1:])
+    seconds = np.diff(data['recorded_at'])
+    return np.where(same_yacht & ~np.isnan(distance), distance, 0.0), seconds / 3600, same_yacht
+
+
+def _per_yacht_sum(values, starts):
+    """Sum segment values (one fewer than readings) per yacht
+
+    Segments between two yachts are already zero, so each yacht's sum can
+    run up to the next yacht's first reading.
+    """
+    return np.add.reduceat(np.append(values, 0.0), starts)
+
+
+def zscores(values):
+    """z-scores of an array, NaN where undefined"""
+    std = np.nanstd(values)
+    if not std or np.isnan(std):
+        return np.full(len(values), np.nan)
+    return (values - np.nanmean(values)) / std
+
+
+def _num(value, digits=3):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def fuel_efficiency(data, max_gap=MAX_GAP_SECONDS):
+    """Distance, fuel burnt and efficiency per yacht, with fleet z-scores"""
+    ids, starts, ends = group_bounds(data['yacht_id'])
+    if not len(ids):
+        return []
+    distance, hours, same_yacht = _segments(data, starts)
+    rate = data['fuel_rate_lph']
+    # Trapezoidal integration of litres/hour, skipping gaps and missing rates
+    fuel = (rate[:-1] + rate[1:]) / 2 * hours
+    fuel = np.where(same_yacht & (hours * 3600 <= max_gap) & ~np.isnan(fuel), fuel, 0.0)
+    underway = np.where(same_yacht & (hours * 3600 <= max_gap), hours, 0.0)
+
+    distance_nm = _per_yacht_sum(distance, starts)
+    fuel_l = _per_yacht_sum(fuel, starts)
+    hours_total = _per_yacht_sum(underway, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        nm_per_litre = np.where(fuel_l > 0, distance_nm / fuel_l, np.nan)
+    efficiency_z = zscores(nm_per_litre)
+
+    return [{
+        'yacht_id': int(ids[i]),
+        'readings': int(ends[i] - starts[i]),
+        'distance_nm': _num(distance_nm[i]),
+        'fuel_litres': _num(fuel_l[i]),
+        'hours': _num(hours_total[i]),
+        'nm_per_litre': _num(nm_per_litre[i], 4),
+        'efficiency_z': _num(efficiency_z[i]),
+    } for i in range(len(ids))]
+
+
+def speed_profile(data, window=60, z_threshold=3.0, percentiles=(50, 90, 99)):
+    """Speed percentiles, peak rolling mean and anomaly counts per yacht"""
+    ids, starts, ends = group_bounds(data['yacht_id'])
+    speed = data['speed_knots']
+    rolling = rolling_mean(speed, starts, ends, window)
+    profiles = []
+    for i, yacht_id in enumerate(ids):
+        values = speed[starts[i]:ends[i]]
+        if np.isnan(values).all():
+            stats, anomalies = [np.nan] * (len(percentiles) + 3), 0
+        else:
+            z = zscores(values)
+            anomalies = int(np.count_nonzero(np.abs(np.nan_to_num(z)) > z_threshold))
+            stats = list(np.nanpercentile(values, percentiles)) + [
+                np.nanmean(values), np.nanstd(values),
+                np.nanmax(rolling[starts[i]:ends[i]])]
+        profile = {'yacht_id': int(yacht_id), 'readings': int(ends[i] - starts[i])}
+        for pct, value in zip(percentiles, stats):
+            profile[f'p{pct}'] = _num(value)
+        profile.update({
+            'mean': _num(stats[-3]),
+            'std': _num(stats[-2]),
+            'max_rolling_mean': _num(stats[-1]),
+            'anomalies': anomalies,
+        })
+        profiles.append(profile)
+    return profiles
@@ -0,0 +1,197 @@
+"""
+MariaDB archive of telemetry rollups for EMEA Yacht IoT Services
+
+``sync`` copies settled hourly and daily rollup buckets from PostgreSQL
+into the MariaDB "dba" store, reading from a replica when one is healthy.
+Metric queries over ranges older than ``ARCHIVE_AFTER_DAYS`` at hourly or
+coarser resolution are then answered from the archive, keeping long
+reporting scans off the primary. Bucket times are stored as UTC DATETIMEs.
+
+Usage (run daily from cron):
+    python -m yacht_iot.archive migrate   # create the archive tables
+    python -m yacht_iot.archive sync      # copy rollup buckets settled since the last sync
+"""
+
+import argparse
+import math
+import sys
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+from .schema import ROLLUP_METRICS, ROLLUP_TABLES
+from .timeseries import BUCKET_ORIGIN, ROLLUP_COLUMNS, pick_source
+
+try:
+    import pymysql
+    ArchiveError = pymysql.Error
+except ImportError:
+    pymysql = None
+    ArchiveError = RuntimeError
+
+# Rollup tables mirrored into the archive, with their bucket widths
+ARCHIVE_TABLES = {name: width for name, width in ROLLUP_TABLES if width >= 3600}
+
+# Buckets that ended less than this long ago may still change as late
+# readings are rolled up
+SETTLE_TIME = timedelta(days=1)
+
+SYNC_BATCH_ROWS = 5000
+
+_BUCKET_ORIGIN = BUCKET_ORIGIN.replace(tzinfo=None)
+
+
+def _naive_utc(ts):
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def ensure_schema(conn):
+    metric_columns = ',\n'.join(f'{column} DOUBLE' for column in ROLLUP_COLUMNS)
+    with conn.cursor() as cur:
+        for table in ARCHIVE_TABLES:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    yacht_id INT NOT NULL,
+                    bucket DATETIME NOT NULL,
+                    samples INT NOT NULL,
+                    {metric_columns},
+                    PRIMARY KEY (yacht_id, bucket)
+                )
+            """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS archive_state (
+                name VARCHAR(64) PRIMARY KEY,
+                synced_through DATETIME NOT NULL
+            )
+        """)
+    conn.commit()
+
+
+def _synced_through(cur, table):
+    cur.execute("SELECT synced_through FROM archive_state WHERE name = %s", (table,))
+    row = cur.fetchone()
+    return row[0].replace(tzinfo=timezone.utc) if row else None
+
+
+def archived_through(conn, table):
+    """Buckets of a rollup table before this time are in the archive (None if never synced)"""
+    with conn.cursor() as cur:
+        synced = _synced_through(cur, table)
+    conn.rollback()
+    return synced
+
+
+def sync_table(pg_conn, archive_conn, table, width, now=None):
+    """Copy one rollup table's settled buckets since the last sync, returning rows copied"""
+    settled = (now or datetime.now(timezone.utc)) - SETTLE_TIME
+    # Start of the first bucket that has not ended SETTLE_TIME ago
+    cutoff = BUCKET_ORIGIN + timedelta(
+        seconds=math.floor((settled - BUCKET_ORIGIN).total_seconds() / width) * width)
+    with archive_conn.cursor() as mcur:
+        since = _synced_through(mcur, table)
+    if since is not None and since >= cutoff:
+        return 0
+
+    columns = ['yacht_id', 'bucket', 'samples'] + ROLLUP_COLUMNS
+    insert = (f"INSERT INTO {table} ({', '.join(columns)}) "
+              f"VALUES ({', '.join(['%s'] * len(columns))}) "
+              f"ON DUPLICATE KEY UPDATE "
+              + ', '.join(f'{c} = VALUES({c})' for c in columns[2:]))
+    copied = 0
+    with pg_conn.cursor(name=f'archive_{table}') as cur:
+        cur.execute(
+            f"SELECT {', '.join(columns)} FROM {table} "
+            f"WHERE bucket >= %s AND bucket < %s ORDER BY bucket",
+            (since or datetime.min.replace(tzinfo=timezone.utc), cutoff))
+        with archive_conn.cursor() as mcur:
+            while True:
+                rows = cur.fetchmany(SYNC_BATCH_ROWS)
+                if not rows:
+                    break
+                mcur.executemany(insert, [(row[0], _naive_utc(row[1])) + tuple(row[2:])
+                                          for row in rows])
+                copied += len(rows)
+            mcur.execute(
+                "INSERT INTO archive_state (name, synced_through) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE synced_through = VALUES(synced_through)",
+                (table, _naive_utc(cutoff)))
+    pg_conn.rollback()
+    archive_conn.commit()
+    return copied
+
+
+def query_metrics(conn, yacht_id, start, end, resolution):
+    """Bucketed metrics from the archive like timeseries.query_metrics
+
+    Returns None when the archive cannot answer: the resolution is finer
+    than hourly, or the range reaches past the last sync.
+    """
+    source, _ = pick_source(resolution)
+    if source not in ARCHIVE_TABLES:
+        return None
+    with conn.cursor() as cur:
+        synced = _synced_through(cur, source)
+        if synced is None or end > synced:
+            return None
+        aggregates = ', '.join(
+            f'SUM({m}_avg * samples) / NULLIF(SUM(CASE WHEN {m}_avg IS NOT NULL THEN samples END), 0) '
+            f'AS {m}_avg, MIN({m}_min) AS {m}_min, MAX({m}_max) AS {m}_max'
+            for m in ROLLUP_METRICS)
+        cur.execute(
+            f"SELECT DATE_ADD(CAST(%(origin)s AS DATETIME), INTERVAL "
+            f"FLOOR(TIMESTAMPDIFF(SECOND, %(origin)s, bucket) / %(width)s) * %(width)s SECOND) AS time, "
+            f"CAST(SUM(samples) AS SIGNED) AS samples, {aggregates} "
+            f"FROM {source} "
+            f"WHERE yacht_id = %(yacht_id)s AND bucket >= %(start)s AND bucket < %(end)s "
+            f"GROUP BY 1 ORDER BY 1",
+            {'origin': _BUCKET_ORIGIN, 'width': resolution, 'yacht_id': yacht_id,
+             'start': _naive_utc(start), 'end': _naive_utc(end)})
+        columns = [d[0] for d in cur.description]
+        points = []
+        for row in cur.fetchall():
+            point = dict(zip(columns, row))
+            point['time'] = point['time'].replace(tzinfo=timezone.utc)
+            points.append(point)
+    conn.rollback()
+    return f'archive:{source}', points
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Yacht IoT rollup archive')
+    parser.add_argument('command', choices=['migrate', 'sync'])
+    args = parser.parse_args()
+
+    from .data import db_router
+    if db_router.archive is None:
+        print("Archive is not configured (DBA_HOST is empty), nothing to do")
+        return 0
+
+    archive_conn = pg_conn = replica = None
+    try:
+        archive_conn = db_router.archive.getconn()
+        ensure_schema(archive_conn)
+        if args.command == 'migrate':
+            print("Archive schema is up to date")
+            return 0
+        # The copy is a long scan, so run it on a replica when there is one
+        db_router.monitor.run_checks()
+        replica = db_router.checkout_replica()
+        pg_conn = replica[1] if replica else db_router.primary.getconn()
+        for table, width in ARCHIVE_TABLES.items():
+            print(f"Archived {sync_table(pg_conn, archive_conn, table, width)} rows of {table}")
+    except (psycopg2.Error, ArchiveError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        if pg_conn is not None:
+            if replica:
+                db_router.putconn(replica[0], pg_conn)
+            else:
+                db_router.primary.putconn(pg_conn)
+        if archive_conn is not None:
+            db_router.archive.putconn(archive_conn)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Async (ASGI) serving mode for EMEA Yacht IoT Services
+
+Serves the same routes as the Flask app with Starlette and asyncpg
+connection pools, so a slow query suspends a coroutine instead of
+blocking a whole worker process. Reads go to the replicas chosen by
+yacht_iot.data's router, with an asyncpg pool per target, and /api/yachts
+shares its parameter handling and SQL with the Flask route:
+
+    gunicorn -c python:yacht_iot.gunicorn_conf --worker-class uvicorn.workers.UvicornWorker \
+        yacht_iot.asgi:app
+"""
+
+import asyncio
+import os
+
+import asyncpg
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+
+from .config import (DB_CONFIG, POOL_CONFIG, STREAM_FETCH_SIZE, POSITIONS_HEARTBEAT,
+                     POSITIONS_MAX_PENDING, BATCH_MAX_UPLOAD_BYTES)
+from .data import db_router, health_monitor, select_fields, yacht_page_args, yachts_query
+from .positions import AsyncSubscriber, parse_bbox
+from .serialization import dumps_columns, dumps_rows, stream_parts
+from .views import ingest_batch, position_hub
+from .wsgi import app as flask_app
+
+templates = Jinja2Templates(
+    directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'))
+
+pools = {}  # target name -> asyncpg pool; replicas are added on first use
+_yacht_columns = None
+
+
+def json_response(data, status_code=200, headers=None):
+    """JSON response encoded exactly like the Flask app's responses"""
+    return raw_json_response(flask_app.json.dumps(data).encode(), status_code, headers)
+
+
+def raw_json_response(body, status_code=200, headers=None):
+    return Response(body + b'\n', status_code=status_code, headers=headers,
+                    media_type='application/json')
+
+
+async def create_pool(config):
+    return await asyncpg.create_pool(
+        host=config['host'],
+        port=int(config['port']),
+        database=config['database'],
+        user=config['user'],
+        password=config['password'] or None,
+        min_size=0,
+        max_size=POOL_CONFIG['size'] + POOL_CONFIG['max_overflow'],
+        max_inactive_connection_lifetime=POOL_CONFIG['idle_timeout'],
+        timeout=POOL_CONFIG['timeout'],
+    )
+
+
+async def startup():
+    pools['primary'] = await create_pool(DB_CONFIG)
+
+
+async def shutdown():
+    for target_pool in pools.values():
+        await target_pool.close()
+
+
+async def acquire_read():
+    """(pool, connection) on a healthy replica, else on the primary"""
+    for name, replica in db_router.healthy_replicas():
+        try:
+            if name not in pools:
+                pools[name] = await create_pool(replica.connect_kwargs)
+            return pools[name], await pools[name].acquire()
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+            db_router.mark_failed(name, e)
+    return pools['primary'], await pools['primary'].acquire()
+
+
+async def get_yacht_columns(conn):
+    global _yacht_columns
+    if _yacht_columns is None:
+        rows = await conn.fetch(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'yachts' "
+            "ORDER BY ordinal_position")
+        _yacht_columns = [row['column_name'] for row in rows]
+    return _yacht_columns
+
+
+async def index(request):
+    """Home page"""
+    return templates.TemplateResponse(request, 'index.html')
+
+
+async def api_status(request):
+    """API status endpoint"""
+    return json_response({
+        'status': 'healthy',
+        'service': 'EMEA Yacht IoT Services',
+        'version': '1.0.0'
+    })
+
+
+async def api_yachts(request):
+    """Get yacht data from database (same parameters as the Flask route)"""
+    params = request.query_params
+    try:
+        after, limit, stream = yacht_page_args(params)
+    except ValueError:
+        return json_response({'error': 'after and limit must be integers'}, 400)
+
+    try:
+        pool, conn = await acquire_read()
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+        print(f"Database connection error: {e}")
+        return json_response({'error': 'Database connection failed'}, 500)
+
+    try:
+        try:
+            columns = select_fields(await get_yacht_columns(conn), params.get('fields'))
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        query, args = yachts_query(columns, after, limit, numbered=True)
+
+        if stream:
+            # The generator owns the connection from here on
+            stream_conn, conn = conn, None
+            compact = params.get('format') == 'columns'
+            return StreamingResponse(_stream_rows(pool, stream_conn, query, args, columns, compact),
+                                     media_type='application/json')
+
+        rows = await conn.fetch(query, *args)
+        headers = {}
+        if len(rows) == limit:
+            headers['X-Next-After'] = str(rows[-1]['id'])
+            next_url = request.url.include_query_params(after=rows[-1]['id'])
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        if params.get('format') == 'columns':
+            return raw_json_response(dumps_columns(columns, [tuple(row) for row in rows]),
+                                     headers=headers)
+        return raw_json_response(dumps_rows(columns, rows), headers=headers)
+    except asyncpg.PostgresError as e:
+        return json_response({'error': f'Database query failed: {e}'}, 500)
+    finally:
+        if conn is not None:
+            await pool.release(conn)
+
+
+async def _stream_rows(pool, conn, query, args, columns, compact=False):
+    """Write rows out as JSON while a server-side cursor fetches them"""
+    head, encode, tail = stream_parts(columns, compact)
+    try:
+        async with conn.transaction():
+            cursor = await conn.cursor(query, *args)
+            yield head
+            first = True
+            while True:
+                rows = await cursor.fetch(STREAM_FETCH_SIZE)
+                if not rows:
+                    break
+                yield (b'' if first else b',') + encode(
+                    [tuple(row) for row in rows] if compact else rows)
+                first = False
+            yield tail
+    finally:
+        await pool.release(conn)
+
+
+async def api_telemetry_batch(request):
+    """Ingest a compressed telemetry batch (same format as the Flask route)
+
+    A slow satellite upload only suspends this coroutine; decoding and the
+    COPY then run in a thread.
+    """
+    if int(request.headers.get('content-length') or 0) > BATCH_MAX_UPLOAD_BYTES:
+        return json_response({'error': f'Upload exceeds {BATCH_MAX_UPLOAD_BYTES} bytes'}, 413)
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > BATCH_MAX_UPLOAD_BYTES:
+            return json_response({'error': f'Upload exceeds {BATCH_MAX_UPLOAD_BYTES} bytes'}, 413)
+    payload, status = await asyncio.to_thread(
+        ingest_batch, body, request.headers.get('content-encoding'))
+    return json_response(payload, status)
+
+
+async def api_stream_positions(request):
+    """Server-Sent Events stream of live yacht positions (same filters as Flask)"""
+    params = request.query_params
+    try:
+        yacht_ids = [int(y) for y in params['yacht_id'].split(',')] if params.get('yacht_id') else None
+        bbox = parse_bbox(params['bbox']) if params.get('bbox') else None
+    except ValueError:
+        return json_response(
+            {'error': 'yacht_id must be integers and bbox min_lon,min_lat,max_lon,max_lat'}, 400)
+
+    subscriber = position_hub.subscribe(
+        AsyncSubscriber(yacht_ids, bbox, max_pending=POSITIONS_MAX_PENDING))
+    return StreamingResponse(_stream_positions(subscriber), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def _stream_positions(subscriber):
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            if not await subscriber.wait(POSITIONS_HEARTBEAT):
+                yield ': keepalive\n\n'
+                continue
+            for position in subscriber.drain():
+                yield f'event: position\ndata: {flask_app.json.dumps(position)}\n\n'
+    finally:
+        position_hub.unsubscribe(subscriber)
+
+
+async def health_check(request):
+    """Health check endpoint, served from the background monitor's last checks"""
+    health_monitor.ensure_started()
+    status, dependencies = await asyncio.to_thread(health_monitor.snapshot)
+    database = dependencies.get('postgresql', {}).get('status')
+    return json_response({
+        'status': status,
+        'database': 'connected' if database == 'up' else 'disconnected',
+        'dependencies': dependencies
+    }, 200 if status in ('healthy', 'degraded') else 503)
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/api/status', api_status),
+        Route('/api/yachts', api_yachts),
+        Route('/api/telemetry/batch', api_telemetry_batch, methods=['POST']),
+        Route('/api/stream/positions', api_stream_positions),
+        Route('/api/health', health_check),
+    ],
+    on_startup=[startup],
+    on_shutdown=[shutdown],
+)
@@ -0,0 +1,275 @@
+"""
+Compressed columnar telemetry batches for EMEA Yacht IoT Services
+
+Yachts on intermittent satellite links buffer readings on board and upload
+them in one go. A batch holds one yacht's readings column by column, so
+the server decodes it with ``np.frombuffer`` views over the decompressed
+body and writes it with a binary ``COPY`` built from the same arrays; no
+Python object is created per reading. The body may be compressed with
+zstd (``Content-Encoding: zstd``) or gzip.
+
+Batch layout, little-endian::
+
+    offset  size  field
+    0       4     magic b'YTB1'
+    4       2     format version (1)
+    6       2     flags (reserved, 0)
+    8       4     yacht_id (int32)
+    12      4     number of readings N (uint32)
+    16      8     seq (uint64), increasing per yacht
+    24            BATCH_COLUMNS, each N values of its type
+
+``recorded_at`` is microseconds since the Unix epoch; a missing reading
+is NaN. Each (yacht_id, seq) is recorded in ``telemetry_batches`` in the
+same transaction as its readings, so a retried upload is acknowledged
+without loading it twice.
+"""
+
+import io
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import psycopg2
+
+from .schema import TELEMETRY_TABLE, ensure_partitions, forget_partitions
+from .telemetry import NUMERIC_COLUMNS, TELEMETRY_COLUMNS, TelemetryError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b'YTB1'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHHiIQ')
+
+# Column types on the wire, matching the telemetry table's column types
+BATCH_COLUMNS = (
+    ('recorded_at', '<i8'),
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('speed_knots', '<f4'),
+    ('heading', '<f4'),
+    ('engine_rpm', '<f4'),
+    ('engine_temp_c', '<f4'),
+    ('fuel_rate_lph', '<f4'),
+    ('battery_voltage', '<f4'),
+    ('engine_hours', '<f8'),
+)
+
+DECOMPRESS_CHUNK_BYTES = 1024 * 1024
+
+ROW_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in BATCH_COLUMNS)
+
+# Readings from before this or more than a day ahead are rejected, since
+# each distinct day creates a partition
+EARLIEST_READING = datetime(2000, 1, 1, tzinfo=timezone.utc)
+MAX_CLOCK_SKEW = timedelta(days=1)
+
+# PostgreSQL timestamps count microseconds from 2000-01-01
+_PG_EPOCH_US = 946684800 * 1000000
+_US_PER_DAY = 86400 * 1000000
+
+_COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + b'\x00\x00\x00\x00' + b'\x00\x00\x00\x00'
+_COPY_TRAILER = b'\xff\xff'
+
+
+class BatchTooLarge(TelemetryError):
+    """Raised when a batch decompresses to more than the allowed size"""
+
+
+class Batch:
+    """A decoded batch: header fields plus one NumPy view per column"""
+
+    def __init__(self, yacht_id, seq, columns):
+        self.yacht_id = yacht_id
+        self.seq = seq
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns['recorded_at'])
+
+    def latest_row(self):
+        """Newest reading as a tuple in TELEMETRY_COLUMNS order"""
+        i = int(np.argmax(self.columns['recorded_at']))
+        recorded_at = datetime.fromtimestamp(0, timezone.utc) + timedelta(
+            microseconds=int(self.columns['recorded_at'][i]))
+        values = [self.yacht_id, recorded_at]
+        for column in NUMERIC_COLUMNS:
+            value = float(self.columns[column][i])
+            values.append(None if np.isnan(value) else value)
+        return tuple(values)
+
+
+def encode_batch(yacht_id, seq, columns, compression='zstd'):
+    """Build a batch body from per-column sequences (the device side)
+
+    ``columns['recorded_at']`` may be datetimes or epoch microseconds;
+    other columns may contain None for missing readings.
+    """
+    recorded_at = columns['recorded_at']
+    if len(recorded_at) and isinstance(recorded_at[0], datetime):
+        recorded_at = [round(ts.timestamp() * 1000000) for ts in recorded_at]
+    parts = [_HEADER.pack(MAGIC, VERSION, 0, yacht_id, len(recorded_at), seq)]
+    for name, dtype in BATCH_COLUMNS:
+        if name == 'recorded_at':
+            parts.append(np.asarray(recorded_at, dtype=dtype).tobytes())
+        else:
+            values = columns.get(name, [None] * len(recorded_at))
+            parts.append(np.array([np.nan if v is None else v for v in values], dtype=dtype).tobytes())
+    body = b''.join(parts)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstandard is not installed')
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if compression == 'gzip':
+        return zlib.compress(body, 6, wbits=16 + zlib.MAX_WBITS)
+    return body
+
+
+def decompress(body, encoding, max_bytes):
+    """Decompress a request body, never producing more than max_bytes"""
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        data = body
+    elif encoding == 'zstd':
+        if zstandard is None:
+            raise TelemetryError('zstd batches are not supported on this server (zstandard missing)')
+        data = bytearray()
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                # Chunked, since read(n) allocates n bytes up front
+                while len(data) <= max_bytes:
+                    chunk = reader.read(DECOMPRESS_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    data += chunk
+        except zstandard.ZstdError as e:
+            raise TelemetryError(f'Invalid zstd body: {e}')
+    elif encoding in ('gzip', 'x-gzip'):
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise TelemetryError(f'Invalid gzip body: {e}')
+        if len(data) <= max_bytes and not decompressor.eof:
+            raise TelemetryError('Truncated gzip body')
+    else:
+        raise TelemetryError(f'Unsupported Content-Encoding {encoding!r}')
+    if len(data) > max_bytes:
+        raise BatchTooLarge(f'Batch exceeds {max_bytes} bytes uncompressed')
+    return data
+
+
+def decode_batch(data, now=None):
+    """Validate a decompressed batch and return column views over its buffer"""
+    if len(data) < _HEADER.size:
+        raise TelemetryError('Batch is shorter than its header')
+    magic, version, _, yacht_id, count, seq = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise TelemetryError('Not a telemetry batch (bad magic)')
+    if version != VERSION:
+        raise TelemetryError(f'Unsupported batch version {version}')
+    if yacht_id <= 0:
+        raise TelemetryError('yacht_id must be positive')
+    if seq >= 2 ** 63:
+        raise TelemetryError('seq must fit in a signed 64-bit integer')
+    if len(data) != _HEADER.size + count * ROW_BYTES:
+        raise TelemetryError(f'Batch length does not match {count} readings')
+
+    columns = {}
+    offset = _HEADER.size
+    for name, dtype in BATCH_COLUMNS:
+        columns[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += columns[name].nbytes
+
+    if count:
+        recorded_at = columns['recorded_at']
+        latest = (now or datetime.now(timezone.utc)) + MAX_CLOCK_SKEW
+        if (recorded_at.min() < EARLIEST_READING.timestamp() * 1000000
+                or recorded_at.max() > latest.timestamp() * 1000000):
+            raise TelemetryError('recorded_at out of range')
+    return Batch(yacht_id, seq, columns)
+
+
+def encode_copy(batch):
+    """Binary COPY stream of a batch in TELEMETRY_COLUMNS order
+
+    Binary COPY writes a NULL as a -1 length with no value bytes, so rows
+    differ in layout by which columns are missing. Rows are grouped by that
+    null pattern and each group is packed as one structured array; row
+    order does not matter to COPY.
+    """
+    count = len(batch)
+    numeric = [(name, dtype) for name, dtype in BATCH_COLUMNS if name != 'recorded_at']
+    missing = np.zeros(count, dtype=np.int64)
+    for bit, (name, _) in enumerate(numeric):
+        missing |= np.isnan(batch.columns[name]).astype(np.int64) << bit
+
+    parts = [_COPY_HEADER]
+    for pattern in np.unique(missing):
+        rows = missing == pattern
+        fields = [('count', '>i2'), ('yacht_id_len', '>i4'), ('yacht_id', '>i4'),
+                  ('recorded_at_len', '>i4'), ('recorded_at', '>i8')]
+        for bit, (name, dtype) in enumerate(numeric):
+            fields.append((f'{name}_len', '>i4'))
+            if not pattern >> bit & 1:
+                fields.append((name, '>' + dtype[1:]))
+        packed = np.empty(int(rows.sum()), dtype=np.dtype(fields))
+        packed['count'] = len(TELEMETRY_COLUMNS)
+        packed['yacht_id_len'] = 4
+        packed['yacht_id'] = batch.yacht_id
+        packed['recorded_at_len'] = 8
+        packed['recorded_at'] = batch.columns['recorded_at'][rows] - _PG_EPOCH_US
+        for bit, (name, dtype) in enumerate(numeric):
+            if pattern >> bit & 1:
+                packed[f'{name}_len'] = -1
+            else:
+                packed[f'{name}_len'] = np.dtype(dtype).itemsize
+                packed[name] = batch.columns[name][rows]
+        parts.append(packed.tobytes())
+    parts.append(_COPY_TRAILER)
+    return b''.join(parts)
+
+
+def load_batch(conn, batch, buffer=None):
+    """Record and bulk-load a batch, returning False if (yacht_id, seq) was seen
+
+    When ``buffer`` is given, its writers and listeners see the batch's
+    newest reading, so live positions and caches follow catch-up uploads.
+    """
+    latest = batch.latest_row() if len(batch) else None
+    try:
+        with conn.cursor() as cur:
+            if latest is not None:
+                days = np.unique(batch.columns['recorded_at'] // _US_PER_DAY)
+                ensure_partitions(cur, [(datetime.fromtimestamp(0, timezone.utc)
+                                         + timedelta(days=int(day))).date() for day in days])
+            cur.execute(
+                "INSERT INTO telemetry_batches (yacht_id, seq, readings) VALUES (%s, %s, %s) "
+                "ON CONFLICT (yacht_id, seq) DO NOTHING", (batch.yacht_id, batch.seq, len(batch)))
+            if cur.rowcount == 0:
+                conn.rollback()
+                return False
+            if latest is not None:
+                cur.copy_expert(
+                    f"COPY {TELEMETRY_TABLE} ({', '.join(TELEMETRY_COLUMNS)}) "
+                    f"FROM STDIN WITH (FORMAT binary)", io.BytesIO(encode_copy(batch)))
+                if buffer is not None:
+                    buffer.run_writers(cur, [latest])
+        conn.commit()
+    except psycopg2.IntegrityError:
+        conn.rollback()
+        # No partition for a reading: the cached one may have been dropped
+        # by retention, so check again when the client retries
+        forget_partitions()
+        raise
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    if buffer is not None and latest is not None:
+        buffer.run_listeners([latest])
+    return True
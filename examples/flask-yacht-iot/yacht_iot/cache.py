@@ -0,0 +1,180 @@
+"""
+Response caching for EMEA Yacht IoT Services
+
+Read endpoints are cached per URL under a tag ('yachts', 'telemetry', ...).
+Each tag has a generation number that is part of the cache key, so
+invalidating a tag is a single counter bump instead of a key scan.
+"""
+
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+
+
+class LRUCache:
+    """In-process LRU cache with per-entry expiry.
+
+    Each gunicorn worker holds its own copy, so an invalidation only reaches
+    the worker that performed the write; other workers catch up when their
+    entries expire.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_counter(self, name):
+        return self._counters.get(name, 0)
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+            return self._counters[name]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """Cache shared by every worker and instance, backed by Redis"""
+
+    def __init__(self, url, prefix='yacht-iot:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND=redis requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def get_counter(self, name):
+        value = self.client.get(self.prefix + 'counter:' + name)
+        return int(value) if value is not None else 0
+
+    def incr(self, name):
+        return self.client.incr(self.prefix + 'counter:' + name)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """Caches successful GET responses and answers If-None-Match with 304"""
+
+    def __init__(self, backend=None, default_ttl=5, enabled=True):
+        self.backend = backend if backend is not None else LRUCache()
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, tag):
+        generation = self.backend.get_counter(tag)
+        return f'{tag}:{generation}:{request.full_path}'
+
+    def invalidate(self, *tags):
+        """Drop every cached response under the given tags"""
+        for tag in tags:
+            try:
+                self.backend.incr(tag)
+            except Exception as e:
+                print(f"Cache invalidation error: {e}")
+
+    def cached(self, tag, ttl=None):
+        """Route decorator caching the view's response under ``tag``"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                try:
+                    key = self._key(tag)
+                    entry = self.backend.get(key)
+                except Exception as e:
+                    print(f"Cache read error: {e}")
+                    key, entry = None, None
+
+                if entry is not None:
+                    self.hits += 1
+                    return self._respond(entry, 'HIT')
+
+                self.misses += 1
+                response = make_response(view(*args, **kwargs))
+                if (key is None or response.status_code != 200
+                        or response.is_streamed or response.direct_passthrough):
+                    return response
+
+                body = response.get_data()
+                entry = {
+                    'body': body,
+                    'mimetype': response.mimetype,
+                    'headers': [(k, v) for k, v in response.headers
+                                if k.lower() not in ('content-length', 'content-type')],
+                    'etag': hashlib.blake2b(body, digest_size=16).hexdigest(),
+                }
+                try:
+                    self.backend.set(key, entry, ttl or self.default_ttl)
+                except Exception as e:
+                    print(f"Cache write error: {e}")
+                return self._respond(entry, 'MISS')
+            return wrapper
+        return decorator
+
+    def _respond(self, entry, status):
+        if request.if_none_match.contains_weak(entry['etag']):
+            response = make_response('', 304)
+        else:
+            response = make_response(entry['body'], 200)
+            response.mimetype = entry['mimetype']
+            for name, value in entry['headers']:
+                response.headers[name] = value
+        response.set_etag(entry['etag'])
+        response.headers['X-Cache'] = status
+        return response
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
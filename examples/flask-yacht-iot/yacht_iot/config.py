@@ -0,0 +1,102 @@
+"""
+Deployment configuration for EMEA Yacht IoT Services
+
+Every setting the web app and its data layer read from the environment,
+in one place. Each deployment sets them through its own
+``.upsun/config.yaml`` variables and ``.environment``; the code is the
+same everywhere. The background jobs keep their own settings next to
+them (ALERTS_CONFIG, MAINTENANCE_CONFIG, RETENTION_POLICY, ...).
+"""
+
+import os
+from datetime import timedelta
+
+SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
+DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': os.environ.get('DB_PORT', '5432'),
+    'database': os.environ.get('DB_DATABASE', 'yacht_iot'),
+    'user': os.environ.get('DB_USERNAME', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', '')
+}
+
+# Connection pool configuration (one pool per gunicorn worker)
+POOL_CONFIG = {
+    'size': int(os.environ.get('DB_POOL_SIZE', '5')),
+    'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', '10')),
+    'idle_timeout': float(os.environ.get('DB_POOL_IDLE_TIMEOUT', '300')),
+    'pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+}
+
+# Read replicas as "host:port,host:port"; they share the primary's database
+# and credentials unless DB_REPLICA_USERNAME/DB_REPLICA_PASSWORD are set
+DB_REPLICAS = [r.strip() for r in os.environ.get('DB_REPLICAS', '').split(',') if r.strip()]
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', '30'))
+DB_REPLICA_USERNAME = os.environ.get('DB_REPLICA_USERNAME', '')
+DB_REPLICA_PASSWORD = os.environ.get('DB_REPLICA_PASSWORD', '')
+
+# MariaDB "dba" relationship, used as the rollup archive when configured
+DBA_CONFIG = {
+    'host': os.environ.get('DBA_HOST', ''),
+    'port': int(os.environ.get('DBA_PORT') or '3306'),
+    'database': os.environ.get('DBA_DATABASE', ''),
+    'user': os.environ.get('DBA_USERNAME', ''),
+    'password': os.environ.get('DBA_PASSWORD', '')
+}
+ARCHIVE_POOL_SIZE = int(os.environ.get('ARCHIVE_POOL_SIZE', '2'))
+
+# Metric ranges that ended this long ago are read from the archive
+ARCHIVE_AFTER = timedelta(days=int(os.environ.get('ARCHIVE_AFTER_DAYS', '30')))
+
+# Background dependency checks behind /api/health
+HEALTH_CHECK_INTERVAL = float(os.environ.get('HEALTH_CHECK_INTERVAL', '10'))
+HEALTH_STALE_AFTER = float(os.environ.get('HEALTH_STALE_AFTER', '30'))
+
+# Telemetry ingest buffer configuration (one buffer per gunicorn worker)
+TELEMETRY_CONFIG = {
+    'max_rows': int(os.environ.get('TELEMETRY_BUFFER_MAX_ROWS', '50000')),
+    'flush_rows': int(os.environ.get('TELEMETRY_FLUSH_ROWS', '5000')),
+    'flush_interval': float(os.environ.get('TELEMETRY_FLUSH_INTERVAL', '2'))
+}
+
+# Compressed batch uploads (/api/telemetry/batch): limits on the body as sent
+# and as decompressed; readings are held as NumPy columns, not Python objects
+BATCH_MAX_UPLOAD_BYTES = int(os.environ.get('BATCH_MAX_UPLOAD_BYTES', str(16 * 1024 * 1024)))
+BATCH_MAX_BYTES = int(os.environ.get('BATCH_MAX_BYTES', str(128 * 1024 * 1024)))
+
+# Response cache configuration: "memory" (per worker), "redis" or "none"
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+CACHE_TTL = float(os.environ.get('CACHE_TTL', '5'))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+
+# Live position stream (/api/stream/positions)
+POSITIONS_MAX_PENDING = int(os.environ.get('POSITIONS_MAX_PENDING', '1000'))
+POSITIONS_HEARTBEAT = float(os.environ.get('POSITIONS_HEARTBEAT', '15'))
+
+# Area queries: "auto" uses PostGIS when the migration could enable it,
+# otherwise a per-worker grid index fed by the live position stream
+SPATIAL_INDEX = os.environ.get('SPATIAL_INDEX', 'auto')
+SPATIAL_GRID_DEGREES = float(os.environ.get('SPATIAL_GRID_DEGREES', '0.5'))
+
+# With METRICS_DIR set, every worker writes its numbers there and /metrics sums them
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+
+# Requests carrying "X-Profile: <PROFILE_TOKEN>" return a sampled profile instead
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.005'))
+
+# /api/yachts paging limits
+YACHTS_DEFAULT_LIMIT = int(os.environ.get('YACHTS_DEFAULT_LIMIT', '10'))
+YACHTS_MAX_LIMIT = int(os.environ.get('YACHTS_MAX_LIMIT', '1000'))
+STREAM_FETCH_SIZE = int(os.environ.get('STREAM_FETCH_SIZE', '2000'))
+
+# Upper bound on buckets returned by /api/yachts/<id>/metrics
+METRICS_MAX_POINTS = int(os.environ.get('METRICS_MAX_POINTS', '2000'))
+
+# Analytics windows are decoded into memory, so their length is bounded
+ANALYTICS_MAX_DAYS = int(os.environ.get('ANALYTICS_MAX_DAYS', '92'))
@@ -0,0 +1,182 @@
+"""
+Shared data access for EMEA Yacht IoT Services
+
+The process-wide database layer used by the Flask app, the ASGI mode and
+the background jobs: the primary pool, the router over read replicas and
+the MariaDB archive, the health monitor probing them, per-request
+connection helpers, and the /api/yachts query helpers both serving modes
+build their SQL with. Everything here is built once per process from
+yacht_iot.config; every app create_app() returns shares it.
+"""
+
+import time
+
+import psycopg2
+from flask import g
+
+from . import config
+from .db import ConnectionPool, MySQLPool
+from .health import HealthMonitor, pool_check
+from .instrumentation import InstrumentedConnection, MetricsRegistry
+from .router import DatabaseRouter
+from .serialization import stream_parts
+
+# Request metrics, exposed on /metrics. With METRICS_DIR set, every worker
+# writes its numbers there and the endpoint sums them.
+metrics = MetricsRegistry(directory=config.METRICS_DIR)
+metrics.histogram('db_request_duration_seconds', 'Database time per request by route')
+metrics.counter('db_queries_total', 'Database queries by route')
+metrics.histogram('db_pool_wait_seconds', 'Time to check a connection out of the pool')
+metrics.counter('db_pool_errors_total', 'Failed pool checkouts')
+metrics.counter('db_replica_failovers_total', 'Reads moved off a replica that failed a checkout')
+
+db_pool = ConnectionPool(**config.POOL_CONFIG, **config.DB_CONFIG,
+                         connection_factory=InstrumentedConnection)
+
+# Dependencies are probed in the background; /api/health serves the last result
+health_monitor = HealthMonitor(interval=config.HEALTH_CHECK_INTERVAL,
+                               stale_after=config.HEALTH_STALE_AFTER)
+health_monitor.add_check('postgresql', pool_check(db_pool))
+
+# Writes go to the primary, reporting reads to a healthy replica and old
+# metric ranges to the archive; each target has its own pool
+db_router = DatabaseRouter(db_pool, health_monitor, max_lag=config.DB_REPLICA_MAX_LAG,
+                           on_failover=lambda name: metrics.inc('db_replica_failovers_total',
+                                                                target=name))
+for replica in config.DB_REPLICAS:
+    host, _, port = replica.partition(':')
+    replica_config = {
+        **config.DB_CONFIG,
+        'host': host,
+        'port': port or config.DB_CONFIG['port'],
+        'user': config.DB_REPLICA_USERNAME or config.DB_CONFIG['user'],
+        'password': config.DB_REPLICA_PASSWORD or config.DB_CONFIG['password']
+    }
+    db_router.add_replica(f'replica:{replica}', ConnectionPool(
+        **config.POOL_CONFIG, **replica_config, connection_factory=InstrumentedConnection))
+if config.DBA_CONFIG['host']:
+    db_router.set_archive(MySQLPool(
+        size=config.ARCHIVE_POOL_SIZE, max_overflow=config.ARCHIVE_POOL_SIZE,
+        idle_timeout=config.POOL_CONFIG['idle_timeout'], timeout=config.POOL_CONFIG['timeout'],
+        connect_timeout=5, read_timeout=30, **config.DBA_CONFIG))
+
+metrics.gauge('db_pool_connections', 'Pooled connections by target and state', lambda: [
+    ({'target': target, 'state': state}, value)
+    for target, stats in db_router.stats().items()
+    for state, value in stats.items() if state in ('idle', 'in_use')])
+
+
+def get_db_connection():
+    """Get a pooled primary connection for the current request"""
+    if 'db_conn' not in g:
+        started = time.perf_counter()
+        try:
+            g.db_conn = db_pool.getconn()
+        except psycopg2.Error as e:
+            metrics.inc('db_pool_errors_total', target='primary')
+            print(f"Database connection error: {e}")
+            return None
+        finally:
+            metrics.observe('db_pool_wait_seconds', time.perf_counter() - started, target='primary')
+    return g.db_conn
+
+
+def get_read_connection():
+    """Get a connection for read-only queries: a healthy replica, else the primary"""
+    if 'read_conn' not in g:
+        started = time.perf_counter()
+        replica = db_router.checkout_replica()
+        if replica is None:
+            return get_db_connection()
+        metrics.observe('db_pool_wait_seconds', time.perf_counter() - started, target=replica[0])
+        g.read_target, g.read_conn = replica
+    return g.read_conn
+
+
+def release_connections():
+    """Return the request's connections to their pools"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.putconn(conn)
+    conn = g.pop('read_conn', None)
+    if conn is not None:
+        db_router.putconn(g.pop('read_target'), conn)
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def yacht_page_args(args):
+    """(after, limit, stream) from /api/yachts query parameters
+
+    Raises ValueError when after or limit is not an integer.
+    """
+    stream = args.get('stream') == '1'
+    after = args.get('after')
+    after = int(after) if after is not None else None
+    limit = args.get('limit')
+    limit = int(limit) if limit is not None else None
+    if limit is None and not stream:
+        limit = config.YACHTS_DEFAULT_LIMIT
+    if limit is not None and not stream:
+        limit = max(1, min(limit, config.YACHTS_MAX_LIMIT))
+    return after, limit, stream
+
+
+def select_fields(columns, fields):
+    """The columns a fields= parameter asks for, id first
+
+    Raises ValueError naming any column the table does not have.
+    """
+    if not fields:
+        return columns
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ['id'] + [f for f in requested if f != 'id']
+
+
+def yachts_query(columns, after=None, limit=None, numbered=False):
+    """(SQL, parameters) for a keyset page of yachts ordered by id
+
+    Placeholders are psycopg2's %s, or asyncpg's $1, $2 with ``numbered``.
+    """
+    params = []
+
+    def placeholder(value):
+        params.append(value)
+        return f'${len(params)}' if numbered else '%s'
+
+    selected = ', '.join(map(quote_ident, columns))
+    query = f"SELECT {selected if numbered else selected.replace('%', '%%')} FROM yachts"
+    if after is not None:
+        query += f' WHERE id > {placeholder(after)}'
+    query += ' ORDER BY id'
+    if limit is not None:
+        query += f' LIMIT {placeholder(limit)}'
+    return query, params
+
+
+def stream_rows(conn, query, params, columns, compact=False):
+    """Write rows out as JSON while a named cursor fetches them
+
+    Objects by default, or the columns/rows form with ``compact``.
+    """
+    head, encode, tail = stream_parts(columns, compact)
+    try:
+        with conn.cursor(name='yachts_stream') as cur:
+            cur.execute(query, params)
+            yield head
+            first = True
+            while True:
+                rows = cur.fetchmany(config.STREAM_FETCH_SIZE)
+                if not rows:
+                    break
+                # Each batch is encoded in one call, without its brackets
+                yield (b'' if first else b',') + encode(rows)
+                first = False
+            yield tail
+    finally:
+        conn.rollback()
@@ -0,0 +1,264 @@
+"""
+Database connection pooling and query helpers for EMEA Yacht IoT Services
+"""
+
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection became available within the checkout timeout"""
+
+
+class ConnectionPool:
+    """Per-process pool of psycopg2 connections.
+
+    Keeps up to ``size`` idle connections around, allows ``max_overflow``
+    extra connections under burst load (closed again when returned), drops
+    connections that sat idle longer than ``idle_timeout`` seconds and, when
+    ``pre_ping`` is set, validates a connection with ``SELECT 1`` before
+    handing it out.
+    """
+
+    def __init__(self, size=5, max_overflow=10, idle_timeout=300, pre_ping=True,
+                 timeout=10, **connect_kwargs):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        """Forget all connections (used after a fork, never closes sockets)"""
+        self._pid = os.getpid()
+        self._idle = []  # (connection, returned_at) pairs, most recent last
+        self._in_use = set()
+        self._closing = set()  # checked out when the pool was closed; closed on return
+
+    def _check_pid(self):
+        # Connections inherited across a gunicorn fork belong to the parent;
+        # closing them here would terminate the parent's sessions.
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def total(self):
+        return len(self._idle) + len(self._in_use)
+
+    # Driver hooks, overridden by MySQLPool
+    def _connect(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    def _is_closed(self, conn):
+        return bool(conn.closed)
+
+    def _ping(self, conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _end_transaction(self, conn):
+        """Roll back anything left open, returning False if the connection is broken"""
+        try:
+            if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _is_usable(self, conn, returned_at):
+        if self._is_closed(conn):
+            return False
+        if self.idle_timeout and time.monotonic() - returned_at > self.idle_timeout:
+            return False
+        return not self.pre_ping or self._ping(conn)
+
+    def getconn(self):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = placeholder = None
+            with self._cond:
+                self._check_pid()
+                while True:
+                    if self._idle:
+                        # Reserve it; validating is a round trip, done without the lock
+                        conn, returned_at = self._idle.pop()
+                        self._in_use.add(conn)
+                        break
+
+                    if self.total < self.size + self.max_overflow:
+                        # Reserve the slot before releasing the lock to connect
+                        placeholder = object()
+                        self._in_use.add(placeholder)
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f'No database connection available after {self.timeout}s '
+                            f'({self.total} connections in use)')
+                    self._cond.wait(remaining)
+
+            if placeholder is None:
+                if self._is_usable(conn, returned_at):
+                    return conn
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._closing.discard(conn)
+                    self._cond.notify()
+                self._discard(conn)
+                continue
+
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._in_use.discard(placeholder)
+                    self._closing.discard(placeholder)
+                    self._cond.notify()
+                raise
+
+            with self._cond:
+                if placeholder in self._in_use:
+                    self._in_use.discard(placeholder)
+                    self._in_use.add(conn)
+                else:
+                    # The pool was closed while connecting
+                    self._closing.discard(placeholder)
+                    self._closing.add(conn)
+            return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool"""
+        with self._cond:
+            closing = conn in self._closing
+            if closing:
+                # Checked out when the pool was closed
+                self._closing.discard(conn)
+            elif conn not in self._in_use:
+                # Checked out before a fork, or returned twice
+                return
+        if closing:
+            self._discard(conn)
+            return
+
+        # The rollback is a round trip; the connection stays reserved meanwhile
+        if not close and not self._is_closed(conn):
+            close = not self._end_transaction(conn)
+
+        with self._cond:
+            if conn in self._closing:
+                # The pool was closed meanwhile
+                self._closing.discard(conn)
+                keep = False
+            elif conn not in self._in_use:
+                # Returned twice meanwhile
+                return
+            else:
+                self._in_use.discard(conn)
+                keep = not close and not self._is_closed(conn) and len(self._idle) < self.size
+                if keep:
+                    self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def warm(self, count=None):
+        """Open up to ``count`` (default ``size``) idle connections ahead of traffic
+
+        Returns the number of idle connections afterwards; connection errors
+        propagate, the connections opened so far stay in the pool.
+        """
+        count = min(self.size if count is None else count, self.size)
+        conns = []
+        try:
+            while len(self._idle) + len(conns) < count:
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+        return len(self._idle)
+
+    def closeall(self):
+        """Close every idle connection; checked-out ones are closed when returned"""
+        with self._cond:
+            self._check_pid()
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._closing |= self._in_use
+            self._in_use = set()
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool usage"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+            }
+
+
+class MySQLPool(ConnectionPool):
+    """ConnectionPool for MariaDB/MySQL over PyMySQL, imported when first used"""
+
+    def _connect(self):
+        try:
+            import pymysql
+        except ImportError:
+            raise RuntimeError('PyMySQL is not installed')
+        return pymysql.connect(**self.connect_kwargs)
+
+    def _is_closed(self, conn):
+        return not conn.open
+
+    def _ping(self, conn):
+        try:
+            conn.ping(reconnect=False)
+        except Exception:
+            return False
+        return True
+
+    def _end_transaction(self, conn):
+        try:
+            conn.rollback()
+        except Exception:
+            return False
+        return True
+
+
+_table_columns = {}
+
+
+def get_table_columns(conn, table):
+    """Column names of a table in ordinal order, cached per process"""
+    if table not in _table_columns:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s "
+                "ORDER BY ordinal_position", (table,))
+            _table_columns[table] = [row[0] for row in cur.fetchall()]
+        conn.rollback()
+    return _table_columns[table]
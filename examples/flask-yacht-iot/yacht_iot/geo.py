@@ -0,0 +1,200 @@
+"""
+Latest yacht positions and spatial queries for EMEA Yacht IoT Services
+
+Every telemetry flush upserts the newest position per yacht into
+``yacht_positions``. Area queries then use one of two indexes:
+
+* PostGIS, when the extension is installed: a GiST index on a generated
+  ``geog`` column answers radius queries, and one on the planar lon/lat
+  point answers bounding-box queries, both in the database.
+* Otherwise ``GridIndex``, an in-process grid of fixed-size lat/lon cells.
+  Each worker loads it from ``yacht_positions`` once and then keeps it
+  current from the live position feed, so a query only visits the cells
+  that overlap the search area.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+from .positions import latest_positions
+
+EARTH_RADIUS_NM = 3440.065
+
+POSITION_FIELDS = ('yacht_id', 'recorded_at', 'latitude', 'longitude', 'speed_knots', 'heading')
+
+
+def upsert_positions(cur, rows):
+    """Keep yacht_positions at the newest reading of each yacht in a flush"""
+    # Rows are locked in yacht_id order, so concurrent flushes from several
+    # workers cannot deadlock on each other
+    latest = sorted(latest_positions(rows), key=lambda position: position[0])
+    if latest:
+        execute_values(
+            cur,
+            "INSERT INTO yacht_positions "
+            "(yacht_id, recorded_at, latitude, longitude, speed_knots, heading) VALUES %s "
+            "ON CONFLICT (yacht_id) DO UPDATE SET recorded_at = EXCLUDED.recorded_at, "
+            "latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude, "
+            "speed_knots = EXCLUDED.speed_knots, heading = EXCLUDED.heading, updated_at = now() "
+            "WHERE EXCLUDED.recorded_at >= yacht_positions.recorded_at",
+            latest)
+
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_NM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def radius_bbox(lat, lon, radius_nm):
+    """Bounding box (min_lon, min_lat, max_lon, max_lat) around a circle"""
+    dlat = math.degrees(radius_nm / EARTH_RADIUS_NM)
+    cos_lat = math.cos(math.radians(lat))
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+    return (max(lon - dlon, -180.0), max(lat - dlat, -90.0),
+            min(lon + dlon, 180.0), min(lat + dlat, 90.0))
+
+
+def has_postgis(cur):
+    cur.execute("SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = 'yacht_positions' "
+                "AND column_name = 'geog'")
+    return cur.fetchone() is not None
+
+
+def postgis_near(cur, lat, lon, radius_nm, limit):
+    cur.execute(
+        "WITH origin AS (SELECT ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326)::geography AS g) "
+        "SELECT yacht_id, recorded_at, latitude, longitude, speed_knots, heading, "
+        "ST_Distance(geog, origin.g) / 1852.0 AS distance_nm "
+        "FROM yacht_positions, origin WHERE ST_DWithin(geog, origin.g, %(meters)s) "
+        "ORDER BY geog <-> origin.g LIMIT %(limit)s",
+        {'lat': lat, 'lon': lon, 'meters': radius_nm * 1852.0, 'limit': limit})
+    return cur.fetchall()
+
+
+def postgis_within(cur, bbox, limit):
+    # Same expression as yacht_positions_geom_idx; && on a point is exact
+    cur.execute(
+        "SELECT yacht_id, recorded_at, latitude, longitude, speed_knots, heading "
+        "FROM yacht_positions "
+        "WHERE ST_SetSRID(ST_MakePoint(longitude, latitude), 4326) "
+        "&& ST_MakeEnvelope(%s, %s, %s, %s, 4326) "
+        "ORDER BY yacht_id LIMIT %s",
+        (*bbox, limit))
+    return cur.fetchall()
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.astimezone(timezone.utc).timestamp()
+
+
+class GridIndex:
+    """In-process grid of the latest yacht positions.
+
+    Subscribes to a PositionHub like a streaming client does, so positions
+    from every worker's flushes arrive over LISTEN/NOTIFY. The grid is
+    reloaded from the database every ``reload_interval`` seconds to repair
+    anything missed while the LISTEN connection was down. Longitudes are
+    not wrapped at the antimeridian.
+    """
+
+    def __init__(self, hub, pool, cell_degrees=0.5, reload_interval=300):
+        self.hub = hub
+        self.pool = pool
+        self.cell_degrees = cell_degrees
+        self.reload_interval = reload_interval
+        self._cells = {}  # (row, col) -> {yacht_id: position}
+        self._positions = {}  # yacht_id -> (cell, position)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+
+    # Subscriber interface used by PositionHub.publish
+    def matches(self, position):
+        return True
+
+    def offer(self, position):
+        with self._lock:
+            self._place(dict(position))
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def _place(self, position):
+        yacht_id = position['yacht_id']
+        position['_ts'] = _timestamp(position['recorded_at'])
+        current = self._positions.get(yacht_id)
+        if current is not None:
+            cell, previous = current
+            if previous['_ts'] > position['_ts']:
+                return
+            self._cells[cell].pop(yacht_id, None)
+            if not self._cells[cell]:
+                del self._cells[cell]
+        cell = self._cell(position['latitude'], position['longitude'])
+        self._cells.setdefault(cell, {})[yacht_id] = position
+        self._positions[yacht_id] = (cell, position)
+
+    def ensure_loaded(self):
+        """Load every position from the database when missing or due a reload"""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_interval:
+            return
+        # Subscribe first so nothing published during the load is lost
+        self.hub.subscribe(self)
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT {', '.join(POSITION_FIELDS)} FROM yacht_positions")
+                rows = cur.fetchall()
+            conn.rollback()
+        finally:
+            self.pool.putconn(conn)
+        with self._lock:
+            for row in rows:
+                self._place(dict(zip(POSITION_FIELDS, row)))
+            self._loaded_at = time.monotonic()
+
+    def _candidates(self, bbox):
+        min_lon, min_lat, max_lon, max_lat = bbox
+        low_row, low_col = self._cell(min_lat, min_lon)
+        high_row, high_col = self._cell(max_lat, max_lon)
+        with self._lock:
+            if (high_row - low_row + 1) * (high_col - low_col + 1) > len(self._cells):
+                # Sparse fleet, large area: walking occupied cells is cheaper
+                cells = [positions for (row, col), positions in self._cells.items()
+                         if low_row <= row <= high_row and low_col <= col <= high_col]
+            else:
+                cells = [self._cells[(row, col)]
+                         for row in range(low_row, high_row + 1)
+                         for col in range(low_col, high_col + 1) if (row, col) in self._cells]
+            return [p for positions in cells for p in positions.values()]
+
+    def within(self, bbox, limit):
+        min_lon, min_lat, max_lon, max_lat = bbox
+        found = [p for p in self._candidates(bbox)
+                 if min_lon <= p['longitude'] <= max_lon and min_lat <= p['latitude'] <= max_lat]
+        found.sort(key=lambda p: p['yacht_id'])
+        return [_public(p) for p in found[:limit]]
+
+    def near(self, lat, lon, radius_nm, limit):
+        found = []
+        for p in self._candidates(radius_bbox(lat, lon, radius_nm)):
+            distance = haversine_nm(lat, lon, p['latitude'], p['longitude'])
+            if distance <= radius_nm:
+                found.append((distance, p))
+        found.sort(key=lambda item: item[0])
+        return [{**_public(p), 'distance_nm': distance} for distance, p in found[:limit]]
+
+    def __len__(self):
+        return len(self._positions)
+
+
+def _public(position):
+    return {field: position[field] for field in POSITION_FIELDS}
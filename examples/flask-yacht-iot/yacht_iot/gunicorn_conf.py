@@ -0,0 +1,147 @@
+"""
+Production gunicorn settings for EMEA Yacht IoT Services
+
+Usage (Upsun web start command):
+    gunicorn -c python:yacht_iot.gunicorn_conf yacht_iot.wsgi:app
+
+* The app is imported once in the master (``preload_app``) and its
+  templates are compiled there, so forked workers share the imported
+  modules and compiled templates instead of each importing Flask, NumPy
+  and psycopg2 and parsing templates on its first request.
+* After the fork each worker opens its pool connections
+  (``GUNICORN_WARM_CONNECTIONS``) and sends itself one request
+  (``GUNICORN_WARMUP_PATH``) before accepting traffic, so the first real
+  request does not pay for connecting or first-call code paths. Pools are
+  per process and never reuse connections from the master.
+* Without ``WEB_CONCURRENCY`` the worker count follows the container's
+  CPU quota and memory limit (cgroup), or the CPUs available.
+* Import, template, warm-up and first-request times are logged per worker.
+"""
+
+import math
+import os
+import time
+
+_BOOT = time.perf_counter()
+
+# Each worker's resident size once warm, used to fit workers in the memory limit
+WORKER_MEMORY_MB = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', '160'))
+WORKERS_PER_CPU = int(os.environ.get('GUNICORN_WORKERS_PER_CPU', '2'))
+WARMUP_PATH = os.environ.get('GUNICORN_WARMUP_PATH', '/api/status')
+# Connections each worker opens after the fork (default: the pool size, 0 to skip)
+WARM_CONNECTIONS = os.environ.get('GUNICORN_WARM_CONNECTIONS')
+
+
+def cpu_limit():
+    """CPUs this container may use: the cgroup quota, else the CPUs we can run on"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1.0, int(quota) / int(period))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1.0, quota / period)
+    except (OSError, ValueError):
+        pass
+    return float(len(os.sched_getaffinity(0)))
+
+
+def memory_limit_mb():
+    """Container memory limit in MB, or None when unlimited"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "unlimited" as a huge number
+        if value != 'max' and int(value) < 1 << 50:
+            return int(value) // (1024 * 1024)
+        return None
+    return None
+
+
+def worker_count():
+    if os.environ.get('WEB_CONCURRENCY'):
+        return int(os.environ['WEB_CONCURRENCY'])
+    workers = math.ceil(cpu_limit() * WORKERS_PER_CPU) + 1
+    memory = memory_limit_mb()
+    if memory is not None:
+        workers = min(workers, memory // WORKER_MEMORY_MB)
+    return max(1, workers)
+
+
+bind = os.environ.get('GUNICORN_BIND') or f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = worker_count()
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+
+def _flask_app():
+    # The Flask app behind either entry point (the ASGI mode serves the same routes)
+    from yacht_iot.wsgi import app
+    return app
+
+
+def precompile_templates():
+    """Compile every template into the Jinja cache, returning how many"""
+    env = _flask_app().jinja_env
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def on_starting(server):
+    if preload_app:
+        # With preload_app the master imported the app before this hook
+        server.log.info("App preloaded in %.0f ms", (time.perf_counter() - _BOOT) * 1000)
+        started = time.perf_counter()
+        count = precompile_templates()
+        server.log.info("Compiled %d templates in %.0f ms", count,
+                        (time.perf_counter() - started) * 1000)
+    memory = memory_limit_mb()
+    server.log.info("Starting %d workers (%.1f CPUs, memory limit %s)", workers, cpu_limit(),
+                    f'{memory} MB' if memory else 'none')
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    """Warm the worker's pool and code paths before it accepts connections"""
+    from yacht_iot.data import db_pool
+
+    ready = time.perf_counter()
+    timings = [f"{'boot' if preload_app else 'import'} {(ready - worker.forked_at) * 1000:.0f} ms"]
+    if not preload_app:
+        precompile_templates()
+        timings.append(f"templates {(time.perf_counter() - ready) * 1000:.0f} ms")
+
+    if WARM_CONNECTIONS != '0':
+        started = time.perf_counter()
+        try:
+            idle = db_pool.warm(int(WARM_CONNECTIONS) if WARM_CONNECTIONS else None)
+            timings.append(f"pool warm-up {(time.perf_counter() - started) * 1000:.0f} ms "
+                           f"({idle} connections)")
+        except Exception as e:
+            worker.log.warning("Pool warm-up failed: %s", e)
+
+    if WARMUP_PATH:
+        started = time.perf_counter()
+        with _flask_app().test_client() as client:
+            status = client.get(WARMUP_PATH).status_code
+        timings.append(f"first request {(time.perf_counter() - started) * 1000:.0f} ms "
+                       f"({WARMUP_PATH} {status})")
+    worker.log.info("Worker %s ready in %.0f ms: %s", worker.pid,
+                    (time.perf_counter() - worker.forked_at) * 1000, ', '.join(timings))
@@ -0,0 +1,118 @@
+"""
+Background health checks for EMEA Yacht IoT Services
+
+A daemon thread per worker probes every dependency on an interval and
+keeps the last result. The health endpoint only reads that result, so
+platform probes never open a database connection and a slow dependency
+never holds up a request.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+
+def pool_check(pool):
+    """Check that borrows a pooled connection and runs SELECT 1 (PostgreSQL or MariaDB)"""
+    def check():
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+        finally:
+            pool.putconn(conn)
+    return check
+
+
+class HealthMonitor:
+    """Runs registered checks in the background and caches their results.
+
+    A failing critical check makes the service unhealthy; a failing
+    non-critical one only degrades it. Results older than ``stale_after``
+    seconds count as failures, since they mean the checker itself is stuck.
+    """
+
+    def __init__(self, interval=10.0, stale_after=30.0):
+        self.interval = interval
+        self.stale_after = stale_after
+        self._checks = []
+        self._results = {}
+        self._lock = threading.Lock()
+        self._first_run = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add_check(self, name, check, critical=True):
+        """Register ``check()``, which raises on failure
+
+        A check may return a dict of extra fields, such as a measured lag,
+        to report alongside its status.
+        """
+        self._checks.append((name, check, critical))
+
+    def ensure_started(self):
+        # Threads do not survive a fork, so start one per gunicorn worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._first_run.clear()
+        self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+        self._thread.start()
+
+    def run_checks(self):
+        for name, check, critical in self._checks:
+            started = time.perf_counter()
+            detail = None
+            try:
+                detail = check()
+                error = None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            result = {
+                'status': 'down' if error else 'up',
+                'critical': critical,
+                'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+                'checked_at': datetime.now(timezone.utc).isoformat(),
+                'error': error,
+                '_monotonic': time.monotonic(),
+            }
+            if isinstance(detail, dict):
+                result.update(detail)
+            with self._lock:
+                self._results[name] = result
+        self._first_run.set()
+
+    def _run(self):
+        while True:
+            self.run_checks()
+            time.sleep(self.interval)
+
+    def is_up(self, name):
+        """Whether the last check of ``name`` passed and is not stale"""
+        with self._lock:
+            result = self._results.get(name)
+        return (result is not None and result['status'] == 'up'
+                and time.monotonic() - result['_monotonic'] <= self.stale_after)
+
+    def snapshot(self, wait=2.0):
+        """(overall status, per-dependency results) from the last checks"""
+        self._first_run.wait(wait)
+        now = time.monotonic()
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+        if not results:
+            return 'starting', {}
+
+        status = 'healthy'
+        for result in results.values():
+            result['age_seconds'] = round(now - result.pop('_monotonic'), 2)
+            if result['age_seconds'] > self.stale_after:
+                result['status'] = 'stale'
+            if result['status'] != 'up':
+                if result['critical']:
+                    status = 'unhealthy'
+                elif status == 'healthy':
+                    status = 'degraded'
+        return status, results
@@ -0,0 +1,261 @@
+"""
+Request instrumentation and Prometheus metrics for EMEA Yacht IoT Services
+
+``MetricsRegistry`` keeps counters, histograms and gauges in process and
+renders them in the Prometheus text format. Gunicorn runs several worker
+processes, so when ``METRICS_DIR`` is set each worker also writes a
+snapshot there and ``/metrics`` sums the snapshots, whichever worker
+answers the scrape.
+
+Database time is measured by the cursor classes from ``timed_cursor``:
+pooled connections are opened with ``InstrumentedConnection``, so every
+query is counted against the request that ran it.
+"""
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import psycopg2.extensions
+
+# Latency buckets in seconds, and size buckets in bytes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Per-request database stats: [query count, seconds], or None outside a request
+current_db_stats = contextvars.ContextVar('current_db_stats', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """Counters, histograms and callback gauges for one process"""
+
+    def __init__(self, directory=None, dump_interval=1.0):
+        self.directory = directory
+        self.dump_interval = dump_interval
+        self._meta = {}  # name -> (type, help, buckets or gauge callback)
+        self._values = {}  # name -> {labels tuple: value or [bucket counts..., sum, count]}
+        self._lock = threading.Lock()
+        self._last_dump = 0.0
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text, None)
+        self._values[name] = {}
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+        self._values[name] = {}
+
+    def gauge(self, name, help_text, callback):
+        """Gauge whose {labels tuple: value} are read from ``callback()`` on demand"""
+        self._meta[name] = ('gauge', help_text, callback)
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets = self._meta[name][2]
+        with self._lock:
+            series = self._values[name].get(key)
+            if series is None:
+                series = self._values[name][key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        """Plain-data copy of every metric, gauges evaluated now"""
+        with self._lock:
+            data = {name: {json.dumps(key): (list(v) if isinstance(v, list) else v)
+                           for key, v in values.items()}
+                    for name, values in self._values.items()}
+        for name, (kind, _, callback) in self._meta.items():
+            if kind == 'gauge':
+                try:
+                    data[name] = {json.dumps(tuple(sorted(labels.items()))): value
+                                  for labels, value in callback()}
+                except Exception as e:
+                    print(f"Metrics gauge error: {e}")
+                    data[name] = {}
+        return data
+
+    def maybe_dump(self):
+        """Write this worker's snapshot to the shared directory, at most once per interval"""
+        if not self.directory or time.monotonic() - self._last_dump < self.dump_interval:
+            return
+        self._last_dump = time.monotonic()
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Metrics dump error: {e}")
+
+    def _collect(self):
+        """Snapshots of every worker: all of them for counters, live ones for gauges"""
+        own = self.snapshot()
+        if not self.directory:
+            return [(own, True)]
+        snapshots = [(own, True)]
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith('.json') or name == f'{os.getpid()}.json':
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((data, _pid_alive(int(name[:-5]))))
+        return snapshots
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        merged = {}
+        for data, alive in self._collect():
+            for name, series in data.items():
+                if name not in self._meta or (self._meta[name][0] == 'gauge' and not alive):
+                    continue
+                target = merged.setdefault(name, {})
+                for key, value in series.items():
+                    if isinstance(value, list):
+                        current = target.setdefault(key, [0] * len(value))
+                        target[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        target[key] = target.get(key, 0) + value
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = tuple(tuple(pair) for pair in json.loads(key))
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), value[:-2] + [value[-1] - sum(value[:-2])]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(round(value[-2], 6))}')
+                lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _record_query(started):
+    stats = current_db_stats.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+_timed_cursors = {}
+
+
+def timed_cursor(base):
+    """Subclass of a cursor class that adds its query time to the current request"""
+    if base not in _timed_cursors:
+        def timed(method):
+            def wrapper(self, *args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    _record_query(started)
+            wrapper.__name__ = method.__name__
+            return wrapper
+
+        _timed_cursors[base] = type(f'Timed{base.__name__}', (base,), {
+            name: timed(getattr(base, name))
+            for name in ('execute', 'executemany', 'callproc', 'copy_expert', 'copy_from', 'copy_to')
+        })
+    return _timed_cursors[base]
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """Connection whose cursors, whatever their factory, are timed"""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = timed_cursor(factory)
+        return super().cursor(*args, **kwargs)
+
+
+class SamplingProfiler:
+    """Samples one thread's stack on an interval and counts collapsed stacks
+
+    The output is one ``frame;frame;frame count`` line per distinct stack,
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id=None):
+        target = thread_id or threading.get_ident()
+        self._thread = threading.Thread(target=self._run, args=(target,),
+                                        name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def _run(self, target):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
@@ -0,0 +1,209 @@
+"""
+Predictive maintenance worker for EMEA Yacht IoT Services
+
+Scores every yacht that has reported telemetry since the last run and
+stores the result in ``maintenance_predictions``; the API only reads that
+table. Each run resumes from a high-water mark on ``ingested_at`` kept in
+``rollup_state``, pulls engine features for the changed yachts in batches
+and scores each batch across a process pool.
+
+Usage (runs as an Upsun worker next to the web app):
+    python -m yacht_iot.maintenance run    # score new telemetry every MAINTENANCE_INTERVAL seconds
+    python -m yacht_iot.maintenance once   # score new telemetry once and exit
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from .schema import TELEMETRY_TABLE
+from .timeseries import WATERMARK_OVERLAP
+
+# Lock id for the maintenance worker, so a second instance skips instead of double-scoring
+MAINTENANCE_LOCK_ID = 4207003
+
+# Name of the high-water mark row in rollup_state
+STATE_NAME = 'maintenance_predictions'
+
+MAINTENANCE_CONFIG = {
+    'interval': float(os.environ.get('MAINTENANCE_INTERVAL', '60')),
+    'batch_size': int(os.environ.get('MAINTENANCE_BATCH_SIZE', '500')),
+    'processes': int(os.environ.get('MAINTENANCE_PROCESSES', '0')) or os.cpu_count() or 1,
+    'feature_days': int(os.environ.get('MAINTENANCE_FEATURE_DAYS', '7')),
+    'service_interval_hours': float(os.environ.get('MAINTENANCE_SERVICE_INTERVAL_HOURS', '500')),
+}
+
+FEATURE_COLUMNS = ('yacht_id', 'engine_hours', 'temp_avg', 'temp_max', 'temp_std',
+                   'rpm_avg', 'rpm_max', 'battery_min', 'battery_avg', 'samples')
+
+# (name, weight) of each risk factor; factor values are scaled to 0..1
+RISK_WEIGHTS = (
+    ('service_due', 0.35),
+    ('engine_temp', 0.25),
+    ('temp_instability', 0.10),
+    ('engine_load', 0.15),
+    ('battery', 0.15),
+)
+
+
+def _scale(value, low, high):
+    """Map value onto 0..1 between low and high, None counting as 0"""
+    if value is None:
+        return 0.0
+    return min(max((value - low) / (high - low), 0.0), 1.0)
+
+
+def score_features(features, service_interval_hours=500.0):
+    """Risk score for one yacht's feature tuple (runs in a pool process)"""
+    f = dict(zip(FEATURE_COLUMNS, features))
+    hours = f['engine_hours']
+    since_service = hours % service_interval_hours if hours is not None else None
+    battery = f['battery_min']
+    factors = {
+        'service_due': _scale(since_service, 0.5 * service_interval_hours, service_interval_hours),
+        'engine_temp': max(_scale(f['temp_avg'], 80, 95), _scale(f['temp_max'], 95, 110)),
+        'temp_instability': _scale(f['temp_std'], 3, 12),
+        'engine_load': _scale(f['rpm_avg'], 1800, 2600),
+        'battery': 1.0 - _scale(battery, 11.5, 12.6) if battery is not None else 0.0,
+    }
+    hours_to_service = (service_interval_hours - since_service
+                        if since_service is not None else None)
+    risk = sum(factors[name] * weight for name, weight in RISK_WEIGHTS)
+    level = 'high' if risk >= 0.6 else 'medium' if risk >= 0.3 else 'low'
+    return (f['yacht_id'], hours, hours_to_service, round(risk, 4), level,
+            json.dumps({k: round(v, 3) for k, v in factors.items()}))
+
+
+def _score_chunk(chunk, service_interval_hours):
+    return [score_features(features, service_interval_hours) for features in chunk]
+
+
+def changed_yachts(cur, since):
+    """Yachts with telemetry ingested after ``since``, and the newest ingested_at"""
+    cur.execute(
+        f"SELECT yacht_id, max(ingested_at) FROM {TELEMETRY_TABLE} "
+        f"WHERE ingested_at > %s GROUP BY yacht_id ORDER BY yacht_id", (since,))
+    rows = cur.fetchall()
+    return [row[0] for row in rows], max((row[1] for row in rows), default=None)
+
+
+def fetch_features(cur, yacht_ids, since):
+    """Engine feature tuples (FEATURE_COLUMNS order) for a batch of yachts"""
+    cur.execute(
+        f"SELECT yacht_id, max(engine_hours), avg(engine_temp_c), max(engine_temp_c), "
+        f"stddev_pop(engine_temp_c), avg(engine_rpm), max(engine_rpm), "
+        f"min(battery_voltage), avg(battery_voltage), count(*) "
+        f"FROM {TELEMETRY_TABLE} WHERE yacht_id = ANY(%s) AND recorded_at >= %s "
+        f"GROUP BY yacht_id", (yacht_ids, since))
+    return cur.fetchall()
+
+
+def store_predictions(cur, predictions):
+    execute_values(
+        cur,
+        "INSERT INTO maintenance_predictions "
+        "(yacht_id, engine_hours, hours_to_service, risk_score, risk_level, factors) VALUES %s "
+        "ON CONFLICT (yacht_id) DO UPDATE SET scored_at = now(), "
+        "engine_hours = EXCLUDED.engine_hours, hours_to_service = EXCLUDED.hours_to_service, "
+        "risk_score = EXCLUDED.risk_score, risk_level = EXCLUDED.risk_level, "
+        "factors = EXCLUDED.factors",
+        predictions, template='(%s, %s, %s, %s, %s, %s::jsonb)')
+
+
+def score_new_telemetry(conn, executor=None, config=MAINTENANCE_CONFIG):
+    """Score yachts with telemetry newer than the high-water mark
+
+    Returns the number of yachts scored, or None when another worker holds
+    the lock. The mark only moves once every batch has been written.
+    """
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_try_advisory_lock(%s)', (MAINTENANCE_LOCK_ID,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return None
+        try:
+            cur.execute("SELECT ingested_through FROM rollup_state WHERE name = %s", (STATE_NAME,))
+            row = cur.fetchone()
+            since = row[0] - WATERMARK_OVERLAP if row else datetime.min.replace(tzinfo=timezone.utc)
+            yacht_ids, ingested_through = changed_yachts(cur, since)
+            if not yacht_ids:
+                conn.rollback()
+                return 0
+
+            window_start = datetime.now(timezone.utc) - timedelta(days=config['feature_days'])
+            batches = [yacht_ids[i:i + config['batch_size']]
+                       for i in range(0, len(yacht_ids), config['batch_size'])]
+            scored = 0
+            for batch in batches:
+                features = fetch_features(cur, batch, window_start)
+                if executor is None:
+                    predictions = _score_chunk(features, config['service_interval_hours'])
+                else:
+                    chunks = [features[i::config['processes']] for i in range(config['processes'])]
+                    predictions = [p for result in executor.map(
+                        _score_chunk, chunks, [config['service_interval_hours']] * len(chunks))
+                        for p in result]
+                if predictions:
+                    store_predictions(cur, predictions)
+                conn.commit()
+                scored += len(predictions)
+
+            cur.execute(
+                "INSERT INTO rollup_state (name, ingested_through) VALUES (%s, %s) "
+                "ON CONFLICT (name) DO UPDATE SET ingested_through = EXCLUDED.ingested_through",
+                (STATE_NAME, ingested_through))
+            conn.commit()
+            return scored
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute('SELECT pg_advisory_unlock(%s)', (MAINTENANCE_LOCK_ID,))
+            conn.commit()
+
+
+def main():
+    if sys.argv[1:] not in (['run'], ['once']):
+        print("Usage: python -m yacht_iot.maintenance run|once")
+        return 2
+
+    from .config import DB_CONFIG
+    config = MAINTENANCE_CONFIG
+    executor = ProcessPoolExecutor(config['processes']) if config['processes'] > 1 else None
+    conn = None
+    try:
+        while True:
+            try:
+                if conn is None or conn.closed:
+                    conn = psycopg2.connect(**DB_CONFIG)
+                started = time.monotonic()
+                scored = score_new_telemetry(conn, executor, config)
+                if scored is None:
+                    print("Another maintenance worker is running, skipping")
+                elif scored:
+                    print(f"Scored {scored} yachts in {time.monotonic() - started:.2f}s")
+            except psycopg2.Error as e:
+                print(f"Error: {e}")
+                if sys.argv[1] == 'once':
+                    return 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+            if sys.argv[1] == 'once':
+                return 0
+            time.sleep(config['interval'])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Live position fan-out for EMEA Yacht IoT Services
+
+Each telemetry flush publishes the latest position per yacht with
+``pg_notify`` inside the flush transaction. Every worker runs one LISTEN
+connection and fans incoming positions out to its in-process subscribers,
+so N streaming clients cost one database connection per worker, not N
+polling queries.
+
+Subscribers hold at most one pending message per yacht: a slow consumer
+only ever sees the newest position (older ones are coalesced away), and
+the number of yachts pending per subscriber is capped.
+"""
+
+import asyncio
+import json
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2 import extensions
+
+CHANNEL = 'yacht_positions'
+
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD_BYTES = 7500
+
+_POSITION_FIELDS = ('yacht_id', 'recorded_at', 'latitude', 'longitude', 'speed_knots', 'heading')
+
+
+def latest_positions(rows):
+    """Newest row with a position for each yacht in a telemetry batch"""
+    latest = {}
+    for row in rows:
+        yacht_id, recorded_at, latitude, longitude, speed_knots, heading = row[:6]
+        if latitude is None or longitude is None:
+            continue
+        current = latest.get(yacht_id)
+        if current is None or recorded_at >= current[1]:
+            latest[yacht_id] = (yacht_id, recorded_at, latitude, longitude, speed_knots, heading)
+    return list(latest.values())
+
+
+def notify_positions(cur, rows):
+    """Publish a batch's latest positions; delivered when the flush commits"""
+    chunk, size = [], 2
+    for yacht_id, recorded_at, latitude, longitude, speed_knots, heading in latest_positions(rows):
+        item = json.dumps([yacht_id, recorded_at.isoformat(), latitude, longitude,
+                           speed_knots, heading], separators=(',', ':'))
+        if chunk and size + len(item) + 1 > MAX_PAYLOAD_BYTES:
+            cur.execute('SELECT pg_notify(%s, %s)', (CHANNEL, '[' + ','.join(chunk) + ']'))
+            chunk, size = [], 2
+        chunk.append(item)
+        size += len(item) + 1
+    if chunk:
+        cur.execute('SELECT pg_notify(%s, %s)', (CHANNEL, '[' + ','.join(chunk) + ']'))
+
+
+def parse_bbox(value):
+    """Parse 'min_lon,min_lat,max_lon,max_lat' into a tuple of floats"""
+    parts = [float(p) for p in value.split(',')]
+    if len(parts) != 4 or parts[0] > parts[2] or parts[1] > parts[3]:
+        raise ValueError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    return tuple(parts)
+
+
+class Subscriber:
+    """One streaming client's filter and pending positions"""
+
+    def __init__(self, yacht_ids=None, bbox=None, max_pending=1000):
+        self.yacht_ids = set(yacht_ids) if yacht_ids else None
+        self.bbox = bbox
+        self.max_pending = max_pending
+        self.coalesced = 0
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+    def matches(self, position):
+        if self.yacht_ids is not None and position['yacht_id'] not in self.yacht_ids:
+            return False
+        if self.bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = self.bbox
+            return (min_lon <= position['longitude'] <= max_lon and
+                    min_lat <= position['latitude'] <= max_lat)
+        return True
+
+    def offer(self, position):
+        with self._lock:
+            yacht_id = position['yacht_id']
+            if yacht_id in self._pending:
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[yacht_id] = position
+        self._wake()
+
+    def _wake(self):
+        self._event.set()
+
+    def drain(self):
+        """Take every pending position"""
+        with self._lock:
+            positions = list(self._pending.values())
+            self._pending.clear()
+            self._event.clear()
+        return positions
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+
+class AsyncSubscriber(Subscriber):
+    """Subscriber that wakes an asyncio task instead of a thread"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = asyncio.get_running_loop()
+        self._async_event = asyncio.Event()
+
+    def _wake(self):
+        self._loop.call_soon_threadsafe(self._async_event.set)
+
+    def drain(self):
+        self._async_event.clear()
+        return super().drain()
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self._async_event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class PositionHub:
+    """Fans positions out to this worker's subscribers.
+
+    The LISTEN thread is started on the first subscription, after the
+    gunicorn fork, and reconnects with back-off if the connection drops.
+    """
+
+    def __init__(self, db_config):
+        self.db_config = db_config
+        self.received = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def subscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.add(subscriber)
+        self._ensure_listening()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, positions):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for position in positions:
+            for subscriber in subscribers:
+                if subscriber.matches(position):
+                    subscriber.offer(position)
+
+    def _ensure_listening(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._listen, name='position-listener', daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        delay = 1
+        while True:
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN {CHANNEL}')
+                delay = 1
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0).payload)
+            except psycopg2.Error as e:
+                print(f"Position listener error: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _dispatch(self, payload):
+        try:
+            items = json.loads(payload)
+        except ValueError:
+            return
+        self.received += len(items)
+        self.publish([dict(zip(_POSITION_FIELDS, item)) for item in items])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'received': self.received,
+            }
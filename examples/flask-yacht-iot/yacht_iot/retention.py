@@ -0,0 +1,268 @@
+"""
+Telemetry retention for EMEA Yacht IoT Services
+
+Each telemetry table keeps its data for the number of days set in
+RETENTION_POLICY (0 keeps it forever):
+
+* raw telemetry is dropped a whole daily partition at a time. Before a
+  partition goes, any of its readings the rollup job has not folded in
+  yet are rolled up into the 1-minute, 1-hour and 1-day tables. The
+  partition is detached with ``DETACH PARTITION ... CONCURRENTLY``, which
+  does not block inserts into ``telemetry`` the way a plain DROP or
+  DETACH does, and then dropped.
+* rollup tables are not partitioned, so old buckets are deleted in short
+  batches, each its own transaction. Hourly and daily buckets are only
+  deleted once ``archive.py sync`` has copied them to MariaDB, when the
+  archive is configured.
+
+Every DDL statement runs with ``lock_timeout``, so a conflicting lock makes
+the job skip that partition until the next run instead of queueing ahead
+of live ingest.
+
+Usage (run daily from cron):
+    python -m yacht_iot.retention run    # apply the policy
+    python -m yacht_iot.retention plan   # report what run would reclaim, change nothing
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, time, timedelta, timezone
+
+import psycopg2
+from psycopg2 import errors
+
+from . import archive
+from .schema import ROLLUP_TABLES, TELEMETRY_TABLE, list_partitions
+from .timeseries import ROLLUP_LOCK_ID, WATERMARK_OVERLAP, rollup_range
+
+# Lock id for the retention job, so overlapping cron runs skip instead of queueing
+RETENTION_LOCK_ID = 4207005
+
+# Days of data kept per table; 0 keeps everything
+RETENTION_POLICY = {
+    TELEMETRY_TABLE: int(os.environ.get('RETENTION_TELEMETRY_DAYS', '30')),
+    'telemetry_1m': int(os.environ.get('RETENTION_TELEMETRY_1M_DAYS', '180')),
+    'telemetry_1h': int(os.environ.get('RETENTION_TELEMETRY_1H_DAYS', '0')),
+    'telemetry_1d': int(os.environ.get('RETENTION_TELEMETRY_1D_DAYS', '0')),
+}
+
+RETENTION_CONFIG = {
+    'lock_timeout': os.environ.get('RETENTION_LOCK_TIMEOUT', '5s'),
+    'delete_batch_rows': int(os.environ.get('RETENTION_DELETE_BATCH_ROWS', '10000')),
+}
+
+
+def _cutoff(days, now):
+    """Midnight UTC ``days`` days ago; data before it is expired"""
+    return datetime.combine((now - timedelta(days=days)).date(), time(), timezone.utc)
+
+
+def _relation_size(cur, table):
+    """(total bytes, estimated rows) from the catalog"""
+    cur.execute("SELECT pg_total_relation_size(c.oid), c.reltuples FROM pg_class c "
+                "WHERE c.oid = to_regclass(%s)", (table,))
+    return cur.fetchone()
+
+
+def _pending_detaches(cur):
+    """Partitions left half-detached by an interrupted DETACH ... CONCURRENTLY"""
+    if cur.connection.server_version < 140000:
+        return []
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s) AND i.inhdetachpending", (TELEMETRY_TABLE,))
+    return [name for (name,) in cur.fetchall()]
+
+
+def downsample_partition(conn, name, day):
+    """Roll up a partition's readings the rollup job has not covered yet
+
+    Returns the rollup rows upserted, 0 when the rollups were already
+    up to date.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT ingested_through FROM rollup_state WHERE name = %s",
+                    (TELEMETRY_TABLE,))
+        row = cur.fetchone()
+        if row is not None:
+            cur.execute(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE ingested_at > %s)",
+                        (row[0] - WATERMARK_OVERLAP,))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return 0
+        # Same lock as the rollup job, so both never upsert the same buckets at once
+        cur.execute('SELECT pg_advisory_xact_lock(%s)', (ROLLUP_LOCK_ID,))
+        start = datetime.combine(day, time(), timezone.utc)
+        counts = rollup_range(cur, start, start + timedelta(days=1) - timedelta(microseconds=1))
+    conn.commit()
+    return sum(counts.values())
+
+
+def drop_partition(conn, name, pending=False, config=RETENTION_CONFIG):
+    """Detach and drop one telemetry partition, returning (rows, bytes)
+
+    ``pending`` finishes a detach an earlier run started. Runs in
+    autocommit mode, which DETACH ... CONCURRENTLY requires.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM {name}")
+        rows = cur.fetchone()[0]
+        size = _relation_size(cur, name)[0]
+        conn.commit()
+        conn.autocommit = True
+        try:
+            cur.execute("SET lock_timeout = %s", (config['lock_timeout'],))
+            if pending:
+                cur.execute(f"ALTER TABLE {TELEMETRY_TABLE} DETACH PARTITION {name} FINALIZE")
+            elif conn.server_version >= 140000:
+                cur.execute(f"ALTER TABLE {TELEMETRY_TABLE} DETACH PARTITION {name} CONCURRENTLY")
+            else:
+                cur.execute(f"ALTER TABLE {TELEMETRY_TABLE} DETACH PARTITION {name}")
+            cur.execute(f"DROP TABLE {name}")
+        finally:
+            cur.execute("RESET lock_timeout")
+            conn.autocommit = False
+    return rows, size
+
+
+def prune_rollup(conn, table, before, config=RETENTION_CONFIG):
+    """Delete a rollup table's buckets before a time in batches, returning (rows, bytes)
+
+    Deleted space is reused by new rows rather than returned to the disk,
+    so bytes is the estimated share of the table the deleted rows took.
+    """
+    deleted = 0
+    with conn.cursor() as cur:
+        size, estimated_rows = _relation_size(cur, table)
+        while True:
+            cur.execute(
+                f"DELETE FROM {table} WHERE ctid = ANY(ARRAY("
+                f"SELECT ctid FROM {table} WHERE bucket < %s LIMIT %s))",
+                (before, config['delete_batch_rows']))
+            conn.commit()
+            deleted += cur.rowcount
+            if cur.rowcount < config['delete_batch_rows']:
+                break
+    return deleted, int(size * deleted / estimated_rows) if estimated_rows > 0 else 0
+
+
+def count_expired(conn, table, before):
+    """(rows, bytes) a prune would reclaim, for plan"""
+    with conn.cursor() as cur:
+        size, estimated_rows = _relation_size(cur, table)
+        cur.execute(f"SELECT count(*) FROM {table} WHERE bucket < %s", (before,))
+        rows = cur.fetchone()[0]
+    conn.rollback()
+    return rows, int(size * rows / estimated_rows) if estimated_rows > 0 else 0
+
+
+def apply_policy(conn, policy=RETENTION_POLICY, archive_conn=None, dry_run=False, now=None,
+                 config=RETENTION_CONFIG):
+    """Apply the retention policy, returning {table: (rows, bytes)} reclaimed
+
+    Returns None when another retention run holds the lock.
+    """
+    now = now or datetime.now(timezone.utc)
+    reclaimed = {}
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_try_advisory_lock(%s)', (RETENTION_LOCK_ID,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return None
+        conn.commit()
+    try:
+        if policy.get(TELEMETRY_TABLE):
+            cutoff = _cutoff(policy[TELEMETRY_TABLE], now).date()
+            with conn.cursor() as cur:
+                pending = _pending_detaches(cur)
+                expired = [(name, day) for name, day in list_partitions(cur) if day < cutoff]
+            conn.rollback()
+            rows = size = 0
+            for name, day in expired:
+                if dry_run:
+                    with conn.cursor() as cur:
+                        cur.execute(f"SELECT count(*) FROM {name}")
+                        partition_rows = cur.fetchone()[0]
+                        partition_size = _relation_size(cur, name)[0]
+                    conn.rollback()
+                else:
+                    rolled_up = downsample_partition(conn, name, day)
+                    if rolled_up:
+                        print(f"Rolled up {rolled_up} buckets from {name} before dropping it")
+                    try:
+                        partition_rows, partition_size = drop_partition(
+                            conn, name, name in pending, config)
+                    except errors.LockNotAvailable:
+                        print(f"{name} is locked, leaving it for the next run")
+                        continue
+                    print(f"Dropped {name}: {partition_rows} rows, {partition_size} bytes")
+                rows += partition_rows
+                size += partition_size
+            reclaimed[TELEMETRY_TABLE] = (rows, size)
+
+        for table, _ in ROLLUP_TABLES:
+            if not policy.get(table):
+                continue
+            before = _cutoff(policy[table], now)
+            if archive_conn is not None and table in archive.ARCHIVE_TABLES:
+                # Only delete what the archive already holds
+                archived = archive.archived_through(archive_conn, table)
+                if archived is None:
+                    print(f"{table} has not been archived yet, keeping it")
+                    continue
+                before = min(before, archived)
+            if dry_run:
+                reclaimed[table] = count_expired(conn, table, before)
+            else:
+                reclaimed[table] = prune_rollup(conn, table, before, config)
+        return reclaimed
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_advisory_unlock(%s)', (RETENTION_LOCK_ID,))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Yacht IoT telemetry retention')
+    parser.add_argument('command', choices=['run', 'plan'])
+    args = parser.parse_args()
+
+    from .config import DB_CONFIG
+    from .data import db_router
+    conn = psycopg2.connect(**DB_CONFIG)
+    archive_conn = None
+    try:
+        if db_router.archive is not None:
+            archive_conn = db_router.archive.getconn()
+        reclaimed = apply_policy(conn, archive_conn=archive_conn, dry_run=args.command == 'plan')
+    except (psycopg2.Error, archive.ArchiveError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        if archive_conn is not None:
+            db_router.archive.putconn(archive_conn)
+        conn.close()
+
+    if reclaimed is None:
+        print("Another retention run is in progress, skipping")
+        return 0
+    verb = 'Would reclaim' if args.command == 'plan' else 'Reclaimed'
+    for table, days in RETENTION_POLICY.items():
+        if table in reclaimed:
+            rows, size = reclaimed[table]
+            print(f"{table:<14} keep {days:>4} days  {verb.lower()} {rows:>12} rows "
+                  f"{size / 1024 / 1024:>10.1f} MB")
+        else:
+            print(f"{table:<14} kept in full")
+    total_rows = sum(rows for rows, _ in reclaimed.values())
+    total_bytes = sum(size for _, size in reclaimed.values())
+    print(f"{verb} {total_rows} rows, {total_bytes / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
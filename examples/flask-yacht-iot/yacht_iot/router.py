@@ -0,0 +1,127 @@
+"""
+Read/write routing across database targets for EMEA Yacht IoT Services
+
+Writes always go to the primary. Read-only reporting queries go to a
+streaming replica when one is configured and healthy, so they no longer
+compete with telemetry ingest for the primary's connections and I/O, and
+archive queries go to the MariaDB store. Every target has its own pool.
+
+Target health comes from the HealthMonitor: a replica serves reads only
+while its last check passed, and the check fails once replication lag
+exceeds ``max_lag`` seconds. A replica that fails a checkout is also
+skipped until the next check, so a dead host costs one failed connect
+rather than one per request. With no usable replica, reads fall back to
+the primary.
+"""
+
+import math
+import threading
+import time
+
+import psycopg2
+
+from .health import pool_check
+
+ARCHIVE = 'dba'
+
+# Seconds the replica is behind the primary; 0 when it has replayed
+# everything it received (an idle primary is not lag), or is not a standby
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_check(pool, max_lag):
+    """Check that measures a replica's lag and fails when it exceeds max_lag"""
+    def check():
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(REPLICA_LAG_SQL)
+                lag = float(cur.fetchone()[0])
+            conn.rollback()
+        finally:
+            pool.putconn(conn)
+        if lag > max_lag:
+            raise RuntimeError(f'Replication lag {lag:.1f}s exceeds {max_lag:g}s')
+        return {'lag_seconds': round(lag, 3)}
+    return check
+
+
+class DatabaseRouter:
+    """Chooses the pool a query runs on: primary, a replica or the archive"""
+
+    def __init__(self, primary, monitor, max_lag=30.0, on_failover=None):
+        self.primary = primary
+        self.monitor = monitor
+        self.max_lag = max_lag
+        self.on_failover = on_failover
+        self.replicas = []  # (name, pool) pairs
+        self.archive = None
+        self._failed_at = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def add_replica(self, name, pool):
+        self.replicas.append((name, pool))
+        self.monitor.add_check(name, replica_check(pool, self.max_lag), critical=False)
+
+    def set_archive(self, pool):
+        self.archive = pool
+        self.monitor.add_check(ARCHIVE, pool_check(pool), critical=False)
+
+    def healthy_replicas(self):
+        """Replicas currently eligible for reads, rotated for round-robin"""
+        if not self.replicas:
+            return []
+        self.monitor.ensure_started()
+        now = time.monotonic()
+        healthy = [(name, pool) for name, pool in self.replicas
+                   if self.monitor.is_up(name)
+                   and now - self._failed_at.get(name, -math.inf) > self.monitor.interval]
+        if len(healthy) > 1:
+            with self._lock:
+                self._next = (self._next + 1) % len(healthy)
+                start = self._next
+            healthy = healthy[start:] + healthy[:start]
+        return healthy
+
+    def mark_failed(self, name, error):
+        """Skip a replica until its next health check"""
+        self._failed_at[name] = time.monotonic()
+        print(f"Replica {name} unavailable, reading from the next target: {error}")
+        if self.on_failover is not None:
+            self.on_failover(name)
+
+    def checkout_replica(self):
+        """(name, connection) on a healthy replica, or None to read from the primary"""
+        for name, pool in self.healthy_replicas():
+            try:
+                return name, pool.getconn()
+            except psycopg2.Error as e:
+                self.mark_failed(name, e)
+        return None
+
+    def putconn(self, name, conn, close=False):
+        """Return a connection taken by checkout_replica"""
+        dict(self.replicas)[name].putconn(conn, close)
+
+    def archive_ready(self):
+        """Whether archive queries can go to the MariaDB store now"""
+        if self.archive is None:
+            return False
+        self.monitor.ensure_started()
+        return self.monitor.is_up(ARCHIVE)
+
+    def stats(self):
+        """Pool usage per target"""
+        stats = {'primary': self.primary.stats()}
+        for name, pool in self.replicas:
+            stats[name] = pool.stats()
+        if self.archive is not None:
+            stats[ARCHIVE] = self.archive.stats()
+        return stats
@@ -0,0 +1,363 @@
+"""
+Managed schema and migrations for EMEA Yacht IoT Services
+
+Migrations are applied in order and recorded in ``schema_migrations``.
+Telemetry is range-partitioned by day on ``recorded_at``; partitions are
+created ahead of time by ``partitions`` and on demand by the ingest path.
+
+Usage:
+    python -m yacht_iot.schema migrate              # apply pending migrations
+    python -m yacht_iot.schema status               # list applied and pending migrations
+    python -m yacht_iot.schema partitions --days 7  # create partitions for the coming days
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+TELEMETRY_TABLE = 'telemetry'
+PARTITION_PREFIX = 'telemetry_p'
+
+# Rollup tables, finest first: (table, bucket width in seconds)
+ROLLUP_TABLES = (
+    ('telemetry_1m', 60),
+    ('telemetry_1h', 3600),
+    ('telemetry_1d', 86400),
+)
+
+# Metrics aggregated into the rollup tables (avg/min/max each)
+ROLLUP_METRICS = (
+    'speed_knots',
+    'engine_rpm',
+    'engine_temp_c',
+    'fuel_rate_lph',
+    'battery_voltage',
+)
+
+# Serialises DDL between gunicorn workers, deploy hooks and cron jobs
+SCHEMA_LOCK_ID = 4207001
+
+_known_partitions = set()
+
+
+def partition_name(day):
+    return f'{PARTITION_PREFIX}{day:%Y%m%d}'
+
+
+def _create_partition(cur, day):
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} PARTITION OF {TELEMETRY_TABLE} "
+        f"FOR VALUES FROM (%s) TO (%s)", (start, start + timedelta(days=1)))
+
+
+def ensure_partitions(cur, days):
+    """Create any missing daily telemetry partitions for the given dates
+
+    Commits the cursor's connection so the partitions are visible to the
+    COPY that follows.
+    """
+    missing = [day for day in sorted(set(days)) if day not in _known_partitions]
+    if not missing:
+        return []
+    created = []
+    cur.execute('SELECT pg_advisory_xact_lock(%s)', (SCHEMA_LOCK_ID,))
+    for day in missing:
+        cur.execute('SELECT to_regclass(%s)', (partition_name(day),))
+        if cur.fetchone()[0] is None:
+            _create_partition(cur, day)
+            created.append(partition_name(day))
+    cur.connection.commit()
+    _known_partitions.update(missing)
+    return created
+
+
+def forget_partitions():
+    """Make ensure_partitions check every day again
+
+    Retention drops old partitions behind this process's back, so a write
+    that finds no partition for a row should call this before retrying.
+    """
+    _known_partitions.clear()
+
+
+def list_partitions(cur):
+    """Existing telemetry partitions as (name, day) pairs, oldest first"""
+    cur.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname", (TELEMETRY_TABLE,))
+    partitions = []
+    for (name,) in cur.fetchall():
+        if name.startswith(PARTITION_PREFIX):
+            partitions.append((name, datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m%d').date()))
+    return partitions
+
+
+def _create_partitioned_telemetry(cur):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (TELEMETRY_TABLE,))
+    row = cur.fetchone()
+    legacy = row is not None and row[0] == 'r'
+    if legacy:
+        # Table created by the first ingest release, before partitioning
+        cur.execute(f"ALTER TABLE {TELEMETRY_TABLE} RENAME TO telemetry_unpartitioned")
+
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TELEMETRY_TABLE} (
+            yacht_id integer NOT NULL,
+            recorded_at timestamptz NOT NULL,
+            latitude double precision,
+            longitude double precision,
+            speed_knots real,
+            heading real,
+            engine_rpm real,
+            engine_temp_c real,
+            fuel_rate_lph real,
+            battery_voltage real,
+            engine_hours double precision,
+            ingested_at timestamptz NOT NULL DEFAULT now()
+        ) PARTITION BY RANGE (recorded_at)
+    """)
+    cur.execute(f"CREATE INDEX IF NOT EXISTS telemetry_yacht_time_idx "
+                f"ON {TELEMETRY_TABLE} (yacht_id, recorded_at)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS telemetry_recorded_brin "
+                f"ON {TELEMETRY_TABLE} USING brin (recorded_at)")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS telemetry_ingested_brin "
+                f"ON {TELEMETRY_TABLE} USING brin (ingested_at)")
+
+    if legacy:
+        cur.execute("SELECT DISTINCT (recorded_at AT TIME ZONE 'UTC')::date "
+                    "FROM telemetry_unpartitioned")
+        for (day,) in cur.fetchall():
+            _create_partition(cur, day)
+        cur.execute(f"INSERT INTO {TELEMETRY_TABLE} SELECT *, now() FROM telemetry_unpartitioned")
+        cur.execute("DROP TABLE telemetry_unpartitioned")
+
+
+def _create_rollups(cur):
+    metric_columns = ',\n'.join(
+        f'{metric}_{agg} double precision'
+        for metric in ROLLUP_METRICS for agg in ('avg', 'min', 'max'))
+    for table, _ in ROLLUP_TABLES:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                yacht_id integer NOT NULL,
+                bucket timestamptz NOT NULL,
+                samples integer NOT NULL,
+                {metric_columns},
+                PRIMARY KEY (yacht_id, bucket)
+            )
+        """)
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_bucket_brin ON {table} USING brin (bucket)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name text PRIMARY KEY,
+            ingested_through timestamptz NOT NULL
+        )
+    """)
+
+
+def _create_maintenance_predictions(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_predictions (
+            yacht_id integer PRIMARY KEY,
+            scored_at timestamptz NOT NULL DEFAULT now(),
+            engine_hours double precision,
+            hours_to_service double precision,
+            risk_score real NOT NULL,
+            risk_level text NOT NULL,
+            factors jsonb NOT NULL DEFAULT '{}'
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS maintenance_predictions_risk_idx "
+                "ON maintenance_predictions (risk_score DESC)")
+
+
+def _create_yacht_positions(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS yacht_positions (
+            yacht_id integer PRIMARY KEY,
+            recorded_at timestamptz NOT NULL,
+            latitude double precision NOT NULL,
+            longitude double precision NOT NULL,
+            speed_knots real,
+            heading real,
+            updated_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute(f"""
+        INSERT INTO yacht_positions (yacht_id, recorded_at, latitude, longitude, speed_knots, heading)
+        SELECT DISTINCT ON (yacht_id) yacht_id, recorded_at, latitude, longitude, speed_knots, heading
+        FROM {TELEMETRY_TABLE} WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        ORDER BY yacht_id, recorded_at DESC
+        ON CONFLICT (yacht_id) DO NOTHING
+    """)
+
+    # Spatial index through PostGIS when the server offers it; without it the
+    # app falls back to an in-process grid index
+    cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'postgis'")
+    if cur.fetchone() is None:
+        return
+    cur.execute("SAVEPOINT postgis")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    except psycopg2.Error as e:
+        print(f"PostGIS unavailable, using the grid index: {e}")
+        cur.execute("ROLLBACK TO SAVEPOINT postgis")
+        return
+    cur.execute("""
+        ALTER TABLE yacht_positions ADD COLUMN IF NOT EXISTS geog geography(Point, 4326)
+        GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS yacht_positions_geog_idx "
+                "ON yacht_positions USING gist (geog)")
+    # Bounding boxes are lon/lat rectangles, so they are matched in planar
+    # coordinates: a geography envelope has great-circle edges and would
+    # cut off the side of a wide box nearest the equator
+    cur.execute("CREATE INDEX IF NOT EXISTS yacht_positions_geom_idx "
+                "ON yacht_positions USING gist ((ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)))")
+
+
+def _create_telemetry_batches(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS telemetry_batches (
+            yacht_id integer NOT NULL,
+            seq bigint NOT NULL,
+            readings integer NOT NULL,
+            received_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (yacht_id, seq)
+        )
+    """)
+
+
+
+def _create_alerts(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS alert_rules (
+            id serial PRIMARY KEY,
+            name text NOT NULL,
+            kind text NOT NULL CHECK (kind IN ('threshold', 'rate_of_change', 'geofence')),
+            yacht_id integer,
+            metric text,
+            operator text CHECK (operator IN ('>', '>=', '<', '<=')),
+            threshold double precision,
+            geofence jsonb,
+            trigger text CHECK (trigger IN ('enter', 'exit')),
+            enabled boolean NOT NULL DEFAULT true,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            updated_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS alert_outbox (
+            id bigserial PRIMARY KEY,
+            rule_id integer NOT NULL,
+            yacht_id integer NOT NULL,
+            state text NOT NULL CHECK (state IN ('firing', 'resolved')),
+            value double precision,
+            recorded_at timestamptz NOT NULL,
+            message text NOT NULL,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            delivered_at timestamptz
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS alert_outbox_pending_idx "
+                "ON alert_outbox (id) WHERE delivered_at IS NULL")
+    cur.execute("CREATE INDEX IF NOT EXISTS alert_outbox_yacht_idx "
+                "ON alert_outbox (yacht_id, id DESC)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS alert_state (
+            yacht_id integer PRIMARY KEY,
+            recorded_at timestamptz NOT NULL,
+            state jsonb NOT NULL
+        )
+    """)
+
+
+# (version, description, function taking a cursor)
+MIGRATIONS = [
+    (1, 'partitioned telemetry table', _create_partitioned_telemetry),
+    (2, 'telemetry rollup tables', _create_rollups),
+    (3, 'maintenance predictions table', _create_maintenance_predictions),
+    (4, 'latest yacht positions with spatial index', _create_yacht_positions),
+    (5, 'uploaded telemetry batches for deduplication', _create_telemetry_batches),
+    (6, 'alert rules, outbox and evaluation state', _create_alerts),
+]
+
+
+def applied_versions(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version integer PRIMARY KEY,
+            description text NOT NULL,
+            applied_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(conn):
+    """Apply pending migrations, each in its own transaction"""
+    applied = []
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_advisory_lock(%s)', (SCHEMA_LOCK_ID,))
+        try:
+            done = applied_versions(cur)
+            conn.commit()
+            for version, description, apply in MIGRATIONS:
+                if version in done:
+                    continue
+                apply(cur)
+                cur.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                            (version, description))
+                conn.commit()
+                applied.append((version, description))
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute('SELECT pg_advisory_unlock(%s)', (SCHEMA_LOCK_ID,))
+            conn.commit()
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Yacht IoT schema management')
+    parser.add_argument('command', choices=['migrate', 'status', 'partitions'])
+    parser.add_argument('--days', type=int, default=7,
+                        help='Days ahead to create partitions for (partitions command)')
+    args = parser.parse_args()
+
+    from .config import DB_CONFIG
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if args.command == 'migrate':
+            applied = migrate(conn)
+            for version, description in applied:
+                print(f"Applied migration {version}: {description}")
+            if not applied:
+                print("Schema is up to date")
+        elif args.command == 'status':
+            with conn.cursor() as cur:
+                done = applied_versions(cur)
+            for version, description, _ in MIGRATIONS:
+                print(f"{version:>4} {'applied' if version in done else 'pending':<8} {description}")
+        elif args.command == 'partitions':
+            today = datetime.now(timezone.utc).date()
+            with conn.cursor() as cur:
+                created = ensure_partitions(cur, [today + timedelta(days=i) for i in range(args.days + 1)])
+            for name in created:
+                print(f"Created partition {name}")
+    except psycopg2.Error as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+JSON serialization for EMEA Yacht IoT Services
+
+``FastJSONProvider`` replaces Flask's default JSON provider. It encodes
+with orjson when that is installed and falls back to the stdlib encoder
+otherwise; both write datetimes as ISO 8601, Decimals as numbers and
+UUIDs as strings, so Postgres values need no conversion first.
+
+``dumps_rows`` is the fast path for query results: it takes the plain
+tuples of a default cursor plus the column names, skipping the RealDictRow
+objects that RealDictCursor builds in Python. It still makes one dict per
+row, since the object form needs a mapping per row for the encoder.
+``dumps_columns`` never makes per-row objects at all; endpoints that send
+many rows offer it as ``format=columns``.
+"""
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+def _default(obj):
+    """Encode the types that neither encoder handles on its own"""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if orjson is None:
+        if isinstance(obj, (datetime, date, time)):
+            return obj.isoformat()
+        if isinstance(obj, uuid.UUID):
+            return str(obj)
+        if dataclasses.is_dataclass(obj):
+            return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps_bytes(obj):
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, ensure_ascii=False,
+                      separators=(',', ':')).encode()
+
+
+def dumps_rows(columns, rows):
+    """JSON array of objects from tuple rows, in column order
+
+    The mappings handed to the encoder are built by zip() in C and thrown
+    away straight after; that measured faster than splicing pre-encoded
+    keys and values together in Python, with either encoder, and than
+    slotted dataclass rows with orjson. Use ``dumps_columns`` where the
+    per-row dicts matter.
+    """
+    return dumps_bytes([dict(zip(columns, row)) for row in rows])
+
+
+def dumps_columns(columns, rows):
+    """Compact {"columns": [...], "rows": [[...], ...]} form, no per-row objects"""
+    return dumps_bytes({'columns': list(columns), 'rows': rows})
+
+
+def stream_parts(columns, compact=False):
+    """(head, encode, tail) for writing rows out batch by batch
+
+    ``encode(rows)`` gives one batch without its enclosing brackets, to be
+    joined with commas between ``head`` and ``tail``. With ``compact`` the
+    result is the ``dumps_columns`` form, otherwise ``dumps_rows``.
+    """
+    if compact:
+        return (dumps_columns(columns, [])[:-2], lambda rows: dumps_bytes(rows)[1:-1], b']}')
+    return b'[', lambda rows: dumps_rows(columns, rows)[1:-1], b']'
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, with a stdlib fallback"""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return json.dumps(obj, default=_default, **kwargs)
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self.raw_response(dumps_bytes(obj))
+
+    def raw_response(self, body):
+        """Response for an already encoded JSON body"""
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,335 @@
+"""
+Telemetry ingestion for EMEA Yacht IoT Services
+
+Readings are parsed from JSON arrays or NDJSON, buffered per worker and
+written to Postgres in bulk with ``COPY FROM STDIN``.
+"""
+
+import atexit
+import io
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import psycopg2
+
+from .schema import TELEMETRY_TABLE, ensure_partitions, forget_partitions
+
+# Column order used for parsing, buffering and COPY
+TELEMETRY_COLUMNS = (
+    'yacht_id',
+    'recorded_at',
+    'latitude',
+    'longitude',
+    'speed_knots',
+    'heading',
+    'engine_rpm',
+    'engine_temp_c',
+    'fuel_rate_lph',
+    'battery_voltage',
+    'engine_hours',
+)
+
+NUMERIC_COLUMNS = TELEMETRY_COLUMNS[2:]
+
+# Columns stored as single-precision ``real``; the rest are double precision
+REAL_COLUMNS = frozenset({'speed_knots', 'heading', 'engine_rpm', 'engine_temp_c',
+                          'fuel_rate_lph', 'battery_voltage'})
+REAL_MAX = 3.4028234663852886e38
+INTEGER_MAX = 2 ** 31 - 1
+
+
+# Failures caused by the rows themselves, such as bad values or no partition
+# for their day: the batch is written in parts rather than re-queued, and the
+# rows the database still refuses are dead-lettered
+ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+
+class TelemetryError(ValueError):
+    """Raised for readings that cannot be parsed or validated"""
+
+
+class BufferFull(Exception):
+    """Raised when a batch does not fit into the ingest buffer"""
+
+
+def parse_readings(body, content_type):
+    """Parse a request body into a list of reading dicts"""
+    text = body.decode('utf-8') if isinstance(body, bytes) else body
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        try:
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        except json.JSONDecodeError as e:
+            raise TelemetryError(f'Invalid NDJSON: {e}')
+
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise TelemetryError(f'Invalid JSON: {e}')
+    if isinstance(payload, dict):
+        payload = payload.get('readings', [payload])
+    if not isinstance(payload, list):
+        raise TelemetryError('Expected a JSON array of readings')
+    return payload
+
+
+def to_row(reading):
+    """Validate one reading and convert it to a tuple in TELEMETRY_COLUMNS order"""
+    if not isinstance(reading, dict):
+        raise TelemetryError('Each reading must be a JSON object')
+    try:
+        yacht_id = int(reading['yacht_id'])
+        recorded_at = reading.get('recorded_at') or reading['timestamp']
+    except KeyError as e:
+        raise TelemetryError(f'Missing required field {e}')
+    except (TypeError, ValueError):
+        raise TelemetryError('yacht_id must be an integer')
+    if not -INTEGER_MAX - 1 <= yacht_id <= INTEGER_MAX:
+        raise TelemetryError('yacht_id out of range')
+
+    try:
+        if isinstance(recorded_at, (int, float)):
+            recorded_at = datetime.fromtimestamp(recorded_at, timezone.utc)
+        else:
+            recorded_at = datetime.fromisoformat(recorded_at)
+            if recorded_at.tzinfo is None:
+                recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise TelemetryError('recorded_at must be an ISO 8601 string or epoch seconds')
+
+    values = [yacht_id, recorded_at]
+    for column in NUMERIC_COLUMNS:
+        value = reading.get(column)
+        if value is not None:
+            try:
+                value = float(value)
+            except (TypeError, ValueError, OverflowError):
+                raise TelemetryError(f'{column} must be numeric')
+            if not math.isfinite(value):
+                raise TelemetryError(f'{column} must be finite')
+            if column in REAL_COLUMNS and abs(value) > REAL_MAX:
+                raise TelemetryError(f'{column} out of range')
+        values.append(value)
+    return tuple(values)
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, str):
+        return (value.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def copy_rows(cur, rows, table=TELEMETRY_TABLE, columns=TELEMETRY_COLUMNS):
+    """Bulk-load rows with a single COPY FROM STDIN round trip"""
+    buf = io.StringIO()
+    for row in rows:
+        buf.write('\t'.join(_copy_value(v) for v in row))
+        buf.write('\n')
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+
+class TelemetryBuffer:
+    """Per-worker buffer of telemetry rows awaiting a bulk write.
+
+    A flush is due once ``flush_rows`` rows are waiting or the oldest row
+    has waited ``flush_interval`` seconds. ``max_rows`` bounds memory: batches
+    that would overflow it are rejected with ``BufferFull`` so the client can
+    retry later. When the database refuses a batch's data, the batch is
+    written in halves until the offending rows are isolated; those are
+    logged and kept in ``dead_letters`` instead of going back in the buffer.
+    """
+
+    def __init__(self, max_rows=50000, flush_rows=5000, flush_interval=2.0):
+        self.max_rows = max_rows
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.accepted_total = 0
+        self.flushed_total = 0
+        self.rejected_total = 0
+        self.dead_letters = deque(maxlen=100)  # (row, error) pairs, most recent last
+        self._listeners = []
+        self._writers = []
+
+    def add_writer(self, callback):
+        """Call ``callback(cursor, rows)`` inside every flush transaction"""
+        self._writers.append(callback)
+
+    def add_listener(self, callback):
+        """Call ``callback(rows)`` after every successful flush"""
+        self._listeners.append(callback)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, rows):
+        """Queue rows, raising BufferFull when they do not fit"""
+        with self._lock:
+            if len(self._rows) + len(rows) > self.max_rows:
+                raise BufferFull(
+                    f'Ingest buffer full ({len(self._rows)}/{self.max_rows} rows)')
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            self.accepted_total += len(rows)
+            return len(rows)
+
+    def flush_due(self):
+        oldest = self._oldest
+        if not self._rows or oldest is None:
+            return False
+        return (len(self._rows) >= self.flush_rows or
+                time.monotonic() - oldest >= self.flush_interval)
+
+    def flush(self, conn):
+        """Write all buffered rows with one COPY, returning the number flushed"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._oldest = None
+            if not rows:
+                return 0
+            try:
+                self._write(conn, rows)
+                written = rows
+            except ROW_ERRORS as e:
+                conn.rollback()
+                print(f"Telemetry flush error: {e}".strip() + '; writing the batch in parts')
+                # The partition may have been dropped since it was cached
+                forget_partitions()
+                written = self._write_bisecting(conn, rows)
+            except psycopg2.Error:
+                conn.rollback()
+                # Put the batch back in front so nothing is lost
+                self._requeue(rows)
+                raise
+            self._flushed(written)
+            return len(written)
+
+    def _write(self, conn, rows):
+        with conn.cursor() as cur:
+            ensure_partitions(
+                cur, {row[1].astimezone(timezone.utc).date() for row in rows})
+            copy_rows(cur, rows)
+            self.run_writers(cur, rows)
+        conn.commit()
+
+    def _write_bisecting(self, conn, rows):
+        """Write rows in ever smaller parts, dead-lettering the ones the database refuses"""
+        written = []
+        pending = [rows]
+        while pending:
+            part = pending.pop()
+            try:
+                self._write(conn, part)
+            except ROW_ERRORS as e:
+                conn.rollback()
+                if len(part) == 1:
+                    self._reject(part[0], e)
+                else:
+                    middle = len(part) // 2
+                    pending += [part[middle:], part[:middle]]
+                continue
+            except psycopg2.Error:
+                conn.rollback()
+                # Not the data's fault: keep what is left for the next flush
+                self._requeue(part + [row for rest in reversed(pending) for row in rest])
+                self._flushed(written)
+                raise
+            written.extend(part)
+        return written
+
+    def _reject(self, row, error):
+        message = str(error).strip()
+        print(f"Telemetry row rejected (yacht {row[0]} at {row[1].isoformat()}): {message}")
+        self.rejected_total += 1
+        self.dead_letters.append((row, message))
+
+    def _requeue(self, rows):
+        with self._lock:
+            self._rows[:0] = rows
+            self._oldest = time.monotonic()
+
+    def _flushed(self, rows):
+        self.flushed_total += len(rows)
+        if rows:
+            self.run_listeners(rows)
+
+    def run_writers(self, cur, rows):
+        """Call every writer with rows written outside the buffer, in the caller's transaction"""
+        for callback in self._writers:
+            callback(cur, rows)
+
+    def run_listeners(self, rows):
+        for callback in self._listeners:
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"Telemetry listener error: {e}")
+
+    def stats(self):
+        return {
+            'buffered': len(self._rows),
+            'max_rows': self.max_rows,
+            'accepted_total': self.accepted_total,
+            'flushed_total': self.flushed_total,
+            'rejected_total': self.rejected_total,
+        }
+
+
+class BackgroundFlusher:
+    """Daemon thread flushing a TelemetryBuffer on its time threshold"""
+
+    def __init__(self, buffer, pool):
+        self.buffer = buffer
+        self.pool = pool
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        # Threads do not survive a fork, so start one per gunicorn worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(
+            target=self._run, name='telemetry-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush_now)
+
+    def flush_now(self):
+        """Flush whatever is buffered using a pooled connection"""
+        if not len(self.buffer):
+            return 0
+        try:
+            conn = self.pool.getconn()
+        except psycopg2.Error as e:
+            print(f"Telemetry flush error: {e}")
+            return 0
+        try:
+            return self.buffer.flush(conn)
+        except psycopg2.Error as e:
+            print(f"Telemetry flush error: {e}")
+            return 0
+        finally:
+            self.pool.putconn(conn)
+
+    def _run(self):
+        interval = max(self.buffer.flush_interval / 2, 0.1)
+        while True:
+            time.sleep(interval)
+            if self.buffer.flush_due():
+                self.flush_now()
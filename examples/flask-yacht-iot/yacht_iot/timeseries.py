@@ -0,0 +1,196 @@
+"""
+Telemetry rollups and metric queries for EMEA Yacht IoT Services
+
+The rollup job folds newly ingested raw readings into 1-minute buckets,
+then 1-minute buckets into 1-hour and 1-hour into 1-day buckets. Metric
+queries read the coarsest table whose bucket width divides the requested
+resolution, so a month of data at hourly resolution reads ~720 rows per
+yacht instead of every raw reading.
+
+Usage (run every minute from cron):
+    python -m yacht_iot.timeseries rollup
+"""
+
+import math
+import sys
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+from .schema import ROLLUP_METRICS, ROLLUP_TABLES, TELEMETRY_TABLE
+
+# Shared origin for date_bin so every table agrees on bucket boundaries
+BUCKET_ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+# Lock id for the rollup job, so overlapping cron runs skip instead of queueing
+ROLLUP_LOCK_ID = 4207002
+
+# Rows ingested this long before the last watermark are re-read, covering
+# transactions that committed after later ones
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+# Resolutions offered when the client does not ask for one, in seconds
+NICE_RESOLUTIONS = (1, 5, 10, 30, 60, 300, 600, 900, 1800, 3600, 7200,
+                    21600, 43200, 86400, 604800)
+
+ROLLUP_COLUMNS = [f'{m}_{agg}' for m in ROLLUP_METRICS for agg in ('avg', 'min', 'max')]
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_resolution(value):
+    """Parse '300', '5m', '1h' or '1d' into seconds"""
+    value = value.strip().lower()
+    if value[-1:] in _UNITS:
+        seconds = int(value[:-1]) * _UNITS[value[-1]]
+    else:
+        seconds = int(value)
+    if seconds <= 0:
+        raise ValueError('resolution must be positive')
+    return seconds
+
+
+def auto_resolution(start, end, max_points):
+    """Smallest nice resolution that keeps a range under max_points buckets"""
+    wanted = math.ceil((end - start).total_seconds() / max_points)
+    for seconds in NICE_RESOLUTIONS:
+        if seconds >= wanted:
+            return seconds
+    return NICE_RESOLUTIONS[-1]
+
+
+def pick_source(resolution):
+    """Coarsest table whose bucket width divides the resolution"""
+    for table, width in reversed(ROLLUP_TABLES):
+        if width <= resolution and resolution % width == 0:
+            return table, width
+    return TELEMETRY_TABLE, 0
+
+
+def _aggregate_sql(source):
+    """(time column, sample count, metric aggregates) for reading a table"""
+    if source == TELEMETRY_TABLE:
+        return 'recorded_at', 'count(*)', ', '.join(
+            f'avg({m}) AS {m}_avg, min({m}) AS {m}_min, max({m}) AS {m}_max'
+            for m in ROLLUP_METRICS)
+    # Averages are weighted by sample count so rollups of rollups stay exact
+    return 'bucket', 'sum(samples)', ', '.join(
+        f'sum({m}_avg * samples) / nullif(sum(samples) FILTER (WHERE {m}_avg IS NOT NULL), 0) '
+        f'AS {m}_avg, min({m}_min) AS {m}_min, max({m}_max) AS {m}_max'
+        for m in ROLLUP_METRICS)
+
+
+def query_metrics(cur, yacht_id, start, end, resolution):
+    """Bucketed metrics for one yacht, returning (source table, rows)"""
+    source, _ = pick_source(resolution)
+    time_column, samples, aggregates = _aggregate_sql(source)
+
+    cur.execute(
+        f"SELECT date_bin(%(width)s, {time_column}, %(origin)s) AS time, "
+        f"{samples} AS samples, {aggregates} "
+        f"FROM {source} "
+        f"WHERE yacht_id = %(yacht_id)s AND {time_column} >= %(start)s AND {time_column} < %(end)s "
+        f"GROUP BY 1 ORDER BY 1",
+        {'width': timedelta(seconds=resolution), 'origin': BUCKET_ORIGIN,
+         'yacht_id': yacht_id, 'start': start, 'end': end})
+    return source, cur.fetchall()
+
+
+def _floor(ts, width):
+    seconds = (ts - BUCKET_ORIGIN).total_seconds()
+    return BUCKET_ORIGIN + timedelta(seconds=math.floor(seconds / width) * width)
+
+
+def rollup_range(cur, first, last):
+    """Rebuild every rollup bucket covering readings recorded in [first, last]
+
+    Each level is rebuilt from the level below. Returns rows upserted per table.
+    """
+    counts = {}
+    columns = ', '.join(ROLLUP_COLUMNS)
+    updates = ', '.join(f'{c} = EXCLUDED.{c}' for c in ['samples'] + ROLLUP_COLUMNS)
+    source = TELEMETRY_TABLE
+    for table, width in ROLLUP_TABLES:
+        start = _floor(first, width)
+        end = _floor(last, width) + timedelta(seconds=width)
+        time_column, samples, aggregates = _aggregate_sql(source)
+        cur.execute(
+            f"INSERT INTO {table} (yacht_id, bucket, samples, {columns}) "
+            f"SELECT yacht_id, date_bin(%(width)s, {time_column}, %(origin)s), "
+            f"{samples}, {aggregates} "
+            f"FROM {source} WHERE {time_column} >= %(start)s AND {time_column} < %(end)s "
+            f"GROUP BY 1, 2 "
+            f"ON CONFLICT (yacht_id, bucket) DO UPDATE SET {updates}",
+            {'width': timedelta(seconds=width), 'origin': BUCKET_ORIGIN,
+             'start': start, 'end': end})
+        counts[table] = cur.rowcount
+        source = table
+    return counts
+
+
+def refresh_rollups(conn):
+    """Fold telemetry ingested since the last run into every rollup table
+
+    Returns the number of rows upserted per table, or None when another
+    rollup run holds the lock.
+    """
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_try_advisory_lock(%s)', (ROLLUP_LOCK_ID,))
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            return None
+        try:
+            cur.execute("SELECT ingested_through FROM rollup_state WHERE name = %s",
+                        (TELEMETRY_TABLE,))
+            row = cur.fetchone()
+            since = row[0] - WATERMARK_OVERLAP if row else datetime.min.replace(tzinfo=timezone.utc)
+            cur.execute(
+                f"SELECT min(recorded_at), max(recorded_at), max(ingested_at) "
+                f"FROM {TELEMETRY_TABLE} WHERE ingested_at > %s", (since,))
+            first, last, ingested_through = cur.fetchone()
+            if first is None:
+                conn.rollback()
+                return {}
+
+            counts = rollup_range(cur, first, last)
+            cur.execute(
+                "INSERT INTO rollup_state (name, ingested_through) VALUES (%s, %s) "
+                "ON CONFLICT (name) DO UPDATE SET ingested_through = EXCLUDED.ingested_through",
+                (TELEMETRY_TABLE, ingested_through))
+            conn.commit()
+            return counts
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute('SELECT pg_advisory_unlock(%s)', (ROLLUP_LOCK_ID,))
+            conn.commit()
+
+
+def main():
+    if sys.argv[1:] != ['rollup']:
+        print("Usage: python -m yacht_iot.timeseries rollup")
+        return 2
+
+    from .config import DB_CONFIG
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        counts = refresh_rollups(conn)
+    except psycopg2.Error as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    if counts is None:
+        print("Another rollup run is in progress, skipping")
+    elif not counts:
+        print("No new telemetry to roll up")
+    else:
+        for table, count in counts.items():
+            print(f"{table}: {count} buckets refreshed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,690 @@
+"""
+Routes of EMEA Yacht IoT Services
+
+A blueprint registered by create_app(), with the per-process services the
+routes share: the telemetry ingest buffer, the response cache, the live
+position hub and the grid index. Database access goes through
+yacht_iot.data.
+"""
+
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from flask import (Blueprint, current_app, render_template, jsonify, g, request, Response,
+                   stream_with_context, url_for)
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+
+from . import alerts
+from . import analytics
+from . import archive
+from . import batches
+from . import geo
+from .cache import LRUCache, RedisCache, ResponseCache
+from .config import (ANALYTICS_MAX_DAYS, ARCHIVE_AFTER, BATCH_MAX_BYTES, BATCH_MAX_UPLOAD_BYTES,
+                     CACHE_BACKEND, CACHE_MAX_ENTRIES, CACHE_REDIS_URL, CACHE_TTL, DB_CONFIG,
+                     METRICS_MAX_POINTS, POSITIONS_HEARTBEAT, POSITIONS_MAX_PENDING,
+                     PROFILE_INTERVAL, PROFILE_TOKEN, SPATIAL_GRID_DEGREES, SPATIAL_INDEX,
+                     TELEMETRY_CONFIG, YACHTS_DEFAULT_LIMIT, YACHTS_MAX_LIMIT)
+from .data import (db_pool, db_router, get_db_connection, get_read_connection, health_monitor,
+                   metrics, release_connections, select_fields, stream_rows, yacht_page_args,
+                   yachts_query)
+from .db import PoolTimeout, get_table_columns
+from .instrumentation import SamplingProfiler, SIZE_BUCKETS, current_db_stats
+from .positions import PositionHub, Subscriber, notify_positions, parse_bbox
+from .timeseries import auto_resolution, parse_resolution, query_metrics
+from .serialization import dumps_columns, dumps_rows
+from .telemetry import (TelemetryBuffer, BackgroundFlusher, BufferFull,
+                        TelemetryError, parse_readings, to_row)
+
+bp = Blueprint('yacht_iot', __name__)
+
+telemetry_buffer = TelemetryBuffer(**TELEMETRY_CONFIG)
+telemetry_flusher = BackgroundFlusher(telemetry_buffer, db_pool)
+
+if CACHE_BACKEND == 'redis':
+    cache_backend = RedisCache(CACHE_REDIS_URL)
+else:
+    cache_backend = LRUCache(CACHE_MAX_ENTRIES)
+
+response_cache = ResponseCache(cache_backend, default_ttl=CACHE_TTL,
+                               enabled=CACHE_BACKEND != 'none')
+telemetry_buffer.add_listener(lambda rows: response_cache.invalidate('telemetry'))
+
+# Live positions: flushes NOTIFY, each worker LISTENs once and fans out
+position_hub = PositionHub(DB_CONFIG)
+telemetry_buffer.add_writer(notify_positions)
+telemetry_buffer.add_writer(geo.upsert_positions)
+
+# Per-worker grid index for area queries when PostGIS is not used
+grid_index = geo.GridIndex(position_hub, db_pool, cell_degrees=SPATIAL_GRID_DEGREES)
+_use_postgis = None
+
+metrics.histogram('http_request_duration_seconds', 'Request latency by route')
+metrics.histogram('http_response_size_bytes', 'Response body size by route', SIZE_BUCKETS)
+metrics.gauge('telemetry_buffer_rows', 'Telemetry rows waiting for a flush',
+              lambda: [({}, len(telemetry_buffer))])
+
+@bp.before_app_request
+def start_request_metrics():
+    """Start the request timer, the per-request DB counters and any profiler"""
+    g.request_started = time.perf_counter()
+    g.db_stats = [0, 0.0]
+    g.db_stats_token = current_db_stats.set(g.db_stats)
+    if PROFILE_TOKEN and request.headers.get('X-Profile') == PROFILE_TOKEN:
+        g.profiler = SamplingProfiler(PROFILE_INTERVAL)
+        g.profiler.start()
+
+@bp.after_app_request
+def record_request_metrics(response):
+    """Record latency, DB time and response size for the matched route"""
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    queries, db_seconds = g.db_stats
+    metrics.observe('http_request_duration_seconds', elapsed, route=route,
+                    method=request.method, status=response.status_code)
+    metrics.observe('db_request_duration_seconds', db_seconds, route=route)
+    if queries:
+        metrics.inc('db_queries_total', queries, route=route)
+    if response.content_length is not None:
+        metrics.observe('http_response_size_bytes', response.content_length, route=route)
+    metrics.maybe_dump()
+
+    response.headers['Server-Timing'] = (
+        f'db;dur={db_seconds * 1000:.2f};desc="{queries} queries", '
+        f'app;dur={elapsed * 1000:.2f}')
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        response = Response(profiler.collapsed(), mimetype='text/plain')
+        response.headers['X-Profile-Samples'] = str(sum(profiler.samples.values()))
+    return response
+
+@bp.teardown_app_request
+def reset_request_metrics(exception):
+    token = g.pop('db_stats_token', None)
+    if token is not None:
+        current_db_stats.reset(token)
+
+@bp.teardown_app_request
+def release_db_connection(exception):
+    """Return the request's connections to the pool"""
+    release_connections()
+
+@bp.route('/')
+def index():
+    """Home page"""
+    return render_template('index.html')
+
+@bp.route('/api/status')
+@response_cache.cached('status', ttl=300)
+def api_status():
+    """API status endpoint"""
+    return jsonify({
+        'status': 'healthy',
+        'service': 'EMEA Yacht IoT Services',
+        'version': '1.0.0'
+    })
+
+@bp.route('/api/yachts')
+@response_cache.cached('yachts')
+def api_yachts():
+    """Get yacht data from database
+
+    Query parameters:
+      after  - return yachts with an id greater than this (keyset cursor)
+      limit  - page size (default YACHTS_DEFAULT_LIMIT, max YACHTS_MAX_LIMIT)
+      fields - comma-separated list of columns to return (id is always included)
+      stream - when 1, stream every matching row through a server-side cursor
+      format - "columns" for {"columns": [...], "rows": [[...], ...]} instead of objects
+    """
+    conn = get_read_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    try:
+        after, limit, stream = yacht_page_args(request.args)
+    except ValueError:
+        return jsonify({'error': 'after and limit must be integers'}), 400
+
+    try:
+        try:
+            columns = select_fields(get_table_columns(conn, 'yachts'), request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query, params = yachts_query(columns, after, limit)
+
+        if stream:
+            compact = request.args.get('format') == 'columns'
+            return Response(stream_with_context(stream_rows(conn, query, params, columns, compact)),
+                            mimetype='application/json')
+
+        # Plain tuples: no per-row dicts are built before encoding
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+        if request.args.get('format') == 'columns':
+            response = current_app.json.raw_response(dumps_columns(columns, rows))
+        else:
+            response = current_app.json.raw_response(dumps_rows(columns, rows))
+        if len(rows) == limit:
+            next_after = rows[-1][columns.index('id')]
+            response.headers['X-Next-After'] = str(next_after)
+            args = {**request.args.to_dict(), 'after': next_after}
+            response.headers['Link'] = '<{}>; rel="next"'.format(
+                url_for('.api_yachts', _external=True, **args))
+        return response
+    except psycopg2.Error as e:
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+
+def _spatial_query(postgis_query, grid_query):
+    """Run an area query on PostGIS or the grid index, returning a response"""
+    global _use_postgis
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, YACHTS_MAX_LIMIT))
+
+    try:
+        if _use_postgis is None or SPATIAL_INDEX != 'auto':
+            if SPATIAL_INDEX == 'auto':
+                conn = get_read_connection()
+                if not conn:
+                    return jsonify({'error': 'Database connection failed'}), 500
+                with conn.cursor() as cur:
+                    _use_postgis = geo.has_postgis(cur)
+            else:
+                _use_postgis = SPATIAL_INDEX == 'postgis'
+        if _use_postgis:
+            conn = get_read_connection()
+            if not conn:
+                return jsonify({'error': 'Database connection failed'}), 500
+            with conn.cursor() as cur:
+                rows = postgis_query(cur, limit)
+                columns = [d[0] for d in cur.description]
+            return current_app.json.raw_response(dumps_rows(columns, rows))
+        grid_index.ensure_loaded()
+        return jsonify(grid_query(limit))
+    except psycopg2.Error as e:
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+
+@bp.route('/api/yachts/near')
+def api_yachts_near():
+    """Yachts whose latest position is within a radius, nearest first
+
+    Query parameters:
+      lat, lon - centre of the search
+      radius   - radius in nautical miles (default 10)
+      limit    - maximum yachts returned (default 100)
+    """
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = float(request.args.get('radius', 10))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lon are required and radius must be a number'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius <= 0:
+        return jsonify({'error': 'lat/lon out of range or radius not positive'}), 400
+    return _spatial_query(
+        lambda cur, limit: geo.postgis_near(cur, lat, lon, radius, limit),
+        lambda limit: grid_index.near(lat, lon, radius, limit))
+
+@bp.route('/api/yachts/within')
+def api_yachts_within():
+    """Yachts whose latest position is inside a bounding box
+
+    Query parameters:
+      bbox  - min_lon,min_lat,max_lon,max_lat
+      limit - maximum yachts returned (default 100)
+    """
+    try:
+        bbox = parse_bbox(request.args['bbox'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'bbox must be min_lon,min_lat,max_lon,max_lat'}), 400
+    return _spatial_query(
+        lambda cur, limit: geo.postgis_within(cur, bbox, limit),
+        lambda limit: grid_index.within(bbox, limit))
+
+@bp.route('/api/yachts/<int:yacht_id>/metrics')
+@response_cache.cached('telemetry')
+def api_yacht_metrics(yacht_id):
+    """Bucketed sensor metrics for one yacht
+
+    Query parameters:
+      from, to   - ISO 8601 range (default: the last 24 hours)
+      resolution - bucket width such as 60, 5m, 1h or 1d (default: picked
+                   so the range fits in METRICS_MAX_POINTS buckets)
+    """
+    try:
+        end = _parse_time(request.args.get('to')) or datetime.now(timezone.utc)
+        start = _parse_time(request.args.get('from')) or end - timedelta(days=1)
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO 8601 timestamps'}), 400
+    if start >= end:
+        return jsonify({'error': 'from must be before to'}), 400
+
+    try:
+        if request.args.get('resolution'):
+            resolution = parse_resolution(request.args['resolution'])
+        else:
+            resolution = auto_resolution(start, end, METRICS_MAX_POINTS)
+    except ValueError:
+        return jsonify({'error': 'resolution must be seconds or a number with s/m/h/d/w'}), 400
+    if (end - start).total_seconds() / resolution > METRICS_MAX_POINTS:
+        return jsonify({'error': f'Range exceeds {METRICS_MAX_POINTS} buckets at this resolution'}), 400
+
+    result = None
+    if end <= datetime.now(timezone.utc) - ARCHIVE_AFTER and db_router.archive_ready():
+        result = _query_archive(yacht_id, start, end, resolution)
+    if result is None:
+        conn = get_read_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                result = query_metrics(cur, yacht_id, start, end, resolution)
+        except psycopg2.Error as e:
+            return jsonify({'error': f'Database query failed: {e}'}), 500
+    source, points = result
+
+    return jsonify({
+        'yacht_id': yacht_id,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'resolution': resolution,
+        'source': source,
+        'points': points
+    })
+
+def _query_archive(yacht_id, start, end, resolution):
+    """(source, points) from the archive, or None to query PostgreSQL instead"""
+    try:
+        conn = db_router.archive.getconn()
+    except (archive.ArchiveError, PoolTimeout, RuntimeError) as e:
+        print(f"Archive connection error: {e}")
+        return None
+    try:
+        return archive.query_metrics(conn, yacht_id, start, end, resolution)
+    except archive.ArchiveError as e:
+        print(f"Archive query error: {e}")
+        return None
+    finally:
+        db_router.archive.putconn(conn)
+
+def _parse_time(value):
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _analytics_window():
+    """(start, end, yacht ids) from the request, raising ValueError with a message"""
+    try:
+        end = _parse_time(request.args.get('to')) or datetime.now(timezone.utc)
+        start = _parse_time(request.args.get('from')) or end - timedelta(days=7)
+    except ValueError:
+        raise ValueError('from and to must be ISO 8601 timestamps')
+    if start >= end:
+        raise ValueError('from must be before to')
+    if end - start > timedelta(days=ANALYTICS_MAX_DAYS):
+        raise ValueError(f'Range exceeds {ANALYTICS_MAX_DAYS} days')
+    yacht_ids = request.args.get('yacht_id')
+    try:
+        yacht_ids = [int(y) for y in yacht_ids.split(',')] if yacht_ids else None
+    except ValueError:
+        raise ValueError('yacht_id must be comma-separated integers')
+    return start, end, yacht_ids
+
+def _analytics_response(compute, **options):
+    try:
+        start, end, yacht_ids = _analytics_window()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_read_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        with conn.cursor() as cur:
+            data = analytics.fetch_window(cur, start, end, yacht_ids)
+        conn.rollback()
+    except psycopg2.Error as e:
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'readings': len(data['yacht_id']),
+        'yachts': compute(data, **options)
+    })
+
+@bp.route('/api/analytics/fuel-efficiency')
+@response_cache.cached('telemetry')
+def api_fuel_efficiency():
+    """Distance, fuel burnt and nm per litre per yacht, with fleet z-scores
+
+    Query parameters:
+      from, to - ISO 8601 range (default: the last 7 days)
+      yacht_id - comma-separated yacht ids (default: the whole fleet)
+    """
+    return _analytics_response(analytics.fuel_efficiency)
+
+@bp.route('/api/analytics/speed-profile')
+@response_cache.cached('telemetry')
+def api_speed_profile():
+    """Speed percentiles, peak rolling mean and anomalous readings per yacht
+
+    Query parameters:
+      from, to - ISO 8601 range (default: the last 7 days)
+      yacht_id - comma-separated yacht ids (default: the whole fleet)
+      window   - readings in the rolling mean (default 60)
+      z        - z-score above which a reading is anomalous (default 3)
+    """
+    try:
+        window = int(request.args.get('window', 60))
+        z_threshold = float(request.args.get('z', 3))
+    except ValueError:
+        return jsonify({'error': 'window must be an integer and z a number'}), 400
+    if window < 1:
+        return jsonify({'error': 'window must be positive'}), 400
+    return _analytics_response(analytics.speed_profile, window=window, z_threshold=z_threshold)
+
+@bp.route('/api/maintenance')
+@response_cache.cached('maintenance', ttl=60)
+def api_maintenance():
+    """Precomputed maintenance risk, highest first
+
+    Query parameters:
+      level - only yachts at this risk level (low, medium or high)
+      limit - number of yachts (default YACHTS_DEFAULT_LIMIT, max YACHTS_MAX_LIMIT)
+    """
+    level = request.args.get('level')
+    if level not in (None, 'low', 'medium', 'high'):
+        return jsonify({'error': 'level must be low, medium or high'}), 400
+    try:
+        limit = int(request.args.get('limit', YACHTS_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, YACHTS_MAX_LIMIT))
+
+    conn = get_read_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                "SELECT * FROM maintenance_predictions "
+                + ("WHERE risk_level = %s " if level else "")
+                + "ORDER BY risk_score DESC LIMIT %s",
+                (level, limit) if level else (limit,))
+            predictions = cur.fetchall()
+    except psycopg2.Error as e:
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+    return jsonify(predictions)
+
+@bp.route('/api/yachts/<int:yacht_id>/maintenance')
+@response_cache.cached('maintenance', ttl=60)
+def api_yacht_maintenance(yacht_id):
+    """Precomputed maintenance risk for one yacht"""
+    conn = get_read_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM maintenance_predictions WHERE yacht_id = %s", (yacht_id,))
+            prediction = cur.fetchone()
+    except psycopg2.Error as e:
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+    if prediction is None:
+        return jsonify({'error': 'No prediction for this yacht yet'}), 404
+    return jsonify(prediction)
+
+@bp.route('/api/alerts')
+def api_alerts():
+    """Alerts queued by the rules engine, newest first
+
+    Query parameters:
+      yacht_id - only this yacht's alerts
+      state    - firing or resolved
+      limit    - number of alerts (default YACHTS_DEFAULT_LIMIT, max YACHTS_MAX_LIMIT)
+    """
+    state = request.args.get('state')
+    if state not in (None, 'firing', 'resolved'):
+        return jsonify({'error': 'state must be firing or resolved'}), 400
+    try:
+        yacht_id = request.args.get('yacht_id', type=int)
+        limit = int(request.args.get('limit', YACHTS_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'yacht_id and limit must be integers'}), 400
+    limit = max(1, min(limit, YACHTS_MAX_LIMIT))
+
+    filters, params = [], []
+    if yacht_id is not None:
+        filters.append("yacht_id = %s")
+        params.append(yacht_id)
+    if state:
+        filters.append("state = %s")
+        params.append(state)
+    conn = get_read_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                "SELECT * FROM alert_outbox "
+                + ("WHERE " + " AND ".join(filters) + " " if filters else "")
+                + "ORDER BY id DESC LIMIT %s", params + [limit])
+            queued = cur.fetchall()
+    except psycopg2.Error as e:
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+    return jsonify(queued)
+
+@bp.route('/api/alert-rules')
+def api_alert_rules():
+    """All alert rules"""
+    conn = get_read_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM alert_rules ORDER BY id")
+            rules = cur.fetchall()
+    except psycopg2.Error as e:
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+    return jsonify(rules)
+
+@bp.route('/api/alert-rules', methods=['POST'])
+def api_create_alert_rule():
+    """Create an alert rule; the alerts worker picks it up on its next cycle
+
+    Body: {"name", "kind": "threshold" | "rate_of_change" | "geofence",
+    "yacht_id" (null for the whole fleet), then "metric", "operator" and
+    "threshold" (per minute for rate_of_change), or "geofence" and "trigger"}
+    """
+    rule = request.get_json(silent=True)
+    if not isinstance(rule, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    try:
+        alerts.validate_rule(rule)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    columns = [c for c in alerts.RULE_COLUMNS if c != 'id' and rule.get(c) is not None]
+    values = [json.dumps(rule[c]) if c == 'geofence' else rule[c] for c in columns]
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                sql.SQL("INSERT INTO alert_rules ({}) VALUES ({}) RETURNING *").format(
+                    sql.SQL(', ').join(map(sql.Identifier, columns)),
+                    sql.SQL(', ').join(sql.Placeholder() * len(columns))),
+                values)
+            created = cur.fetchone()
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+    return jsonify(created), 201
+
+@bp.route('/api/alert-rules/<int:rule_id>', methods=['DELETE'])
+def api_delete_alert_rule(rule_id):
+    """Delete an alert rule; alerts it already queued are kept"""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM alert_rules WHERE id = %s", (rule_id,))
+            deleted = cur.rowcount
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        return jsonify({'error': f'Database query failed: {e}'}), 500
+    if not deleted:
+        return jsonify({'error': 'No such alert rule'}), 404
+    return '', 204
+
+@bp.route('/api/telemetry', methods=['POST'])
+def api_telemetry():
+    """Ingest a batch of sensor readings (JSON array or NDJSON)"""
+    try:
+        readings = parse_readings(request.get_data(), request.content_type or '')
+        rows = [to_row(reading) for reading in readings]
+    except TelemetryError as e:
+        return jsonify({'error': str(e)}), 400
+    if len(rows) > telemetry_buffer.max_rows:
+        return jsonify({'error': f'Batch exceeds {telemetry_buffer.max_rows} readings'}), 413
+
+    try:
+        accepted = telemetry_buffer.add(rows)
+    except BufferFull as e:
+        response = jsonify({'error': str(e), **telemetry_buffer.stats()})
+        response.headers['Retry-After'] = str(max(1, int(telemetry_buffer.flush_interval)))
+        return response, 429
+    telemetry_flusher.ensure_started()
+
+    flushed = 0
+    if len(telemetry_buffer) >= telemetry_buffer.flush_rows:
+        conn = get_db_connection()
+        if conn:
+            try:
+                flushed = telemetry_buffer.flush(conn)
+            except psycopg2.Error as e:
+                print(f"Telemetry flush error: {e}")
+
+    return jsonify({
+        'accepted': accepted,
+        'flushed': flushed,
+        'buffered': len(telemetry_buffer)
+    }), 202
+
+@bp.route('/api/telemetry/batch', methods=['POST'])
+def api_telemetry_batch():
+    """Ingest one compressed columnar batch of a yacht's buffered readings
+
+    The body is a batch as described in batches.py, with Content-Encoding
+    zstd, gzip or identity. Re-sending an already loaded (yacht_id, seq)
+    is acknowledged with "duplicate": true.
+    """
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length is required'}), 411
+    if request.content_length > BATCH_MAX_UPLOAD_BYTES:
+        return jsonify({'error': f'Upload exceeds {BATCH_MAX_UPLOAD_BYTES} bytes'}), 413
+    payload, status = ingest_batch(request.get_data(), request.headers.get('Content-Encoding'))
+    return jsonify(payload), status
+
+def ingest_batch(body, encoding):
+    """Decode and load a batch upload, returning (response payload, status)
+
+    Shared by the Flask and ASGI routes; it borrows its own pooled
+    connection so the ASGI mode can run it in a thread.
+    """
+    try:
+        batch = batches.decode_batch(batches.decompress(body, encoding, BATCH_MAX_BYTES))
+    except batches.BatchTooLarge as e:
+        return {'error': str(e)}, 413
+    except TelemetryError as e:
+        return {'error': str(e)}, 400
+
+    try:
+        conn = db_pool.getconn()
+    except psycopg2.Error as e:
+        print(f"Database connection error: {e}")
+        return {'error': 'Database connection failed'}, 500
+    try:
+        loaded = batches.load_batch(conn, batch, buffer=telemetry_buffer)
+    except psycopg2.Error as e:
+        return {'error': f'Batch load failed: {e}'}, 500
+    finally:
+        db_pool.putconn(conn)
+    return {
+        'yacht_id': batch.yacht_id,
+        'seq': batch.seq,
+        'readings': len(batch),
+        'duplicate': not loaded
+    }, 201 if loaded else 200
+
+@bp.route('/api/stream/positions')
+def api_stream_positions():
+    """Server-Sent Events stream of live yacht positions
+
+    Query parameters:
+      yacht_id - comma-separated yacht ids to follow (default: all)
+      bbox     - min_lon,min_lat,max_lon,max_lat to follow a sea area
+
+    A client that falls behind receives only the newest position per
+    yacht. No database connection is held while streaming.
+    """
+    try:
+        yacht_ids = request.args.get('yacht_id')
+        yacht_ids = [int(y) for y in yacht_ids.split(',')] if yacht_ids else None
+        bbox = request.args.get('bbox')
+        bbox = parse_bbox(bbox) if bbox else None
+    except ValueError:
+        return jsonify({'error': 'yacht_id must be integers and bbox min_lon,min_lat,max_lon,max_lat'}), 400
+
+    subscriber = position_hub.subscribe(
+        Subscriber(yacht_ids, bbox, max_pending=POSITIONS_MAX_PENDING))
+    return Response(_stream_positions(subscriber, current_app.json.dumps),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _stream_positions(subscriber, dumps):
+    """Yield SSE frames until the client disconnects
+
+    Runs after the request context is gone, so it is handed the app's encoder.
+    """
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            if not subscriber.wait(POSITIONS_HEARTBEAT):
+                yield ': keepalive\n\n'
+                continue
+            for position in subscriber.drain():
+                yield f'event: position\ndata: {dumps(position)}\n\n'
+    finally:
+        position_hub.unsubscribe(subscriber)
+
+@bp.route('/metrics')
+def prometheus_metrics():
+    """Request, database and pool metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/health')
+def health_check():
+    """Health check endpoint, served from the background monitor's last checks"""
+    health_monitor.ensure_started()
+    status, dependencies = health_monitor.snapshot()
+    database = dependencies.get('postgresql', {}).get('status')
+    return jsonify({
+        'status': status,
+        'database': 'connected' if database == 'up' else 'disconnected',
+        'dependencies': dependencies
+    }), 200 if status in ('healthy', 'degraded') else 503
+
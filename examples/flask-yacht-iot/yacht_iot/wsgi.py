@@ -0,0 +1,15 @@
+"""
+WSGI entry point for EMEA Yacht IoT Services
+
+    gunicorn -c python:yacht_iot.gunicorn_conf yacht_iot.wsgi:app
+    python -m yacht_iot.wsgi   # development server on $PORT (default 5000)
+"""
+
+import os
+
+from . import create_app
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=app.config['DEBUG'])
@@ -1,79 +0,0 @@
-#!/usr/bin/env python3
-"""
-Simple Flask application for EMEA Yacht IoT Services
-"""
-
-import os
-import json
-from flask import Flask, render_template, jsonify
-import psycopg2
-from psycopg2.extras import RealDictCursor
-
-app = Flask(__name__)
-
-# Load configuration from environment
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
-app.config['DEBUG'] = os.environ.get('FLASK_DEBUG', '0') == '1'
-
-# Database configuration
-DB_CONFIG = {
-    'host': os.environ.get('DB_HOST', 'localhost'),
-    'port': os.environ.get('DB_PORT', '5432'),
-    'database': os.environ.get('DB_DATABASE', 'yacht_iot'),
-    'user': os.environ.get('DB_USERNAME', 'postgres'),
-    'password': os.environ.get('DB_PASSWORD', '')
-}
-
-def get_db_connection():
-    """Get database connection"""
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except psycopg2.Error as e:
-        print(f"Database connection error: {e}")
-        return None
-
-@app.route('/')
-def index():
-    """Home page"""
-    return render_template('index.html')
-
-@app.route('/api/status')
-def api_status():
-    """API status endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'EMEA Yacht IoT Services',
-        'version': '1.0.0'
-    })
-
-@app.route('/api/yachts')
-def api_yachts():
-    """Get yacht data from database"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM yachts LIMIT 10")
-            yachts = cur.fetchall()
-            return jsonify([dict(yacht) for yacht in yachts])
-    except psycopg2.Error as e:
-        return jsonify({'error': f'Database query failed: {e}'}), 500
-    finally:
-        conn.close()
-
-@app.route('/api/health')
-def health_check():
-    """Health check endpoint"""
-    conn = get_db_connection()
-    if conn:
-        conn.close()
-        return jsonify({'status': 'healthy', 'database': 'connected'})
-    else:
-        return jsonify({'status': 'unhealthy', 'database': 'disconnected'}), 500
-
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=app.config['DEBUG'])